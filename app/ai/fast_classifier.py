@@ -0,0 +1,233 @@
+import re
+import time
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from app.config.logger import get_logger
+from app.config.database_config.postgres import database as db
+from app.ai.semantic_cache import classification_cache, embed_text
+from app.config.constants import (
+    FAST_CLASSIFIER_MIN_CONFIDENCE,
+    FAST_CLASSIFIER_MIN_SAMPLES,
+    FAST_CLASSIFIER_RETRAIN_EVERY,
+    FAST_CLASSIFIER_MAX_SAMPLES,
+)
+
+logger = get_logger("API Logger")
+
+DATA_TYPES = ("data_query_text", "data_query_chart", "data_query_combined")
+
+GREETING_PATTERN = re.compile(
+    r"^(hi+|hello|hey|hola|namaste|good (morning|afternoon|evening))"
+    r"([\s,]+(there|urekai|team))?[\s!.,?]*$"
+)
+HELP_PATTERN = re.compile(
+    r"^(help|what can you do|what do you do|who are you|what are you|what is urekai|"
+    r"how (do|does) (this|it|you) work|how can you help( me)?)[\s!.?]*$"
+)
+AGGREGATE_PATTERN = re.compile(
+    r"\b(total|sum|average|avg|mean|median|count|how many|top \d+|bottom \d+|highest|lowest|"
+    r"maximum|minimum|max|min|breakdown|group(ed)? by|percentage|share of|growth)\b"
+)
+CHART_PATTERN = re.compile(r"\b(chart|plot|graph|visuali[sz]e|visuali[sz]ation|trend|over time|distribution|histogram)\b")
+TABLE_PATTERN = re.compile(r"\b(table|tabular|list)\b")
+
+DATA_USER_MESSAGE = "Understanding what data your question needs..."
+
+GREETING_MESSAGE = "Hello! I'm UrekAI. Ask me anything about your uploaded data and I'll analyse it for you."
+HELP_MESSAGE = (
+    "I'm UrekAI, a data analysis assistant. Upload CSV or Excel files and ask questions like "
+    "'total sales by month' or 'top 5 products by revenue' - I'll query your data and explain the results with tables and charts."
+)
+DATA_MESSAGES = {
+    "data_query_text": "Textual/tabular output is sufficient. Focus on the key figures, patterns and summary statistics that answer the question.",
+    "data_query_chart": "Visual trends or comparisons are needed. Present the result as a chart of the relevant dimensions and measures.",
+    "data_query_combined": "Both a textual summary and a chart-based visual are needed to answer the question fully.",
+}
+WHATSAPP_COMMANDS = (
+    ("/check_upload", "check_upload", "Select the uploaded files that match the user's request."),
+    ("/delete", "delete_upload", "Select the uploaded files the user wants to delete."),
+    ("@shopify", "shopify", "Identify whether the analysis needs a visualisation, a table or a single line answer."),
+)
+
+def _names_schema(text: str, schema_names: Optional[Set[str]]) -> bool:
+    words = f" {' '.join(re.findall(r'[a-z0-9]+', text))} "
+    return any(f" {name} " in words for name in schema_names or ())
+
+def match_rules(user_query: str, medium: Optional[str] = None, schema_names: Optional[Set[str]] = None) -> Optional[Dict[str, str]]:
+    """
+    Keyword rules. Only exact greetings, help questions and WhatsApp commands are answered
+    outright; a data type also needs the question to name one of the user's tables or
+    columns (schema_names). Everything else is left to the later tiers.
+    """
+    text = " ".join(user_query.lower().split())
+
+    if medium == "WhatsApp":
+        for marker, query_type, message in WHATSAPP_COMMANDS:
+            if text == marker or text.startswith(marker + " "):
+                return {"type": query_type, "message": message}
+
+    if GREETING_PATTERN.match(text):
+        return {"type": "general", "message": GREETING_MESSAGE}
+    if HELP_PATTERN.match(text):
+        return {"type": "general", "message": HELP_MESSAGE}
+
+    if not _names_schema(text, schema_names):
+        return None
+    if CHART_PATTERN.search(text):
+        query_type = "data_query_combined" if TABLE_PATTERN.search(text) else "data_query_chart"
+        return {"type": query_type, "message": DATA_MESSAGES[query_type], "user_message": DATA_USER_MESSAGE}
+    if AGGREGATE_PATTERN.search(text):
+        return {"type": "data_query_text", "message": DATA_MESSAGES["data_query_text"], "user_message": DATA_USER_MESSAGE}
+
+    return None
+
+class LogisticModel:
+    """Tiny multinomial logistic regression over hashed n-gram features."""
+
+    def __init__(self, labels: List[str], weights: np.ndarray, bias: np.ndarray):
+        self.labels = labels
+        self.weights = weights
+        self.bias = bias
+
+    @classmethod
+    def fit(cls, texts: List[str], labels: List[str], epochs: int = 300, learning_rate: float = 1.0, l2: float = 1e-4):
+        classes = sorted(set(labels))
+        x = np.stack([embed_text(t) for t in texts])
+        y = np.zeros((len(labels), len(classes)), dtype=np.float32)
+        y[np.arange(len(labels)), [classes.index(l) for l in labels]] = 1.0
+
+        weights = np.zeros((x.shape[1], len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        for _ in range(epochs):
+            probs = softmax(x @ weights + bias)
+            error = (probs - y) / len(labels)
+            weights -= learning_rate * (x.T @ error + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+
+        return cls(classes, weights, bias)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        probs = softmax((embed_text(text) @ self.weights + self.bias)[None, :])[0]
+        best = int(np.argmax(probs))
+        return self.labels[best], float(probs[best])
+
+def softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+class FastClassifier:
+    """
+    Tiers tried before the LLM: keyword rules, the semantic cache, then a logistic
+    model trained on logged LLM classifications. Every answer is logged with its
+    tier and latency in query_classification_log.
+    """
+
+    def __init__(self):
+        self.models: Dict[str, LogisticModel] = {}
+        self.samples: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        self.pending: Dict[str, int] = defaultdict(int)
+        self.stats: Dict[str, int] = defaultdict(int)
+        self.background_tasks = set()
+
+    def classify(self, namespace: str, user_query: str, medium: Optional[str] = None, schema_names: Optional[Set[str]] = None) -> Optional[Dict[str, str]]:
+        started = time.perf_counter()
+
+        result = match_rules(user_query, medium, schema_names)
+        if result:
+            return self._answer(namespace, user_query, result, "rules", started)
+
+        result = classification_cache.lookup(namespace, user_query)
+        if result:
+            return self._answer(namespace, user_query, result, "semantic_cache", started)
+
+        model = self.models.get(namespace)
+        if model:
+            label, confidence = model.predict(user_query)
+            # General answers need an LLM-written reply, so the model only short-circuits data queries
+            if label in DATA_TYPES and confidence >= FAST_CLASSIFIER_MIN_CONFIDENCE:
+                logger.info(f"Fast classifier model answered '{label}' (confidence={confidence:.2f})")
+                result = {"type": label, "message": DATA_MESSAGES[label], "user_message": DATA_USER_MESSAGE}
+                return self._answer(namespace, user_query, result, "model", started)
+
+        return None
+
+    def learn(self, namespace: str, user_query: str, classification: dict, latency_ms: int):
+        """Feeds an LLM classification back into the semantic cache and the model's training set."""
+        classification_cache.add(namespace, user_query, classification)
+        self.stats["llm"] += 1
+        self.record(namespace, user_query, classification["type"], "llm", latency_ms)
+
+        samples = self.samples[namespace]
+        samples.append((user_query, classification["type"]))
+        del samples[:-FAST_CLASSIFIER_MAX_SAMPLES]
+
+        self.pending[namespace] += 1
+        if self.pending[namespace] >= FAST_CLASSIFIER_RETRAIN_EVERY:
+            self.pending[namespace] = 0
+            self.spawn(self.train(namespace))
+
+    def _answer(self, namespace: str, user_query: str, result: dict, tier: str, started: float) -> dict:
+        self.stats[tier] += 1
+        latency_ms = int((time.perf_counter() - started) * 1000)
+        self.record(namespace, user_query, result["type"], tier, latency_ms)
+        return {**result, "tier": tier}
+
+    async def train(self, namespace: str):
+        samples = list(self.samples[namespace])
+        if len(samples) < FAST_CLASSIFIER_MIN_SAMPLES or len({label for _, label in samples}) < 2:
+            return
+        try:
+            texts, labels = zip(*samples)
+            self.models[namespace] = await asyncio.to_thread(LogisticModel.fit, list(texts), list(labels))
+            logger.info(f"Fast classifier retrained on {len(samples)} samples")
+        except Exception as e:
+            logger.error(f"Fast classifier training failed: {e}")
+
+    async def load_training_data(self):
+        """Seeds the training sets from logged LLM classifications."""
+        try:
+            rows = await db.fetch_all("""
+                SELECT namespace, user_query, type
+                FROM query_classification_log
+                WHERE tier = 'llm'
+                ORDER BY created_at DESC
+                LIMIT :limit
+            """, {"limit": FAST_CLASSIFIER_MAX_SAMPLES})
+        except Exception as e:
+            logger.error(f"Unable to load classification log: {e}")
+            return
+
+        for row in reversed(rows):
+            self.samples[row["namespace"]].append((row["user_query"], row["type"]))
+        for namespace in list(self.samples):
+            await self.train(namespace)
+
+    def record(self, namespace: str, user_query: str, query_type: str, tier: str, latency_ms: int):
+        if not db.is_connected:
+            return
+        self.spawn(self._insert_log(namespace, user_query, query_type, tier, latency_ms))
+
+    async def _insert_log(self, namespace, user_query, query_type, tier, latency_ms):
+        try:
+            await db.execute("""
+                INSERT INTO query_classification_log (namespace, user_query, type, tier, latency_ms)
+                VALUES (:namespace, :user_query, :type, :tier, :latency_ms)
+            """, {
+                "namespace": namespace,
+                "user_query": user_query,
+                "type": query_type,
+                "tier": tier,
+                "latency_ms": latency_ms
+            })
+        except Exception as e:
+            logger.warning(f"Failed to log classification: {e}")
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+fast_classifier = FastClassifier()
@@ -1,7 +1,12 @@
 from google import generativeai as genai
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import asyncio
 from app.config.logger import get_logger
 from app.config.settings import settings
+from app.config.constants import LLM_MODEL_NAME, LLM_MODEL_REGISTRY_SIZE, LLM_THREAD_POOL_SIZE
+from app.ai.response_cache import response_cache
 
 load_dotenv()
 logger = get_logger("API Logger")
@@ -13,28 +18,50 @@ if not API_KEY:
 
 genai.configure(api_key=API_KEY)
 
-# model = genai.GenerativeModel(model_name="gemini-2.5-flash")
+JSON_RESPONSE_INSTRUCTION = "\nIMPORTANT: Respond ONLY with valid JSON. Do not include markdown, code blocks, or extra text. The response must be parseable JSON."
 
-async def query_ai(user_query: str, system_prompt: str, response_format: str = "json") -> str:
+# Only used when the installed SDK has no async generate path
+_executor = ThreadPoolExecutor(max_workers=LLM_THREAD_POOL_SIZE, thread_name_prefix="gemini")
+
+@lru_cache(maxsize=LLM_MODEL_REGISTRY_SIZE)
+def get_model(system_instruction: str, model_name: str = LLM_MODEL_NAME) -> genai.GenerativeModel:
+    """One pre-configured model object per distinct system prompt, shared by all requests."""
+    logger.info(f"Registering model '{model_name}' for a new system prompt")
+    return genai.GenerativeModel(
+        model_name=model_name,
+        system_instruction=system_instruction
+    )
+
+async def generate(model: genai.GenerativeModel, user_query: str):
+    if hasattr(model, "generate_content_async"):
+        return await model.generate_content_async(user_query)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, model.generate_content, user_query)
+
+async def query_ai(user_query: str, system_prompt: str, response_format: str = "json", use_cache: bool = True) -> str:
     try:
-        system_instruction = (
-            system_prompt +
-            "\nIMPORTANT: Respond ONLY with valid JSON. Do not include markdown, code blocks, or extra text. The response must be parseable JSON."
-        )
-        
-        model = genai.GenerativeModel(
-            model_name="gemini-2.5-flash",
-            system_instruction=system_instruction
-        )
-
-        chat = model.start_chat()
-        response = chat.send_message(user_query)
-        # response = chat.send_message([
-        #     {"role": "system", "parts": [system_instruction]},
-        #     {"role": "user", "parts": [user_query]}
-        # ])
-
-        return response.text
+        system_instruction = system_prompt + JSON_RESPONSE_INSTRUCTION
+
+        cache_key = None
+        if use_cache:
+            cache_key = response_cache.make_key(system_instruction, user_query, LLM_MODEL_NAME)
+            cached = await response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("LLM response served from cache")
+                return cached
+
+        model = get_model(system_instruction)
+
+        # A single-turn generate call is equivalent to start_chat() + send_message(),
+        # without building a chat session per request.
+        response = await generate(model, user_query)
+        text = response.text
+
+        if cache_key:
+            await response_cache.set(cache_key, text, LLM_MODEL_NAME)
+
+        return text
 
     except Exception as e:
         logger.error("❌ Error querying AI", exc_info=True)
@@ -0,0 +1,98 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from cachetools import TTLCache
+from app.config.logger import get_logger
+from app.config.settings import settings
+from app.config.database_config.postgres import database as db
+from app.config.constants import LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS, LLM_CACHE_PURGE_EVERY
+
+logger = get_logger("API Logger")
+
+class ResponseCache:
+    """
+    Exact-match cache for LLM responses.
+    Tier 1 is an in-process LRU with TTL, tier 2 is an optional UNLOGGED Postgres
+    table shared by the API workers and the job listener.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, shared: bool = False):
+        self.local = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def make_key(system_prompt: str, user_prompt: str, model_name: str) -> str:
+        digest = hashlib.sha256()
+        for part in (model_name, system_prompt, user_prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def shared_available(self) -> bool:
+        return self.shared and db.is_connected
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.local.get(key)
+        if value is not None:
+            self.stats["local_hits"] += 1
+            return value
+
+        if self.shared_available():
+            try:
+                value = await db.fetch_val(
+                    "SELECT response FROM llm_response_cache WHERE cache_key = :key AND expires_at > NOW()",
+                    {"key": key}
+                )
+            except Exception as e:
+                logger.warning(f"Shared LLM cache lookup failed: {e}")
+                value = None
+
+            if value is not None:
+                self.stats["shared_hits"] += 1
+                self.local[key] = value
+                return value
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: str, model_name: str):
+        self.local[key] = value
+        self.stats["stores"] += 1
+        if self.stats["stores"] % LLM_CACHE_PURGE_EVERY == 0:
+            # The job listener has no stats endpoint, so each process also logs its own
+            logger.info(f"LLM response cache stats: {self.get_stats()}")
+
+        if not self.shared_available():
+            return
+
+        try:
+            await db.execute("""
+                INSERT INTO llm_response_cache (cache_key, model_name, response, expires_at)
+                VALUES (:key, :model_name, :response, :expires_at)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                    response = EXCLUDED.response,
+                    expires_at = EXCLUDED.expires_at
+            """, {
+                "key": key,
+                "model_name": model_name,
+                "response": value,
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+            })
+
+            if self.stats["stores"] % LLM_CACHE_PURGE_EVERY == 0:
+                await db.execute("DELETE FROM llm_response_cache WHERE expires_at <= NOW()")
+        except Exception as e:
+            logger.warning(f"Shared LLM cache write failed: {e}")
+
+    def get_stats(self) -> dict:
+        hits = self.stats["local_hits"] + self.stats["shared_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self.local),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+response_cache = ResponseCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS, shared=settings.LLM_CACHE_SHARED)
@@ -0,0 +1,97 @@
+import re
+import zlib
+import hashlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.config.logger import get_logger
+from app.config.settings import settings
+from app.config.constants import SEMANTIC_CACHE_CAPACITY, SEMANTIC_CACHE_DIM
+
+logger = get_logger("API Logger")
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "the", "me", "my", "i", "is", "are", "of", "for", "to", "in", "on",
+    "by", "per", "please", "can", "you", "could", "would", "what", "show", "give", "tell"
+}
+
+def tokenize(text: str) -> List[str]:
+    words = WORD_PATTERN.findall(text.lower())
+    content = [w for w in words if w not in STOPWORDS]
+    # Queries made only of stopwords ("what can you do") keep their words
+    return content or words
+
+def embed_text(text: str, dim: int = SEMANTIC_CACHE_DIM) -> np.ndarray:
+    """
+    Hashed n-gram embedding: word unigrams, word bigrams and character trigrams
+    hashed into a fixed-size vector and L2-normalised. Runs offline, no model download.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    words = tokenize(text)
+
+    features = [f"w:{w}" for w in words]
+    features += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+
+    for feature in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        # Word features carry more meaning than character trigrams
+        weight = 2.0 if feature[0] in "wb" else 1.0
+        vector[h % dim] += weight if (h >> 31) & 1 else -weight
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache over recent results, one ring buffer per namespace
+    (e.g. per system prompt). Lookups are a single matrix-vector product.
+    """
+
+    def __init__(self, capacity: int, threshold: float, dim: int = SEMANTIC_CACHE_DIM):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.dim = dim
+        self.spaces: Dict[str, Tuple[np.ndarray, List[Optional[dict]]]] = {}
+        self.positions: Dict[str, int] = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def namespace_for(key: str) -> str:
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def _space(self, namespace: str):
+        if namespace not in self.spaces:
+            self.spaces[namespace] = (np.zeros((self.capacity, self.dim), dtype=np.float32), [None] * self.capacity)
+            self.positions[namespace] = 0
+        return self.spaces[namespace]
+
+    def lookup(self, namespace: str, text: str) -> Optional[dict]:
+        if namespace not in self.spaces or not text.strip():
+            self.stats["misses"] += 1
+            return None
+
+        matrix, payloads = self.spaces[namespace]
+        scores = matrix @ embed_text(text, self.dim)
+        best = int(np.argmax(scores))
+
+        if payloads[best] is not None and scores[best] >= self.threshold:
+            self.stats["hits"] += 1
+            logger.info(f"Semantic cache hit (similarity={scores[best]:.3f})")
+            return dict(payloads[best])
+
+        self.stats["misses"] += 1
+        return None
+
+    def add(self, namespace: str, text: str, payload: dict):
+        if not text.strip():
+            return
+        matrix, payloads = self._space(namespace)
+        position = self.positions[namespace]
+        matrix[position] = embed_text(text, self.dim)
+        payloads[position] = dict(payload)
+        self.positions[namespace] = (position + 1) % self.capacity
+
+classification_cache = SemanticCache(SEMANTIC_CACHE_CAPACITY, settings.SEMANTIC_CACHE_THRESHOLD)
@@ -1,5 +1,3 @@
-CONCURRENCY_LIMIT_FOR_CSV_WORKER_TAKS = 5
-NO_OF_CSV_WORKER_TASKS = 5
 MAX_UPLOAD_RETRIES = 3
 SAMPLE_ROW_LIMIT = 20
 SCHEMA_BATCH_SIZE = 40
@@ -7,9 +5,77 @@ SCHEMA_BATCH_SIZE = 40
 MAX_RETRY_ATTEMPTS = 3
 MAX_EVAL_ITERATION = 3
 INITIAL_RETRY_DELAY = 1000  # milliseconds
+MAX_PARALLEL_SQL_QUERIES = 4
+
+LLM_MODEL_NAME = "gemini-2.5-flash"
+LLM_MODEL_REGISTRY_SIZE = 32
+LLM_THREAD_POOL_SIZE = 8
+LLM_CACHE_MAX_ENTRIES = 2048
+LLM_CACHE_TTL_SECONDS = 6 * 60 * 60
+LLM_CACHE_PURGE_EVERY = 500
+SEMANTIC_CACHE_CAPACITY = 1024
+SEMANTIC_CACHE_DIM = 512
+FAST_CLASSIFIER_MIN_CONFIDENCE = 0.9
+FAST_CLASSIFIER_MIN_SAMPLES = 50
+FAST_CLASSIFIER_RETRAIN_EVERY = 25
+FAST_CLASSIFIER_MAX_SAMPLES = 5000
 
 CSV_NOTIFY_CHANNEL = 'csv_job'
 EXCEL_NOTIFY_CHANNEL = 'excel_job'
+METADATA_NOTIFY_CHANNEL = 'metadata_changed'
+JOB_NOTIFY_CHANNELS = {'csv': CSV_NOTIFY_CHANNEL, 'excel': EXCEL_NOTIFY_CHANNEL}
+
+JOB_LEASE_SECONDS = 5 * 60
+JOB_HEARTBEAT_SECONDS = 60
+JOB_REAPER_INTERVAL_SECONDS = 60
+JOB_MAX_ATTEMPTS = 3
+# Idle workers look for jobs this often even without a NOTIFY
+JOB_POLL_INTERVAL_SECONDS = 30
+
+# Priority lanes: a pending job's priority is the sum of the weights of the lanes it is in.
+# A job waiting N * JOB_PRIORITY_AGING_SECONDS counts as at least priority N (capped at the
+# top lane), so large jobs still get their turn
+JOB_SMALL_FILE_BYTES = 5 * 1024 * 1024
+JOB_INTERACTIVE_MEDIUMS = {"WHATSAPP"}
+PAID_PLANS = {"pro", "business"}
+JOB_PRIORITY_WEIGHTS = {"small": 4, "interactive": 2, "paid": 1}
+JOB_PRIORITY_AGING_SECONDS = 5 * 60
+
+WORKER_NODE_HEARTBEAT_SECONDS = 30
+# /health/workers reports a node as down after this long without a heartbeat
+WORKER_NODE_STALE_SECONDS = 3 * WORKER_NODE_HEARTBEAT_SECONDS
+WORKER_NODE_RETENTION_HOURS = 24
+
+METADATA_CACHE_MAX_USERS = 1000
+METADATA_CACHE_TTL_SECONDS = 30 * 60
+METADATA_PROMPT_MAX_CHARS = 32000  # roughly 8k tokens
+TABLE_RETRIEVAL_TOP_K = 8
+RESULT_MAX_BYTES_PER_QUERY = 16 * 1024
+RESULT_HEAD_ROWS = 20
+RESULT_TAIL_ROWS = 5
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Files accepted per upload request, each up to MAX_UPLOAD_SIZE_MB
+UPLOAD_REQUEST_MAX_FILES = 10
+UPLOAD_MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+FILE_READ_CHUNK_SIZE = 1024 * 1024
+# Tasks queued per CPU pool process before callers wait
+CPU_POOL_MAX_IN_FLIGHT_PER_PROCESS = 2
+ENCODING_DETECTION_MAX_BYTES = 256 * 1024
+ENCODING_MIN_CONFIDENCE = 0.5
+CSV_PARALLEL_COPY_MIN_CHUNK_BYTES = 32 * 1024 * 1024
+EXCEL_COPY_BATCH_ROWS = 5000
+EXCEL_SHEET_CONCURRENCY = 4
+TYPE_INFERENCE_SAMPLE_ROWS = 1000
+SCHEMA_CACHE_VERSION = 1  # bump when SCHEMA_GENERATION changes shape
+SCHEMA_CACHE_INSIGHTS_MAX_AGE_DAYS = 30
+COLUMN_STATS_TOP_K = 10
+COLUMN_STATS_HISTOGRAM_BOUNDS = 11  # 10 buckets
+INDEX_ADVISOR_INTERVAL_SECONDS = 5 * 60
+INDEX_ADVISOR_MIN_USES = 5
+INDEX_ADVISOR_MIN_ROWS = 10000
+INDEX_ADVISOR_BRIN_MIN_CORRELATION = 0.9
+INDEX_ADVISOR_BATCH_SIZE = 5
+TYPE_INFERENCE_MAX_INVALID_RATIO = 0.02
 
 DATA_TIME_FORMAT = """
     Date Only:
@@ -11,8 +11,12 @@
 ####### META CLOUD API ########
 
 import requests
+from pathlib import Path
+from typing import Tuple
 from app.config.settings import settings
 from app.config.logger import get_logger
+from app.config.constants import UPLOAD_CHUNK_SIZE
+from app.utils.file_utils import UploadTooLargeError, save_chunks
 
 logger = get_logger("Meta API Logger")
 
@@ -69,12 +73,25 @@ class MetaWhatsAppChannel:
             logger.error(f"Error getting media URL for ID {media_id}: {e}")
             return None
 
-    def download_media(self, media_url: str) -> bytes | None:
+    def download_media(self, media_url: str, file_path: Path, max_bytes: int) -> Tuple[str, int] | None:
+        """
+        Streams a media file to file_path without holding it in memory.
+
+        Returns:
+            Tuple[str, int] | None: The sha256 hex digest and byte count, or None if the download fails.
+
+        Raises:
+            UploadTooLargeError: The media is larger than max_bytes.
+        """
         try:
-            response = requests.get(media_url, headers={"Authorization": self.headers["Authorization"]})
-            response.raise_for_status()
+            with requests.get(media_url, headers={"Authorization": self.headers["Authorization"]}, stream=True) as response:
+                response.raise_for_status()
+                content_length = response.headers.get("Content-Length", "")
+                if content_length.isdigit() and int(content_length) > max_bytes:
+                    raise UploadTooLargeError(f"Media at {media_url} is larger than {max_bytes} bytes")
+                result = save_chunks(response.iter_content(UPLOAD_CHUNK_SIZE), file_path, max_bytes, media_url)
             logger.info(f"Successfully downloaded media from {media_url}")
-            return response.content
+            return result
         except requests.exceptions.RequestException as e:
             logger.error(f"Error downloading media from {media_url}: {e}")
             return None
@@ -119,7 +119,7 @@ SQL_GENERATION_PROMPT = {
         1. Generate only **PostgreSQL**, not SQLite syntax.
         2. Query Strategy: Before generating SQL, decompose the user question into: (1) Required data elements, (2) Necessary calculations, (3) Expected output format. This ensures comprehensive coverage of the analytical need.
         3. Always use the **exact table and column names** from metadata — preserve spaces and case using double quotes.
-        4. Typecast all columns appropriately — all data is stored as TEXT in the database.
+        4. Respect the stored column types — tables whose schema has "storage": "typed" store each column as its `data_type`; all other tables store every column as TEXT.
         5. Round numeric outputs to 2 decimal places.
         6. Apply LIMIT 100 to non-aggregate queries for performance optimization (unless specified otherwise).
         7. Write independent queries per table. Each query should focus on a single table's data. Cross-table relationships will be handled through post-processing of individual query results.
@@ -159,7 +159,8 @@ SQL_GENERATION_PROMPT = {
         1. **Understand the user question**: Identify the intent, filters, comparisons, and expected outputs.
         2. **Analyze the metadata**:
         - Use the exact `table_name` and column names.
-        - Check schema to infer column types (since all data is TEXT).
+        - Check the schema for column types: `data_type` is the stored type when the schema has "storage": "typed", otherwise the column is stored as TEXT.
+        - Use `column_stats` (computed over the full table: row count, null share, approximate distinct values, range, most common values, histogram bounds) to choose exact filter values and realistic ranges — match the spelling and case of the listed common values.
         - Use `data_relationships` for interpreting how tables relate — but avoid SQL joins.
         3. **Determine table relevance**: Identify which tables are needed to answer the question and design queries accordingly.
 
@@ -169,7 +170,7 @@ SQL_GENERATION_PROMPT = {
         - Do not reference values from one table in filters of another.
         - Ensure each query is logically distinct and explores a different angle.
         - Do not synthesize or rename columns.
-        - All data is stored in TEXT format — always typecast columns explicitly in your SQL based on the schema. You must apply typecasting in SELECT, WHERE, GROUP BY, and ORDER BY clauses wherever numeric or date operations are used.
+        - Use natively typed columns (BIGINT, NUMERIC, BOOLEAN, DATE, TIME, TIMESTAMP, TIMESTAMPTZ) directly, without casts. TEXT columns holding numbers or dates must be typecast explicitly in SELECT, WHERE, GROUP BY, and ORDER BY clauses wherever numeric or date operations are used.
         - Include WHERE, GROUP BY, ORDER BY where needed.
         - Add LIMIT 100 on non-aggregate queries.
         - Handle NULLs safely in aggregations.
@@ -179,20 +180,23 @@ SQL_GENERATION_PROMPT = {
         - You will be given a JSON structure like this:
             ```json
             "schema": {
+                "storage": "typed",
                 "columns": [
                     {
                         "column_name": "age",
-                        "prefered_data_type": "INTEGER",
+                        "data_type": "BIGINT",
+                        "cast_failures": 0
                     },
                     {
                         "column_name": "created_at",
-                        "prefered_data_type": "DATE",
+                        "data_type": "DATE",
+                        "cast_failures": 3
                     }
                 ]
             }```
-        - Treat all columns in the actual database as TEXT. Use the prefered_data_type for each column from schema only to determine their intended types for casting.
-        - Apply typecasting explicitly in SELECT, WHERE, GROUP BY, ORDER BY, and aggregation clauses.
-        - For every column, apply guarded casting using CASE WHEN + regex to avoid SQL runtime errors.
+        - With "storage": "typed", every column already has its `data_type` in the database; do not cast it. `cast_failures` counts source values that could not be converted and are stored as NULL.
+        - Without "storage": "typed", treat all columns in the actual database as TEXT and use `data_type` only to determine their intended types for casting.
+        - For TEXT columns, apply typecasting explicitly in SELECT, WHERE, GROUP BY, ORDER BY, and aggregation clauses, using guarded casting with CASE WHEN + regex to avoid SQL runtime errors.
           example: 
           * Integers: CASE WHEN age ~ '^-?\\d+$' THEN age::INTEGER ELSE NULL END AS age
           * Floats / Numerics: CASE WHEN price ~ '^[-+]?\\d*\\.?\\d+$' THEN price::NUMERIC ELSE NULL END AS price
@@ -21,6 +21,22 @@ class Settings(BaseSettings):
     SHOPIFY_CLIENT_ID: str = None
     SHOPIFY_CLIENT_SECRET: str = None
     SHOPIFY_SCOPES: str = None
+    LLM_CACHE_SHARED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    TABLE_RETRIEVAL_EMBEDDINGS: bool = True
+    MAX_UPLOAD_SIZE_MB: int = 1024
+    SCHEMA_CACHE_ENABLED: bool = True
+    SCHEMA_CACHE_REFRESH_INSIGHTS: bool = False
+    CSV_PARALLEL_COPY_CHUNKS: int = 4
+    INDEX_ADVISOR_ENABLED: bool = True
+    INDEX_ADVISOR_BUDGET_MB: int = 512
+    CPU_POOL_PROCESSES: int = 0  # 0: one per core
+    WORKER_NODE_ID: str = ""  # empty: hostname:pid
+    CSV_WORKER_CONCURRENCY: int = 5
+    EXCEL_WORKER_CONCURRENCY: int = 2
+    SMALL_JOB_RESERVED_WORKERS: int = 1  # per job type; these only take files up to JOB_SMALL_FILE_BYTES
+    WORKER_DB_POOL_SIZE: int = 0  # 0: sized from the worker concurrency
+    WORKER_HEALTH_TOKEN: str = ""  # X-Health-Token that unlocks per-node details on /health/workers
     
     class Config:
         env_file = ".env"
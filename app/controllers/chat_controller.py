@@ -1,4 +1,5 @@
 import json
+import time
 import asyncio
 import random
 from typing import Dict, List, Optional, Any
@@ -9,6 +10,13 @@ from fastapi.responses import JSONResponse
 from app.config.logger import get_logger
 from app.config.database_config.postgres import database as db
 from app.ai.gemini import query_ai
+from app.ai.semantic_cache import classification_cache
+from app.ai.fast_classifier import fast_classifier
+from app.utils.metadata_cache import metadata_cache
+from app.utils.metadata_formatter import render_metadata, format_metadata, schema_names
+from app.utils.table_retrieval import select_relevant_tables, needs_full_metadata
+from app.utils.result_summary import summarize_rows
+from app.utils.index_advisor import index_advisor
 from app.utils.uniqueId import str_to_uuid
 from app.config.constants import MAX_RETRY_ATTEMPTS, MAX_EVAL_ITERATION, INITIAL_RETRY_DELAY
 
@@ -16,6 +24,7 @@ from app.config.constants import MAX_RETRY_ATTEMPTS, MAX_EVAL_ITERATION, INITIAL
 class QueryClassification(BaseModel):
     type: str  # 'general' | 'data_no_chart' | 'data_with_chart'
     message: str
+    tier: Optional[str] = None  # which classifier tier answered
 
 class QueryRequest(BaseModel):
     userQuery: str
@@ -82,15 +91,26 @@ def clean_json_string(json_str: str) -> str:
     
     return json_str
 
-async def classify_query(user_query: str) -> QueryClassification:
+async def classify_query(user_query: str, user_id = None) -> QueryClassification:
     """Classify user query"""
     from app.config.prompts.prompts import QUERY_CLASSIFICATION_PROMPT
     
     system_prompt = QUERY_CLASSIFICATION_PROMPT["systemPrompt"]
     user_prompt = f'Classify this query: "{user_query}"'
     
+    # Rules, paraphrase cache and the local model answer before falling back to the LLM
+    cache_namespace = classification_cache.namespace_for(system_prompt)
+    # Data rules only fire on the user's own table/column names, when their metadata is cached
+    cached = metadata_cache.get(user_id) if user_id else None
+    fast_result = fast_classifier.classify(cache_namespace, user_query, schema_names=schema_names(cached.rows) if cached else None)
+    if fast_result:
+        logger.info(f"Query classified by '{fast_result['tier']}' tier")
+        return QueryClassification(**fast_result)
+    
     async def classify_operation():
+        started = time.perf_counter()
         classification_response = await query_ai(user_prompt, system_prompt)
+        latency_ms = int((time.perf_counter() - started) * 1000)
         
         json_str = clean_json_string(str(classification_response))
         
@@ -105,7 +125,10 @@ async def classify_query(user_query: str) -> QueryClassification:
             # if parsed['type'] not in ['general', 'data_query_text', 'data_query_chart', 'data_query_combined', 'unsupported']:
             #     raise ValueError('Invalid classification type')
             
-            return QueryClassification(**parsed)
+            classification = QueryClassification(**parsed)
+            classification.tier = 'llm'
+            fast_classifier.learn(cache_namespace, user_query, classification.dict(), latency_ms)
+            return classification
         except (json.JSONDecodeError, ValueError) as e:
             logger.error(f'Failed to parse classification response: {json_str}, {e}')
             # Return default classification
@@ -143,7 +166,7 @@ async def generate_sql_queries(
     """
     
     async def generate_operation():
-        return await query_ai(user_prompt, system_prompt)
+        return await query_ai(user_prompt, system_prompt, use_cache=False)
     
     return await retry_operation(generate_operation, 'SQL Multi-Query Generation')
 
@@ -154,7 +177,7 @@ async def generate_analysis(query_results: str, user_query: str, classification_
     system_prompt = GENERATE_ANALYSIS_FOR_USER_QUERY_PROMPT["systemPrompt"]
     user_prompt = f"""
         Context:
-        - Query Results: {json.dumps(query_results)}
+        - Query Results: {query_results}
         - Original User Question: {user_query}
         - Query Classification Message: {classification_type}
 
@@ -162,7 +185,7 @@ async def generate_analysis(query_results: str, user_query: str, classification_
     """
     
     async def analysis_operation():
-        analysis_response = await query_ai(user_prompt, system_prompt)
+        analysis_response = await query_ai(user_prompt, system_prompt, use_cache=False)
         dirty_string = str(analysis_response)
         
         try:
@@ -201,7 +224,7 @@ async def analysis_evaluation(analysis_data: Any, query_results: str, user_query
     """
     
     async def eval_operation():
-        analysis_response = await query_ai(user_prompt, system_prompt)
+        analysis_response = await query_ai(user_prompt, system_prompt, use_cache=False)
         
         # Handle different response types
         if isinstance(analysis_response, bytes):
@@ -231,58 +254,45 @@ async def analysis_evaluation(analysis_data: Any, query_results: str, user_query
     
     return await retry_operation(eval_operation, 'LLM Answer Evaluation')
 
-async def fetch_user_files(user_id: str) -> Optional[Dict[str, Any]]:
-    """Fetch user files from database"""
-    try:
-        query = """
-            SELECT file_name
-            FROM analysis_data 
-            WHERE id= :user_id
-        """
-        result = await db.fetch_all(query, {"user_id": user_id})
-        logger.info(f"Checked user's files with id={user_id} successfully")
-    except Exception as e:
-        logger.error(f"Issue while checking user's file, userid={user_id}: {e}")
-    finally:
-        return {"rows": result} if result else None
-
 async def fetch_user_metadata(user_id: str) -> Optional[List[Dict[str, Any]]]:
     """Fetch user metadata from database"""
+    cached = metadata_cache.get(user_id)
+    if cached:
+        logger.info(f"Serving user's metadata from cache, id={user_id}")
+        return cached.rows
+    
+    version = metadata_cache.version(user_id)
     try:
         query = """
-            SELECT table_name, file_name, schema, column_insights
-            FROM analysis_data 
-            WHERE id= :user_id
+            SELECT a.table_name, a.file_name, a.schema, a.column_insights,
+                (
+                    SELECT jsonb_object_agg(s.column_name, jsonb_build_object(
+                        'rows', s.row_count, 'null_frac', s.null_frac, 'distinct', s.distinct_estimate,
+                        'min', s.min_value, 'max', s.max_value, 'top_values', s.top_values, 'histogram', s.histogram
+                    ))
+                    FROM column_stats s
+                    WHERE s.user_id = a.id AND s.table_name = a.table_name
+                ) AS column_stats
+            FROM analysis_data a
+            WHERE a.id = :user_id
         """
         result = await db.fetch_all(query, {"user_id": user_id})
         logger.info(f"Successfully fetched user's metadata with id={user_id}")
     except Exception as e:
         logger.error(f"Issue while fetching user's metadata, userid={user_id}: {e}")
         result = None
-    finally:
-        return [dict(record) for record in result] if result else None
-
-def flatten_and_format(data: Any, indent: int = 0) -> str:
-    """Flatten and format data structure"""
-    output = ''
-    indent_str = '  ' * indent
-    
-    if isinstance(data, dict):
-        for key, value in data.items():
-            if isinstance(value, (dict, list)):
-                output += f'{indent_str}{key}:\n{flatten_and_format(value, indent + 1)}\n'
-            else:
-                output += f'{indent_str}{key}: {value}\n'
-    elif isinstance(data, list):
-        for item in data:
-            if isinstance(item, (dict, list)):
-                output += f'{indent_str}- {flatten_and_format(item, indent + 1)}\n'
-            else:
-                output += f'{indent_str}- {item}\n'
-    else:
-        output += f'{indent_str}{data}\n'
     
-    return output.strip()
+    rows = [dict(record) for record in result] if result else None
+    if rows:
+        metadata_cache.put(user_id, version, rows, render_metadata(rows))
+    return rows
+
+def get_structured_metadata(user_id: str, user_metadata: List[Dict[str, Any]], user_query: str) -> str:
+    """Prompt text for the metadata, trimmed to the tables and columns relevant to the question when too large"""
+    cached = metadata_cache.get(user_id)
+    # The cached rendering covers every table, so it only applies to the full set
+    rendered = cached.prompt if cached and len(cached.rows) == len(user_metadata) else None
+    return format_metadata(user_metadata, user_query, rendered=rendered)
 
 def parse_generated_queries(generated_queries_raw: Any) -> Optional[List[Dict[str, Any]]]:
     """Parse generated SQL queries"""
@@ -328,7 +338,9 @@ async def execute_query(sql_query: str) -> List[Dict[str, Any]]:
         result = await db.fetch_all(sql_query)
         return [dict(row) for row in result]
     
-    return await retry_operation(query_operation, 'SQL Query Execution')
+    rows = await retry_operation(query_operation, 'SQL Query Execution')
+    index_advisor.record(sql_query)
+    return rows
 
 async def execute_parsed_queries(queries_with_charts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Execute parsed queries"""
@@ -368,11 +380,17 @@ async def response_user_query(request: Request, response: Response) -> JSONRespo
         user_id = str_to_uuid(user.get("id"))
         logger.info(f"Processing query request for user: {user_id}, query: {user_query}")
         
-        # 1. Classify user query
-        classification = await classify_query(user_query)
+        # 1. Classify user query, loading the metadata concurrently since it doesn't depend on the classification
+        metadata_task = asyncio.create_task(fetch_user_metadata(user_id))
+        try:
+            classification = await classify_query(user_query, user_id)
+        except Exception:
+            metadata_task.cancel()
+            raise
         logger.info(f"Query classification: {classification.dict()}")
         
         if classification.type in ['general', 'unsupported']:
+            metadata_task.cancel()
             return JSONResponse(
                 status_code=200,
                 content={
@@ -384,20 +402,13 @@ async def response_user_query(request: Request, response: Response) -> JSONRespo
                 }
             )
         
-        # Check if user has files
-        user_files = await fetch_user_files(user_id)
-        if not user_files:
-            raise HTTPException(status_code=404, detail="Add files first")
-        
-        # 2. Fetch metadata
-        user_metadata = await fetch_user_metadata(user_id)
+        # 2. Metadata (an empty result means the user hasn't uploaded any files)
+        user_metadata = await metadata_task
         if not user_metadata:
-            raise HTTPException(
-                status_code=404, 
-                detail="Either user not exist or data is not present"
-            )
+            raise HTTPException(status_code=404, detail="Add files first")
         
-        structured_metadata = flatten_and_format(user_metadata)
+        relevant_metadata = select_relevant_tables(user_metadata, user_query)
+        structured_metadata = get_structured_metadata(user_id, relevant_metadata, user_query)
         # logger.info(f"Metadata: {structured_metadata}")
         
         # 3. Generate and evaluate queries with retry
@@ -412,6 +423,15 @@ async def response_user_query(request: Request, response: Response) -> JSONRespo
             )      
                               
             parsed_queries = parse_generated_queries(generated_queries_raw)
+            if needs_full_metadata(parsed_queries, relevant_metadata, user_metadata):
+                logger.info("Generated SQL needs tables outside the selected ones, retrying with all tables")
+                relevant_metadata = user_metadata
+                structured_metadata = get_structured_metadata(user_id, user_metadata, user_query)
+                generated_queries_raw = await generate_sql_queries(
+                    user_query, classification.type, structured_metadata, llm_suggestions
+                )
+                parsed_queries = parse_generated_queries(generated_queries_raw)
+            
             if not parsed_queries:
                 logger.warning('Failed to parse generated queries')
                 continue
@@ -439,7 +459,7 @@ async def response_user_query(request: Request, response: Response) -> JSONRespo
             if query_results and query_results[0] and query_results[0].get('results'):
                 logger.info("Executing in loop")
                 structured_result = '\n'.join([
-                    f"Query {i + 1}:\n{val['query']}\nResults:\n{json.dumps(val['results'], indent=2, default=str)}\n"
+                    f"Query {i + 1}:\n{val['query']}\nResults:\n{summarize_rows(val['results'])}\n"
                     if val.get('results') else
                     f"Query {i + 1}:\n{val['query']}\nError:\n{val.get('error', 'No results and no error message.')}\n"
                     for i, val in enumerate(query_results)
@@ -3,6 +3,8 @@ from starlette.websockets import WebSocketState
 from app.utils.uniqueId import str_to_uuid
 from app.config.logger import get_logger
 from app.helper.query_analysis_helper import *
+from app.utils.table_retrieval import select_relevant_tables, needs_full_metadata
+from app.utils.result_summary import summarize_rows
 import asyncio
 from app.config.constants import MAX_EVAL_ITERATION
 
@@ -12,21 +14,29 @@ async def process_user_query(websocket: WebSocket, user_query: str, user_id: str
     try:
         # 1. Classify user query
         await send_socket_message(websocket, 'thinking', 'Classifying your query...')
-        classification = await classify_query(user_query)
+        # Metadata doesn't depend on the classification, so it loads while the LLM classifies
+        metadata_task = asyncio.create_task(fetch_user_metadata(user_id))
+        try:
+            classification = await classify_query(user_query, user_id=user_id)
+        except Exception:
+            metadata_task.cancel()
+            raise
         
         if classification.type in ['general', 'unsupported']:
+            metadata_task.cancel()
             await send_socket_message(websocket, classification.type, classification.message)
             return
         else:
             await send_socket_message(websocket, 'thinking', classification.user_message)
         
         await send_socket_message(websocket, 'thinking', 'Fetching necessary data...')
-        user_metadata = await fetch_user_metadata(user_id)
+        user_metadata = await metadata_task
         if not user_metadata:
             await send_socket_message(websocket, 'error', 'Data is not present. Upload it first')
             return
         
-        structured_metadata = flatten_and_format(user_metadata)
+        relevant_metadata = select_relevant_tables(user_metadata, user_query)
+        structured_metadata = get_structured_metadata(user_id, relevant_metadata, user_query)
         
         # 3. Generate and evaluate queries
         llm_suggestions = None
@@ -42,6 +52,14 @@ async def process_user_query(websocket: WebSocket, user_query: str, user_id: str
             # logger.info(f"Queries by LLM: {parse_generated_queries}")
             
             parsed_queries = parse_generated_queries(generated_queries_raw)
+            if needs_full_metadata(parsed_queries, relevant_metadata, user_metadata):
+                logger.info("Generated SQL needs tables outside the selected ones, retrying with all tables")
+                relevant_metadata = user_metadata
+                structured_metadata = get_structured_metadata(user_id, user_metadata, user_query)
+                generated_queries_raw = await generate_sql_queries(
+                    user_query, classification.type, structured_metadata, llm_suggestions
+                )
+                parsed_queries = parse_generated_queries(generated_queries_raw)
             if not parsed_queries:
                 await send_socket_message(websocket, 'thinking', 'An error occur while parsing queries')
                 logger.error('Failed to parse generated queries')
@@ -68,7 +86,7 @@ async def process_user_query(websocket: WebSocket, user_query: str, user_id: str
                     if val.get('results'):
                         result_str = (
                             f"Query {i + 1}:\n{val['query']}\nResults:\n"
-                            f"{json.dumps(val['results'], indent=2, default=str)}\n"
+                            f"{summarize_rows(val['results'])}\n"
                         )
                         await send_socket_message(websocket, 'thinking', f"Result {i + 1}: {val['results']}")
                     else:
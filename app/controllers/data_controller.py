@@ -1,11 +1,15 @@
-from fastapi import UploadFile,  Request, status, HTTPException
+from fastapi import Request, status, HTTPException
 from fastapi.responses import JSONResponse
-from typing import List
+import re
+import json
 from pathlib import Path
 from app.config.logger import get_logger
 from app.config.database_config.postgres import database as db
 from app.utils.uniqueId import generate_unique_id, str_to_uuid
-from app.utils.db_utils import update_job_queue
+from app.utils.db_utils import update_job_queue, notify_metadata_changed_db, find_duplicate_upload
+from app.utils.file_utils import stream_upload_files, UploadTooLargeError, TooManyFilesError
+from app.config.constants import UPLOAD_REQUEST_MAX_FILES
+from app.config.settings import settings
 
 logger = get_logger("API Logger")
 
@@ -17,13 +21,13 @@ async def check_user_exists(userid, email):
         logger.error(f"Error while checking user in db: {error}")
         raise
 
-async def check_upload_status(queue_name, user_id, upload_id):
+async def check_upload_status(job_type, user_id, upload_id):
     try:
         result = await db.fetch_one(
                     f"""
-                    SELECT progress, status
-                    FROM {queue_name}
-                    WHERE upload_id = :upload_id AND user_id = :user_id
+                    SELECT progress, status{", sheet_progress" if job_type == "excel" else ""}
+                    FROM ingest_jobs
+                    WHERE upload_id = :upload_id AND user_id = CAST(:user_id AS UUID)
                     """,
                     values={"upload_id": upload_id, "user_id": user_id}
                 )   
@@ -36,12 +40,16 @@ async def remove_upload_data(userid, upload_id):
     table_name = f"table_{upload_id}"
     try:
         async with db.transaction():
-            await db.execute(f'DROP TABLE IF EXISTS "{table_name}"')
-
-            await db.execute(
-                "DELETE FROM analysis_data WHERE id = :userid AND table_name = :table_name",
-                {"userid": userid, "table_name": table_name}
+            # Workbooks also have one table_<upload id>_<n> per additional sheet
+            rows = await db.fetch_all(
+                "DELETE FROM analysis_data WHERE id = :userid AND (table_name = :table_name OR table_name ~ :sheet_tables) RETURNING table_name",
+                {"userid": userid, "table_name": table_name, "sheet_tables": f"^{re.escape(table_name)}_[0-9]+$"}
             )
+            for name in {table_name, *(row["table_name"] for row in rows)}:
+                await db.execute(f'DROP TABLE IF EXISTS "{name}"')
+
+            # Delivered on commit
+            await notify_metadata_changed_db(userid, logger)
         logger.info(f"Removed table data for userid: {userid} and upload_id: {upload_id} successfully")
         return True
     except Exception as error:
@@ -51,7 +59,7 @@ async def remove_upload_data(userid, upload_id):
         raise
     
 
-async def file_upload_handler(request: Request, files: List[UploadFile]):
+async def file_upload_handler(request: Request):
     try:
         logger.info("File uploading starts")
         user = request.session.get("user")
@@ -64,11 +72,8 @@ async def file_upload_handler(request: Request, files: List[UploadFile]):
         userid = user.get("id")
         email = user.get("email")
 
-        if not isinstance(files, list):
-            files = [files]
-            
-        if not files or not userid or not email:
-            logger.error("Missing required fields", extra={"userid": userid, "email": email, "files": len(files)})
+        if not userid or not email:
+            logger.error("Missing required fields", extra={"userid": userid, "email": email})
             return JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={
@@ -77,11 +82,7 @@ async def file_upload_handler(request: Request, files: List[UploadFile]):
                     "status": "Failed"
                 }
             )
-                    
-        logger.info(f"FILES RECEIVED: {len(files)} file(s)")
-        # logger.info("TYPES:", [type(f) for f in files])
-        
-        
+
         user_exists = await check_user_exists(str_to_uuid(userid), email)
         if not user_exists:
             logger.error("User not found", extra={"email": email})
@@ -94,30 +95,76 @@ async def file_upload_handler(request: Request, files: List[UploadFile]):
                 }
             )
 
+        # Saving the files temporarily, named by upload id so concurrent uploads of the same file name don't collide
+        temp_dir = Path("/tmp/uploads")
+        temp_dir.mkdir(parents=True, exist_ok=True)
+
+        # if settings.ENV == 'development':
+        #     temp_dir = Path("/tmp/uploads")
+        #     temp_dir.mkdir(parents=True, exist_ok=True)
+        #     file_path = temp_dir / file.filename
+        # else:
+        #     file_path = upload_to_supabase(file, userid)
+
+        # The body is parsed as it arrives, so an oversized file is rejected before it is read in full
+        try:
+            files = await stream_upload_files(
+                request,
+                lambda filename: temp_dir / f"{generate_unique_id()}{Path(filename).suffix.lower()}",
+                settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024,
+                UPLOAD_REQUEST_MAX_FILES,
+            )
+        except UploadTooLargeError as error:
+            logger.warning(f"Rejected oversized upload: {error}")
+            return JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"success": False, "message": f"File exceeds the {settings.MAX_UPLOAD_SIZE_MB} MB upload limit", "status": "Failed"}
+            )
+        except (TooManyFilesError, ValueError) as error:
+            logger.warning(f"Rejected upload: {error}")
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"success": False, "message": str(error), "status": "Failed"}
+            )
+
+        if not files:
+            logger.error("Missing required fields", extra={"userid": userid, "email": email, "files": 0})
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={
+                    "success": False,
+                    "message": "At least one file and email are required",
+                    "status": "Failed"
+                }
+            )
+
+        logger.info(f"FILES RECEIVED: {len(files)} file(s)")
+
         upload_results = []
 
         for file in files:
             try:
-                ext = Path(file.filename).suffix.lower()
-                unique_table_id = generate_unique_id()
+                file_path = file["file_path"]
+                ext = file_path.suffix
+                unique_table_id = file_path.stem
                 table_name = f"table_{unique_table_id}"
                 queue_name = ''
-
-                # Saving the file temporarily
-                temp_dir = Path("/tmp/uploads")
-                temp_dir.mkdir(parents=True, exist_ok=True)
-                file_path = temp_dir / file.filename
+                content_hash, byte_size = file["content_hash"], file["byte_size"]
                 
-                # if settings.ENV == 'development':
-                #     temp_dir = Path("/tmp/uploads")
-                #     temp_dir.mkdir(parents=True, exist_ok=True)
-                #     file_path = temp_dir / file.filename
-                # else:
-                #     file_path = upload_to_supabase(file, userid)
-
-                with open(file_path, "wb") as f:
-                    content = await file.read()
-                    f.write(content)
+                # Identical bytes already ingested (or being ingested): reuse that upload
+                existing_upload_id = await find_duplicate_upload(userid, content_hash, logger)
+                if existing_upload_id:
+                    file_path.unlink(missing_ok=True)
+                    logger.info(f"Duplicate of upload {existing_upload_id}, skipping ingestion", extra={"file": file["filename"]})
+                    upload_results.append({
+                        "success": True,
+                        "message": "Identical file already uploaded",
+                        "originalFileName": file["filename"],
+                        "uploadId": existing_upload_id,
+                        "queue_name": "csv_queue" if ext == ".csv" else "excel_queue",
+                        "duplicate": True
+                    })
+                    continue
 
                 job_data = {
                     "filePath": str(file_path),
@@ -125,17 +172,19 @@ async def file_upload_handler(request: Request, files: List[UploadFile]):
                     "userid": userid,
                     "email": email,
                     "uploadId": unique_table_id,
-                    "originalFileName": file.filename
+                    "originalFileName": file["filename"],
+                    "contentHash": content_hash,
+                    "byteSize": byte_size
                 }
 
-                logger.info("Processing file", extra={"file": file.filename, "tableName": table_name})
+                logger.info("Processing file", extra={"file": file["filename"], "tableName": table_name})
 
                 if ext == ".csv":
                     queue_name = "csv_queue"
-                    await update_job_queue(job_data, queue_name, "csv_job", "csv", logger)
+                    await update_job_queue(job_data, "csv", logger)
                 elif ext in [".xlsx", ".xls"]:
                     queue_name = "excel_queue"
-                    await update_job_queue(job_data, queue_name, "excel_job", "excel", logger)
+                    await update_job_queue(job_data, "excel", logger)
                 # elif ext == ".json":
                 #     await json_queue.enqueue(job_data)
                 else:
@@ -144,7 +193,7 @@ async def file_upload_handler(request: Request, files: List[UploadFile]):
                 upload_results.append({
                     "success": True,
                     "message": "Upload accepted",
-                    "originalFileName": file.filename,
+                    "originalFileName": file["filename"],
                     "uploadId": unique_table_id,
                     "queue_name": queue_name
                 })
@@ -155,7 +204,7 @@ async def file_upload_handler(request: Request, files: List[UploadFile]):
                     "success": False,
                     "message": "Failed to process file",
                     "error": str(error),
-                    "fileName": file.filename,
+                    "fileName": file["filename"],
                     "status": "failed"
                 })
 
@@ -194,13 +243,14 @@ async def file_upload_status_check(request: Request):
                 }
             )
         
-        if file_type == 'csv':
-            queue_name = "csv_queue"
-        else:
-            queue_name = "excel_queue"
+        job_type = 'csv' if file_type == 'csv' else 'excel'
         
-        info = await check_upload_status(queue_name, user_id, upload_id)
+        info = await check_upload_status(job_type, user_id, upload_id)
         if info:
+            info = dict(info)
+            # Workbooks report each sheet's table, progress and status
+            if isinstance(info.get("sheet_progress"), str):
+                info["sheet_progress"] = json.loads(info["sheet_progress"])
             return {
                 "success": True,
                 "message": info
@@ -2,13 +2,17 @@ from fastapi import Request, Response, status, BackgroundTasks, Query
 from app.config.logger import get_logger
 from app.helper.query_analysis_helper import *
 from app.helper.shopify_query_analysis_helper import *
+from app.utils.table_retrieval import select_relevant_tables, needs_full_metadata
+from app.utils.result_summary import summarize_rows
 from app.utils.whatsapp_message import send_whatsapp_message, mark_user_message_as_read, send_typing_indicator
-from app.utils.db_utils import update_job_queue, get_user_id_from_registered_no, delete_multiple_tables, fetch_shopify_credentials
+from app.utils.db_utils import update_job_queue, get_user_id_from_registered_no, delete_multiple_tables, fetch_shopify_credentials, find_duplicate_upload
 from app.utils.uniqueId import generate_unique_id
+from app.utils.file_utils import UploadTooLargeError
 from app.config.integration_config.whatsapp import whatsapp_channel
 from app.config.settings import settings
 from pathlib import Path
 from app.config.constants import MAX_EVAL_ITERATION
+import asyncio
 import json
 
 logger = get_logger("Whatsapp Logger")
@@ -45,23 +49,32 @@ async def download_and_process_file_job(userid: str, media_id: str, filename: st
         if not file_url:
             raise ValueError(f"Could not retrieve media URL for media ID: {media_id}")
 
-        # Step 2: Downloading the file content using the URL
-        file_content = whatsapp_channel.download_media(file_url)
-        if not file_content:
-            raise ValueError(f"Failed to download file content from URL: {file_url}")
-
-        # Step 3: Saving the file temporarily
+        # Step 2: Streaming the file from the URL straight to a temporary file
+        ext = Path(filename).suffix.lower()
+        unique_table_id = generate_unique_id()
+        table_name = f"table_{unique_table_id}"
+        
         temp_dir = Path("/tmp/uploads")
         temp_dir.mkdir(parents=True, exist_ok=True)
-        file_path = temp_dir / filename
+        file_path = temp_dir / f"{unique_table_id}{ext}"
+        
+        try:
+            downloaded = await asyncio.to_thread(whatsapp_channel.download_media, file_url, file_path, settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024)
+        except UploadTooLargeError as error:
+            logger.warning(f"Rejected oversized upload: {error}")
+            send_whatsapp_message(sender_no, f"{filename} exceeds the {settings.MAX_UPLOAD_SIZE_MB} MB upload limit.", logger)
+            return
+        if not downloaded:
+            raise ValueError(f"Failed to download file content from URL: {file_url}")
+        content_hash, byte_size = downloaded
         
-        with open(file_path, "wb") as f:
-            f.write(file_content)
+        existing_upload_id = await find_duplicate_upload(userid, content_hash, logger)
+        if existing_upload_id:
+            file_path.unlink(missing_ok=True)
+            send_whatsapp_message(sender_no, f"{filename} is already uploaded (UploadID: {existing_upload_id}).", logger)
+            return
         
-        # Step 4: Updating the job queue
-        ext = Path(filename).suffix.lower()
-        unique_table_id = generate_unique_id()
-        table_name = f"table_{unique_table_id}"
+        # Step 3: Updating the job queue
         
         job_data = {
             "filePath": str(file_path),
@@ -69,6 +82,8 @@ async def download_and_process_file_job(userid: str, media_id: str, filename: st
             "userid": str(userid),
             "uploadId": unique_table_id,
             "originalFileName": filename,
+            "contentHash": content_hash,
+            "byteSize": byte_size,
             "medium": "WHATSAPP",
             "receiver_no": sender_no
         }
@@ -76,12 +91,10 @@ async def download_and_process_file_job(userid: str, media_id: str, filename: st
         logger.info("Processing file", extra={"file": filename, "tableName": table_name})
 
         if ext == ".csv":
-            queue_name = "csv_queue"
-            await update_job_queue(job_data, queue_name, "csv_job", "csv", logger)
+            await update_job_queue(job_data, "csv", logger)
             send_whatsapp_message(sender_no, f"Upload for uploadID: {unique_table_id} is in progress. I will notify you once completed.", logger)
         elif ext in [".xlsx", ".xls"]:
-            queue_name = "excel_queue"
-            await update_job_queue(job_data, queue_name, "excel_job", "excel", logger)
+            await update_job_queue(job_data, "excel", logger)
             send_whatsapp_message(sender_no, f"Upload for uploadID: {unique_table_id} is in progress. I will notify you once completed.", logger)
         else:
             raise ValueError(f"Unsupported file format: {ext}")
@@ -117,7 +130,7 @@ async def process_shopify_analysis(user_msg: str, sender_no: str, classification
                     if val.get('data') is not None:
                         result_str = (
                             f"Query {i + 1}:\n{val['query']}\nResults:\n"
-                            f"{json.dumps(val['data'], indent=2, default=str)}\n"
+                            f"{summarize_rows(val['data'])}\n"
                         )
                     else:
                         result_str = (
@@ -159,8 +172,10 @@ async def process_shopify_analysis(user_msg: str, sender_no: str, classification
         logger.error(f"Error in Shopify analysis: {e}")
         raise
 
-async def process_analysis(user_msg: str, sender_no: str, classification, structured_metadata):
+async def process_analysis(user_msg: str, sender_no: str, classification, userid: str, user_metadata):
     try:
+        relevant_metadata = select_relevant_tables(user_metadata, user_msg)
+        structured_metadata = get_structured_metadata(userid, relevant_metadata, user_msg)
         llm_suggestions = None
         analysis_results = None
         for attempt in range(1, MAX_EVAL_ITERATION + 1):
@@ -171,6 +186,14 @@ async def process_analysis(user_msg: str, sender_no: str, classification, struct
             )
             
             parsed_queries = parse_generated_queries(generated_queries_raw)
+            if needs_full_metadata(parsed_queries, relevant_metadata, user_metadata):
+                logger.info("Generated SQL needs tables outside the selected ones, retrying with all tables")
+                relevant_metadata = user_metadata
+                structured_metadata = get_structured_metadata(userid, user_metadata, user_msg)
+                generated_queries_raw = await generate_sql_queries(
+                    user_msg, classification.type, structured_metadata, llm_suggestions
+                )
+                parsed_queries = parse_generated_queries(generated_queries_raw)
             if not parsed_queries:
                 logger.error('Failed to parse generated queries')
                 continue 
@@ -194,7 +217,7 @@ async def process_analysis(user_msg: str, sender_no: str, classification, struct
                     if val.get('results'):
                         result_str = (
                             f"Query {i + 1}:\n{val['query']}\nResults:\n"
-                            f"{json.dumps(val['results'], indent=2, default=str)}\n"
+                            f"{summarize_rows(val['results'])}\n"
                         )
                     else:
                         result_str = (
@@ -237,20 +260,27 @@ async def process_analysis(user_msg: str, sender_no: str, classification, struct
 
 async def process_query_message(userid: str, user_msg: str, sender_no: str):
     try:
-        classification = await classify_query(user_msg, "WhatsApp")
+        # Metadata doesn't depend on the classification, so it loads while the LLM classifies
+        metadata_task = asyncio.create_task(fetch_user_metadata(userid))
+        try:
+            classification = await classify_query(user_msg, "WhatsApp", userid)
+        except Exception:
+            metadata_task.cancel()
+            raise
+        
         if classification.type in ['general', 'file_management', 'integration_management', 'unsupported']:
+            metadata_task.cancel()
             send_whatsapp_message(sender_no, classification.message, logger)
             return
         
-        user_metadata = await fetch_user_metadata(userid)
+        user_metadata = await metadata_task
         if not user_metadata:
             send_whatsapp_message(sender_no, "You don't have any data uploaded.", logger)
             return
         
-        structured_metadata = flatten_and_format(user_metadata)
-        
         if classification.type in ['check_upload', 'delete_upload']:
             try:
+                structured_metadata = get_structured_metadata(userid, user_metadata, user_msg)
                 selected_list = await data_management_selection(
                     user_msg, classification.type, structured_metadata
                 )
@@ -260,7 +290,7 @@ async def process_query_message(userid: str, user_msg: str, sender_no: str):
                     send_whatsapp_message(sender_no, f"*Your Uploaded Data -*\n{data} ", logger)
                 else:
                     data = ", ".join(selected_list['files'])
-                    await delete_multiple_tables(selected_list['files'], selected_list['tables'], logger)
+                    await delete_multiple_tables(selected_list['files'], selected_list['tables'], logger, userid)
                     send_whatsapp_message(sender_no, f"*Your Uploaded Data*\n{data}\n*Deleted successfully*", logger)
                 return
             except Exception as e:
@@ -275,7 +305,7 @@ async def process_query_message(userid: str, user_msg: str, sender_no: str):
                 return
             await process_shopify_analysis(user_msg, sender_no, classification.message, shop, access_token)
         else:
-            await process_analysis(user_msg, sender_no, classification, structured_metadata)
+            await process_analysis(user_msg, sender_no, classification, userid, user_metadata)
         return
     except Exception as e:
         raise
@@ -1,16 +1,70 @@
 import aiofiles
-from pathlib import Path
-from typing import Dict
+import codecs
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import asyncpg
-import chardet
+from chardet.universaldetector import UniversalDetector
 from fastapi import HTTPException, status
 from app.config.logger import get_logger
+from app.config.settings import settings
+from app.config.constants import ENCODING_DETECTION_MAX_BYTES, ENCODING_MIN_CONFIDENCE, FILE_READ_CHUNK_SIZE, CSV_PARALLEL_COPY_MIN_CHUNK_BYTES
+from app.utils.cpu_pool import run_cpu
 import asyncio
 import os
 
 logger = get_logger("CSV Worker")
 
-async def get_sample_rows(file_path: str, sample_size: int) -> Dict[str, str]:
+def _detect_encoding(file_path: str, max_bytes: Optional[int] = ENCODING_DETECTION_MAX_BYTES) -> str:
+    detector = UniversalDetector()
+    with open(file_path, 'rb') as f:
+        read = 0
+        while (max_bytes is None or read < max_bytes) and not detector.done:
+            chunk = f.read(FILE_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            detector.feed(chunk)
+            read += len(chunk)
+    detector.close()
+
+    encoding = detector.result.get('encoding')
+    confidence = detector.result.get('confidence') or 0.0
+    if not encoding or confidence < ENCODING_MIN_CONFIDENCE:
+        return 'utf-8'
+    # An ASCII prefix says nothing about the rest of the file; UTF-8 is its superset
+    if encoding.lower() == 'ascii':
+        return 'utf-8'
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return 'utf-8'
+
+async def detect_encoding(file_path: str) -> str:
+    """Incremental detection over at most ENCODING_DETECTION_MAX_BYTES, stopping once chardet is confident."""
+    encoding = await run_cpu(_detect_encoding, file_path)
+    logger.info(f"Detected encoding '{encoding}' for {file_path}")
+    return encoding
+
+def _transcode_chunk(encoding: str, state: Optional[Tuple[bytes, int]], chunk: bytes, final: bool) -> Tuple[bytes, Tuple[bytes, int]]:
+    # Decoder state (a split multi-byte sequence, BOM handling) is carried between calls,
+    # since consecutive chunks may run in different processes
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    if state:
+        decoder.setstate(state)
+    text = decoder.decode(chunk, final)
+    return text.encode('utf-8'), decoder.getstate()
+
+async def transcode_to_utf8(file_path: str, encoding: str) -> AsyncIterator[bytes]:
+    """Yields the file re-encoded as UTF-8, one chunk at a time, decoding in the CPU pool."""
+    state = None
+    async with aiofiles.open(file_path, 'rb') as f:
+        while chunk := await f.read(FILE_READ_CHUNK_SIZE):
+            data, state = await run_cpu(_transcode_chunk, encoding, state, chunk, False)
+            if data:
+                yield data
+    tail, _ = await run_cpu(_transcode_chunk, encoding, state, b'', True)
+    if tail:
+        yield tail
+
+async def get_sample_rows(file_path: str, sample_size: int, encoding: str = 'utf-8') -> Dict[str, str]:
     
     # Running the blocking os.path.exists call in a separate thread
     if not await asyncio.to_thread(os.path.exists, file_path):
@@ -18,7 +72,7 @@ async def get_sample_rows(file_path: str, sample_size: int) -> Dict[str, str]:
 
     try:
         rows: Dict[str, str] = {}
-        async with aiofiles.open(file_path, mode='r', encoding='utf-8', errors='ignore') as f:
+        async with aiofiles.open(file_path, mode='r', encoding=encoding, errors='ignore') as f:
             # aiofiles — is an asynchronous file I/O library
             # No need for await f.readlines() which reads the whole file.
             # Asynchronous iteration is more memory-efficient.
@@ -34,61 +88,135 @@ async def get_sample_rows(file_path: str, sample_size: int) -> Dict[str, str]:
     except Exception:
         raise
 
+def find_record_boundaries(file_path: str, chunks: int) -> List[int]:
+    """
+    Byte offsets that split a CSV file into up to `chunks` ranges of similar size.
+    Each range ends after a newline outside quotes, so quoted newlines never split a record.
+    """
+    size = os.path.getsize(file_path)
+    targets = [size * i // chunks for i in range(1, chunks)]
+    boundaries = [0]
+    in_quotes = False
+    offset = 0
+
+    with open(file_path, 'rb') as f:
+        while targets and (block := f.read(FILE_READ_CHUNK_SIZE)):
+            # Quote state is known up to `pos`; "" escapes toggle twice, so parity is enough
+            pos = 0
+            while targets:
+                newline = block.find(b'\n', max(targets[0] - offset, pos))
+                if newline == -1:
+                    break
+                in_quotes ^= block.count(b'"', pos, newline) % 2 == 1
+                pos = newline + 1
+                if in_quotes:
+                    continue
+                boundary = offset + pos
+                if boundary < size:
+                    boundaries.append(boundary)
+                while targets and targets[0] < boundary:
+                    targets.pop(0)
+            in_quotes ^= block.count(b'"', pos) % 2 == 1
+            offset += len(block)
+
+    boundaries.append(size)
+    return boundaries
+
+async def read_file_range(file_path: str, start: int, end: int) -> AsyncIterator[bytes]:
+    async with aiofiles.open(file_path, 'rb') as f:
+        await f.seek(start)
+        remaining = end - start
+        while remaining > 0 and (chunk := await f.read(min(FILE_READ_CHUNK_SIZE, remaining))):
+            remaining -= len(chunk)
+            yield chunk
+
+async def copy_csv_in_parallel(pool, file_path: str, table_name: str, header: bool, chunks: int) -> int:
+    """
+    COPYs record-aligned ranges of a UTF-8 CSV concurrently, one pool connection each.
+    Each range commits separately, so table_name should be a staging table. Returns the range count.
+    """
+    boundaries = await run_cpu(find_record_boundaries, file_path, chunks)
+
+    async def copy_range(index: int, start: int, end: int):
+        async with pool.acquire() as conn:
+            await conn.copy_to_table(
+                table_name,
+                source=read_file_range(file_path, start, end),
+                format='csv',
+                header=header and index == 0,
+                null=''
+            )
+
+    tasks = [
+        asyncio.create_task(copy_range(i, start, end))
+        for i, (start, end) in enumerate(zip(boundaries, boundaries[1:]))
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    logger.info(f"Loaded '{table_name}' with {len(tasks)} concurrent COPY streams.")
+    return len(tasks)
 
-async def add_data_into_table_from_csv(conn, file_path, table_name, schema: Dict[str, str], contain_column: str):
+def parallel_copy_chunks(file_path: str) -> int:
+    size = os.path.getsize(file_path)
+    return max(1, min(settings.CSV_PARALLEL_COPY_CHUNKS, size // CSV_PARALLEL_COPY_MIN_CHUNK_BYTES))
+
+async def add_data_into_table_from_csv(conn, file_path, table_name, schema: Dict[str, str], contain_column: str, encoding: Optional[str] = None, pool=None):
     try:
-        utf8_file_path = await convert_file_to_utf8(file_path)
+        encoding = encoding or await detect_encoding(file_path)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process or convert file: {e}"
         )
 
-    max_retries = 3
-    for attempt in range(max_retries):
+    # A UTF-8 label from the first ENCODING_DETECTION_MAX_BYTES is a guess; raw COPY is only tried once
+    transcode = encoding != 'utf-8'
+    while True:
         try:
             # await conn.execute("SET datestyle TO 'ISO, DMY'")
 
-            with open(utf8_file_path, "rb") as f:
-                await conn.copy_to_table(
-                    table_name,
-                    source=f,
-                    format='csv',
-                    header=(contain_column.upper() == "YES"),
-                    null=''
-                )
+            # Large UTF-8 files are split at record boundaries and loaded over several connections
+            chunks = await asyncio.to_thread(parallel_copy_chunks, file_path) if pool and not transcode else 1
+            if chunks > 1:
+                await copy_csv_in_parallel(pool, file_path, table_name, contain_column.upper() == "YES", chunks)
+                return
+
+            # UTF-8 files are read by asyncpg directly; anything else is transcoded on the fly
+            source = transcode_to_utf8(file_path, encoding) if transcode else file_path
+            await conn.copy_to_table(
+                table_name,
+                source=source,
+                format='csv',
+                header=(contain_column.upper() == "YES"),
+                null=''
+            )
 
             logger.info(f"Successfully loaded data into '{table_name}'.")
             return  # Success
 
+        except (asyncpg.CharacterNotInRepertoireError, asyncpg.UntranslatableCharacterError) as e:
+            if transcode:
+                logger.error(f"COPY failed after transcoding from {encoding}: {e}")
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Failed to insert data into '{table_name}': {str(e)}"
+                )
+            # Not UTF-8 after all: detect over the whole file and transcode, replacing undecodable bytes
+            encoding = await run_cpu(_detect_encoding, file_path, None)
+            logger.warning(f"'{file_path}' is not valid UTF-8 ({e}); retrying COPY transcoded from {encoding}")
+            transcode = True
+            # Parallel COPY ranges commit separately, so some rows may already be loaded
+            await conn.execute(f'TRUNCATE "{table_name}"')
+
         except asyncpg.PostgresError as e:
-            logger.error(f"COPY failed (attempt {attempt + 1}): {e}")
+            logger.error(f"COPY failed: {e}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to insert data into '{table_name}': {str(e)}"
-            )
-
-    raise HTTPException(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        detail=f"❌ All attempts to insert into '{table_name}' failed after {max_retries} tries."
-    )
-    
-async def convert_file_to_utf8(input_path: str) -> str:
-    async with aiofiles.open(input_path, 'rb') as f:
-        raw_data = await f.read()
-        detected = chardet.detect(raw_data)
-        encoding = detected['encoding'] or 'utf-8'
-
-    if encoding.lower() in ['utf-8', 'ascii']:
-        logger.info(f"File '{input_path}' is already UTF-8/ASCII. No conversion needed.")
-        return input_path
-
-    logger.info(f"Detected encoding: {encoding}. Converting to UTF-8...")
-    output_path = Path(input_path).stem + "_utf8.csv"
-
-    async with aiofiles.open(input_path, mode='r', encoding=encoding) as f_in:
-        content = await f_in.read()
-        async with aiofiles.open(output_path, mode='w', encoding='utf-8') as f_out:
-            await f_out.write(content)
-            
-    return output_path
\ No newline at end of file
+            )
\ No newline at end of file
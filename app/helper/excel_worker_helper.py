@@ -1,104 +1,118 @@
 from pathlib import Path
-from typing import Dict
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from app.config.logger import get_logger
+from app.config.constants import EXCEL_COPY_BATCH_ROWS
+from app.utils.cpu_pool import run_cpu
 from fastapi import HTTPException, status
+from python_calamine import CalamineWorkbook, SheetTypeEnum
 import asyncio
 import os
-import pandas as pd
 import asyncpg
 
 logger = get_logger("EXCEL Worker")
 
-async def get_sample_rows(file_path: str, sample_size: int) -> Dict[str, str]:
- 
-    # Running the blocking os.path.exists call in a separate thread
-    if not await asyncio.to_thread(os.path.exists, file_path):
-        raise FileNotFoundError(f"File not found at {file_path}")
+def cell_to_text(value: Any) -> Optional[str]:
+    """Text form of a calamine cell, or None for an empty one."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        # Excel stores every number as a float; 42.0 is just 42
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return str(value)
+    return str(value)
 
-    try:
-        def read_excel_sample():
-            df = pd.read_excel(file_path, nrows=sample_size, engine='calamine')
-            df.fillna('NULL', inplace=True)
-            return df
+def _open_sheet_rows(file_path: str, sheet_name: Optional[str] = None) -> Iterator[List[Any]]:
+    """Non-blank rows of a sheet; the sample and the load both read through here so they agree on the header."""
+    workbook = CalamineWorkbook.from_path(file_path)
+    sheet = workbook.get_sheet_by_name(sheet_name) if sheet_name is not None else workbook.get_sheet_by_index(0)
+    return (row for row in sheet.iter_rows() if any(cell_to_text(cell) is not None for cell in row))
 
-        df = await asyncio.to_thread(read_excel_sample)
+def _list_worksheets(file_path: str) -> List[str]:
+    workbook = CalamineWorkbook.from_path(file_path)
+    # Chart and macro sheets hold no rows
+    return [sheet.name for sheet in workbook.sheets_metadata if sheet.typ == SheetTypeEnum.WorkSheet]
 
-        rows: Dict[str, str] = {}
-        for i, row in df.iterrows():
-            values = [str(cell) for cell in row]
-            rows[f"row{str(i + 1).zfill(2)}"] = ', '.join(values)
+async def get_sheet_names(file_path: str) -> List[str]:
+    """Worksheet names in workbook order."""
+    return await run_cpu(_list_worksheets, file_path)
 
-        return rows
-    except Exception:
-        raise
-    
-async def add_data_into_table_from_excel(conn, file_path, table_name, schema: Dict[str, str], contain_column: str):
-    try:
-        file_extension = Path(file_path).suffix.lower()
-        if file_extension not in ['.xlsx', '.xls']:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Unsupported file type: '{file_extension}'. Please upload an Excel file (.xlsx or .xls)."
-            )
-        
-        # Converting the Excel file to a temporary CSV file
-        temp_csv_path = await convert_excel_to_csv(file_path, contain_column)
+def _next_batch(rows: Iterator[List[Any]], width: int, batch_size: int) -> List[Tuple[Optional[str], ...]]:
+    batch = []
+    for row in rows:
+        values = [cell_to_text(cell) for cell in row[:width]]
+        values += [None] * (width - len(values))
+        batch.append(tuple(values))
+        if len(batch) >= batch_size:
+            break
+    return batch
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to process or convert Excel file: {e}"
-        )
+def _read_sample(file_path: str, sample_size: int, sheet_name: Optional[str]) -> List[List[Any]]:
+    return list(islice(_open_sheet_rows(file_path, sheet_name), sample_size))
 
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            with open(temp_csv_path, "rb") as f:
-                await conn.copy_to_table(
-                    table_name,
-                    source=f,
-                    format='csv',
-                    header=(contain_column.upper() == "YES"),
-                    null=''
-                )
-            # with open(temp_csv_path, "r", encoding='utf-8') as f:
-            #     await conn.copy_to_table(
-            #         table_name=table_name,
-            #         source=f,
-            #         format='csv',
-            #         header=(contain_column.upper() == "YES"),
-            #         null='' 
-            #     )
+async def get_sample_rows(file_path: str, sample_size: int, sheet_name: Optional[str] = None) -> Dict[str, str]:
+    """
+    First sample_size rows of a sheet (the first one by default), header row included,
+    in the same shape as the CSV samples. Empty for a sheet without data.
+    """
+    # Running the blocking os.path.exists call in a separate thread
+    if not await asyncio.to_thread(os.path.exists, file_path):
+        raise FileNotFoundError(f"File not found at {file_path}")
 
-            logger.info(f"Successfully loaded data from '{file_path}' into '{table_name}'.")
-            os.remove(temp_csv_path)
-            return # Success 
-        
-        except asyncpg.PostgresError as e:
-            logger.error(f"COPY failed (attempt {attempt + 1}): {e}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Failed to insert data into '{table_name}': {str(e)}"
-            )
+    # Opening a workbook parses the whole sheet, so it runs in the CPU pool
+    sample = await run_cpu(_read_sample, file_path, sample_size, sheet_name)
 
-    raise HTTPException(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        detail=f"❌ All attempts to insert into '{table_name}' failed after {max_retries} tries."
-    )
-    
-def _blocking_excel_to_csv(input_path: str, output_path: str, header: bool):
-    df = pd.read_excel(input_path, engine='calamine')
-    df.to_csv(output_path, index=False, header=header, encoding='utf-8')
+    rows: Dict[str, str] = {}
+    for i, row in enumerate(sample):
+        values = [cell_to_text(cell) or 'NULL' for cell in row]
+        rows[f"row{str(i + 1).zfill(2)}"] = ', '.join(values)
+    return rows
 
+async def iter_sheet_records(file_path: str, width: int, skip_header: bool, sheet_name: Optional[str] = None) -> AsyncIterator[Tuple[Optional[str], ...]]:
+    """
+    Yields a sheet's non-blank rows as text tuples padded or cut to width; skip_header drops
+    the first non-blank row. calamine loads the whole sheet when it is opened, so memory grows
+    with the sheet; only the conversion to Python values is done EXCEL_COPY_BATCH_ROWS at a time.
+    """
+    # The row iterator can't leave the process, so unlike the sample the parse runs in a thread
+    rows = await asyncio.to_thread(_open_sheet_rows, file_path, sheet_name)
+    if skip_header:
+        await asyncio.to_thread(next, rows, None)
 
-async def convert_excel_to_csv(input_path: str, contain_column: str) -> str:
-    logger.info(f"Converting Excel file '{input_path}' to CSV...")
-    output_path = f"{Path(input_path).stem}_temp.csv"
-    
-    header = contain_column.upper() == "YES"
+    while batch := await asyncio.to_thread(_next_batch, rows, width, EXCEL_COPY_BATCH_ROWS):
+        for record in batch:
+            yield record
 
-    # Running the blocking pandas I/O operation in a separate thread
-    await asyncio.to_thread(_blocking_excel_to_csv, input_path, output_path, header)
+async def add_data_into_table_from_excel(conn, file_path, table_name, schema: Dict[str, str], contain_column: str, sheet_name: Optional[str] = None):
+    file_extension = Path(file_path).suffix.lower()
+    if file_extension not in ['.xlsx', '.xls']:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported file type: '{file_extension}'. Please upload an Excel file (.xlsx or .xls)."
+        )
+
+    try:
+        # Sheet rows go straight into binary COPY; no DataFrame or intermediate CSV
+        records = iter_sheet_records(file_path, len(schema['columns']), contain_column.upper() == "YES", sheet_name)
+        await conn.copy_records_to_table(table_name, records=records)
+        logger.info(f"Successfully loaded data from '{file_path}' into '{table_name}'.")
 
-    logger.info(f"Successfully converted '{input_path}' to '{output_path}'.")
-    return output_path
\ No newline at end of file
+    except asyncpg.PostgresError as e:
+        logger.error(f"COPY failed for '{table_name}': {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to insert data into '{table_name}': {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process Excel file: {e}"
+        )
\ No newline at end of file
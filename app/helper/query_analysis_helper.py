@@ -1,6 +1,8 @@
 from fastapi import WebSocket
 import json
 import re
+import time
+import asyncio
 from pydantic import BaseModel
 from app.config.database_config.postgres import database as db
 from app.config.logger import get_logger
@@ -8,7 +10,13 @@ from app.config.prompts.prompts_v2 import QUERY_CLASSIFICATION_PROMPT, SQL_GENER
 from app.config.prompts.whatsapp_prompts import WHATSAPP_QUERY_CLASSIFICATION_PROMPT, WHATSAPP_DATA_MANAGEMENT_PROMPT, WHATSAPP_ANALYSIS_GENERATION_PROMPT
 from typing import Dict, List, Optional, Any
 from app.ai.gemini import query_ai
+from app.ai.semantic_cache import classification_cache
+from app.ai.fast_classifier import fast_classifier
+from app.utils.metadata_cache import metadata_cache
+from app.utils.metadata_formatter import render_metadata, format_metadata, schema_names
+from app.utils.index_advisor import index_advisor
 from app.utils.analysis_process_utils import retry_operation, clean_json_string
+from app.config.constants import MAX_PARALLEL_SQL_QUERIES
 
 logger = get_logger("API Logger")
 
@@ -16,6 +24,7 @@ class QueryClassification(BaseModel):
     type: str 
     message: str
     user_message: str | None = None
+    tier: str | None = None
     
 class QueryRequest(BaseModel):
     userQuery: str
@@ -31,42 +40,45 @@ async def send_socket_message(websocket: WebSocket, type: str, content: any):
     await websocket.send_json({"type": type, "content": content})
     
 async def fetch_user_metadata(user_id: str) -> Optional[List[Dict[str, Any]]]:
+    cached = metadata_cache.get(user_id)
+    if cached:
+        logger.info(f"Serving user's metadata from cache, id={user_id}")
+        return cached.rows
+    
+    version = metadata_cache.version(user_id)
     try:
         query = """
-            SELECT table_name, file_name, schema, column_insights
-            FROM analysis_data 
-            WHERE id= :user_id
+            SELECT a.table_name, a.file_name, a.schema, a.column_insights,
+                (
+                    SELECT jsonb_object_agg(s.column_name, jsonb_build_object(
+                        'rows', s.row_count, 'null_frac', s.null_frac, 'distinct', s.distinct_estimate,
+                        'min', s.min_value, 'max', s.max_value, 'top_values', s.top_values, 'histogram', s.histogram
+                    ))
+                    FROM column_stats s
+                    WHERE s.user_id = a.id AND s.table_name = a.table_name
+                ) AS column_stats
+            FROM analysis_data a
+            WHERE a.id = :user_id
         """
         result = await db.fetch_all(query, {"user_id": user_id})
         logger.info(f"Successfully fetched user's metadata with id={user_id}")
     except Exception as e:
         logger.error(f"Issue while fetching user's metadata, userid={user_id}: {e}")
         result = None
-    finally:
-        return [dict(record) for record in result] if result else None
-
-def flatten_and_format(data: Any, indent: int = 0) -> str:
-    output = ''
-    indent_str = '  ' * indent
     
-    if isinstance(data, dict):
-        for key, value in data.items():
-            if isinstance(value, (dict, list)):
-                output += f'{indent_str}{key}:\n{flatten_and_format(value, indent + 1)}\n'
-            else:
-                output += f'{indent_str}{key}: {value}\n'
-    elif isinstance(data, list):
-        for item in data:
-            if isinstance(item, (dict, list)):
-                output += f'{indent_str}- {flatten_and_format(item, indent + 1)}\n'
-            else:
-                output += f'{indent_str}- {item}\n'
-    else:
-        output += f'{indent_str}{data}\n'
-    
-    return output.strip()
+    rows = [dict(record) for record in result] if result else None
+    if rows:
+        metadata_cache.put(user_id, version, rows, render_metadata(rows))
+    return rows
+
+def get_structured_metadata(user_id: str, user_metadata: List[Dict[str, Any]], user_query: str) -> str:
+    """Prompt text for the metadata, trimmed to the tables and columns relevant to the question when too large"""
+    cached = metadata_cache.get(user_id)
+    # The cached rendering covers every table, so it only applies to the full set
+    rendered = cached.prompt if cached and len(cached.rows) == len(user_metadata) else None
+    return format_metadata(user_metadata, user_query, rendered=rendered)
 
-async def classify_query(user_query: str, medium = None) -> QueryClassification:   
+async def classify_query(user_query: str, medium = None, user_id = None) -> QueryClassification:   
     if medium == "WhatsApp":
         system_prompt = WHATSAPP_QUERY_CLASSIFICATION_PROMPT["systemPrompt"]
     else:
@@ -74,8 +86,19 @@ async def classify_query(user_query: str, medium = None) -> QueryClassification:
     
     user_prompt = f'Classify this query: "{user_query}"'
     
+    # Rules, paraphrase cache and the local model answer before falling back to the LLM
+    cache_namespace = classification_cache.namespace_for(system_prompt)
+    # Data rules only fire on the user's own table/column names, when their metadata is cached
+    cached = metadata_cache.get(user_id) if user_id else None
+    fast_result = fast_classifier.classify(cache_namespace, user_query, medium, schema_names(cached.rows) if cached else None)
+    if fast_result:
+        logger.info(f"Query classified by '{fast_result['tier']}' tier")
+        return QueryClassification(**fast_result)
+    
     async def classify_operation():
+        started = time.perf_counter()
         classification_response = await query_ai(user_prompt, system_prompt)
+        latency_ms = int((time.perf_counter() - started) * 1000)
         
         json_str = clean_json_string(str(classification_response))
         
@@ -86,7 +109,10 @@ async def classify_query(user_query: str, medium = None) -> QueryClassification:
             if not parsed.get('type') or not parsed.get('message'):
                 raise ValueError('Invalid classification response structure')
             
-            return QueryClassification(**parsed)
+            classification = QueryClassification(**parsed)
+            classification.tier = 'llm'
+            fast_classifier.learn(cache_namespace, user_query, classification.dict(), latency_ms)
+            return classification
         except (json.JSONDecodeError, ValueError) as e:
             logger.error(f'Failed to parse classification response: {json_str}, {e}')
             # Return default classification
@@ -175,7 +201,7 @@ async def generate_sql_queries(
     """
     
     async def generate_operation():
-        return await query_ai(user_prompt, system_prompt)
+        return await query_ai(user_prompt, system_prompt, use_cache=False)
     
     return await retry_operation(generate_operation, 'SQL Multi-Query Generation', logger=logger)
 
@@ -221,32 +247,43 @@ def parse_generated_queries(generated_queries_raw: Any) -> Optional[List[Dict[st
     
 async def execute_query(sql_query: str) -> List[Dict[str, Any]]:
     async def query_operation():
-        result = await db.fetch_all(sql_query)
+        # databases hands each asyncio task its own pool connection, so concurrent
+        # callers don't share one; generated SQL only ever gets read access.
+        async with db.transaction(readonly=True):
+            result = await db.fetch_all(sql_query)
         return [dict(row) for row in result]
     
-    return await retry_operation(query_operation, 'SQL Query Execution', logger=logger)
+    rows = await retry_operation(query_operation, 'SQL Query Execution', logger=logger)
+    index_advisor.record(sql_query)
+    return rows
 
 async def execute_parsed_queries(queries_with_charts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    results = []
-    for i, query_item in enumerate(queries_with_charts):
-        sql_query = query_item.get('query')
-        if not sql_query:
-            continue
-        try:
-            query_results = await execute_query(sql_query)
-            results.append({
-                'query': sql_query,
-                'results': query_results,
-            })
-        except Exception as err:
-            logger.error(f"Error executing query {i+1}: {err}")
-            results.append({
-                'query': sql_query,
-                'results': None,
-                'error': 'Query execution failed',
-            })
+    # Caps how many pool connections a single request can hold at once
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_SQL_QUERIES)
+    
+    async def run_query(i: int, sql_query: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                query_results = await execute_query(sql_query)
+                return {
+                    'query': sql_query,
+                    'results': query_results,
+                }
+            except Exception as err:
+                logger.error(f"Error executing query {i+1}: {err}")
+                return {
+                    'query': sql_query,
+                    'results': None,
+                    'error': 'Query execution failed',
+                }
     
-    return results
+    tasks = [
+        run_query(i, query_item.get('query'))
+        for i, query_item in enumerate(queries_with_charts)
+        if query_item.get('query')
+    ]
+    # gather keeps the results in query order
+    return list(await asyncio.gather(*tasks))
 
 async def generate_analysis(query_results: str, user_query: str, classification_type: str, medium = None) -> Dict[str, Any]:
     system_prompt = GENERATE_ANALYSIS_FOR_USER_QUERY_PROMPT["systemPrompt"]
@@ -256,7 +293,7 @@ async def generate_analysis(query_results: str, user_query: str, classification_
         user_analysis_instructions = GENERATE_ANALYSIS_FOR_USER_QUERY_PROMPT["userPrompt"]
     user_prompt = f"""
         Context:
-        - Query Results: {json.dumps(query_results)}
+        - Query Results: {query_results}
         - Original User Question: {user_query}
         - Query Classification Message: {classification_type}
 
@@ -264,7 +301,7 @@ async def generate_analysis(query_results: str, user_query: str, classification_
     """
     
     async def analysis_operation():
-        analysis_response = await query_ai(user_prompt, system_prompt)
+        analysis_response = await query_ai(user_prompt, system_prompt, use_cache=False)
         dirty_string = str(analysis_response)
         
         try:
@@ -300,7 +337,7 @@ async def analysis_evaluation(analysis_data: Any, query_results: str, user_query
     """
     
     async def eval_operation():
-        analysis_response = await query_ai(user_prompt, system_prompt)
+        analysis_response = await query_ai(user_prompt, system_prompt, use_cache=False)
         
         # Handle different response types
         if isinstance(analysis_response, bytes):
@@ -21,7 +21,7 @@ async def generate_shopifyQL(user_query: str, llm_suggestions: Any) -> str:
     """
     
     async def generate_operation():
-        return await query_ai(user_prompt, system_prompt)
+        return await query_ai(user_prompt, system_prompt, use_cache=False)
     
     return await retry_operation(generate_operation, 'ShopifyQL Query Generation', logger=logger)
 
@@ -1,3 +1,4 @@
+import hmac
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.responses import JSONResponse
@@ -7,6 +8,12 @@ from app.config.settings import settings
 from app.config.logger import get_logger
 from app.routes import register_routers
 from app.config.database_config.postgres import database as db
+from app.ai.fast_classifier import fast_classifier
+from app.utils.metadata_cache import metadata_cache
+from app.utils.index_advisor import index_advisor
+from app.utils.db_utils import get_worker_health
+from app.ai.response_cache import response_cache
+from app.config.constants import UPLOAD_REQUEST_MAX_FILES, UPLOAD_MULTIPART_OVERHEAD_BYTES
 from contextlib import asynccontextmanager
 
 logger = get_logger("API Logger")
@@ -22,9 +29,15 @@ def create_app() -> FastAPI:
             logger.critical("Failed to connect to database", exc_info=True)
             raise
 
+        await fast_classifier.load_training_data()
+        await metadata_cache.start_listener()
+        index_advisor.start()
+
         yield
 
         # Shutdown
+        await index_advisor.stop()
+        await metadata_cache.stop_listener()
         try:
             await db.disconnect()
             logger.info("Database disconnected")
@@ -35,6 +48,23 @@ def create_app() -> FastAPI:
 
     allowed_origins = [origin.strip() for origin in settings.FRONTEND_ORIGIN.split(",")]
 
+    class UploadSizeLimitMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request: Request, call_next):
+            # Rejected from the header alone, before any of the body is read;
+            # stream_upload_files enforces MAX_UPLOAD_SIZE_MB per file as the body arrives
+            if request.method == "POST" and request.url.path.endswith("/upload-file"):
+                content_length = request.headers.get("content-length", "")
+                max_request_bytes = UPLOAD_REQUEST_MAX_FILES * settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024 + UPLOAD_MULTIPART_OVERHEAD_BYTES
+                if content_length.isdigit() and int(content_length) > max_request_bytes:
+                    return JSONResponse(
+                        status_code=413,
+                        content={"success": False, "message": f"Upload exceeds {UPLOAD_REQUEST_MAX_FILES} files of {settings.MAX_UPLOAD_SIZE_MB} MB"}
+                    )
+            return await call_next(request)
+
+    # Added before CORS so it runs inside it and the 413 carries CORS headers
+    app.add_middleware(UploadSizeLimitMiddleware)
+
     app.add_middleware(
         CORSMiddleware,
         allow_origins=allowed_origins,
@@ -65,6 +95,7 @@ def create_app() -> FastAPI:
             return response
 
     app.add_middleware(ShopifyCSPMiddleware)
+
     
     # Routers
     register_routers(app)
@@ -79,6 +110,27 @@ def create_app() -> FastAPI:
         logger.info("Health check accessed")
         return {"status": "healthy"}
 
+    @app.get("/health/workers")
+    async def worker_health(request: Request):
+        health = await get_worker_health(logger)
+        alive = [node for node in health["nodes"] if node["alive"]]
+        summary = {
+            "status": "healthy" if alive else "no_workers",
+            "queues": health["queues"],
+            "nodes_alive": len(alive),
+            "nodes_down": len(health["nodes"]) - len(alive),
+        }
+        # Node ids, hostnames, pids and per-node stats only go to callers holding the health token
+        token = request.headers.get("x-health-token", "")
+        if settings.WORKER_HEALTH_TOKEN and hmac.compare_digest(token, settings.WORKER_HEALTH_TOKEN):
+            return {**summary, "nodes": health["nodes"]}
+        return summary
+
+    @app.get("/health/llm-cache")
+    async def llm_cache_health():
+        # Counters are per process, so each API worker reports its own
+        return response_cache.get_stats()
+
     @app.middleware("http")
     async def catch_json_errors(request: Request, call_next):
         try:
@@ -1,6 +1,5 @@
-from fastapi import APIRouter, Request, File, UploadFile
+from fastapi import APIRouter, Request
 from app.controllers import data_controller
-from typing import List
 from app.config.logger import get_logger
 
 logger = get_logger("API Logger")
@@ -14,9 +13,10 @@ async def hello_data():
         "message": "You can upload data."
         }
     
+# The multipart body is parsed by the handler itself so files stream to disk under the size limit
 @router.post("/upload-file")
-async def upload_file(request: Request, files: List[UploadFile] = File(...)):
-    return await data_controller.file_upload_handler(request, files)
+async def upload_file(request: Request):
+    return await data_controller.file_upload_handler(request)
 
 @router.get("/upload-status")
 async def check_upload_status(request: Request):
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, TIMESTAMP, func, Index, Text, Integer, BigInteger
+from app.config.database_config.db_base import Base
+
+class LlmResponseCache(Base):
+    __tablename__ = "llm_response_cache"
+
+    cache_key = Column(Text, primary_key=True)
+    model_name = Column(Text, nullable=False)
+    response = Column(Text, nullable=False)
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("idx_llm_response_cache_expires_at", "expires_at"),
+        {"prefixes": ["UNLOGGED"]},
+    )
+
+class QueryClassificationLog(Base):
+    __tablename__ = "query_classification_log"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    namespace = Column(Text, nullable=False)
+    user_query = Column(Text, nullable=False)
+    type = Column(Text, nullable=False)
+    tier = Column(Text, nullable=False)  # rules | semantic_cache | model | llm
+    latency_ms = Column(Integer, nullable=False, server_default="0")
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("idx_query_classification_log_tier_created_at", "tier", "created_at"),
+    )
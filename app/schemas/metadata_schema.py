@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, UUID, TIMESTAMP, func, ForeignKey, Index
+from sqlalchemy import Column, String, Text, UUID, TIMESTAMP, func, ForeignKey, ForeignKeyConstraint, Index, Integer, BigInteger, REAL
 from sqlalchemy.dialects.postgresql import JSONB
 from app.config.database_config.db_base import Base
 
@@ -10,8 +10,79 @@ class AnalysisData(Base):
     file_name = Column(String(255), nullable=False)
     schema = Column(JSONB, nullable=False)
     column_insights = Column(JSONB, nullable=False)
+    content_hash = Column(Text, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
 
     __table_args__ = (
         Index("idx_analysis_data_id", "id"),
+        Index("idx_analysis_data_id_content_hash", "id", "content_hash"),
     )
+
+class ColumnStats(Base):
+    __tablename__ = "column_stats"
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    table_name = Column(String(255), primary_key=True)
+    column_name = Column(Text, primary_key=True)
+    data_type = Column(Text, nullable=False)
+    row_count = Column(BigInteger, nullable=False)
+    null_frac = Column(REAL, nullable=True)
+    distinct_estimate = Column(BigInteger, nullable=True)
+    min_value = Column(Text, nullable=True)
+    max_value = Column(Text, nullable=True)
+    top_values = Column(JSONB, nullable=False, server_default="[]")
+    histogram = Column(JSONB, nullable=False, server_default="[]")
+    computed_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["user_id", "table_name"], ["analysis_data.id", "analysis_data.table_name"], ondelete="CASCADE"
+        ),
+    )
+
+class IndexUsage(Base):
+    __tablename__ = "index_usage"
+
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    table_name = Column(String(255), primary_key=True)
+    column_name = Column(Text, primary_key=True)
+    uses = Column(Integer, nullable=False, server_default="0")
+    last_used_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["user_id", "table_name"], ["analysis_data.id", "analysis_data.table_name"], ondelete="CASCADE"
+        ),
+        Index("idx_index_usage_uses", "uses"),
+    )
+
+class AdvisedIndex(Base):
+    __tablename__ = "advised_indexes"
+
+    user_id = Column(UUID(as_uuid=True), nullable=False)
+    table_name = Column(String(255), primary_key=True)
+    column_name = Column(Text, primary_key=True)
+    index_name = Column(Text, nullable=False)
+    method = Column(Text, nullable=False)
+    uses = Column(Integer, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["user_id", "table_name"], ["analysis_data.id", "analysis_data.table_name"], ondelete="CASCADE"
+        ),
+        Index("idx_advised_indexes_user_id", "user_id"),
+    )
+
+class SchemaCache(Base):
+    __tablename__ = "schema_cache"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    fingerprint = Column(Text, primary_key=True)
+    schema = Column(JSONB, nullable=False)
+    contain_columns = Column(JSONB, nullable=False)
+    column_insights = Column(JSONB, nullable=False)
+    hit_count = Column(Integer, nullable=False, server_default="0")
+    insights_updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    last_used_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
@@ -1,12 +1,14 @@
-from sqlalchemy import Column, UUID, TIMESTAMP, func, Index, Text, SmallInteger, Integer
+from sqlalchemy import Column, UUID, TIMESTAMP, func, Index, Text, SmallInteger, Integer, BigInteger, CheckConstraint, text
+from sqlalchemy.dialects.postgresql import JSONB
 from app.config.database_config.db_base import Base
 
-class CsvQueue(Base):
-    __tablename__ = "csv_queue"
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
     upload_id = Column(UUID(as_uuid=True), unique=True, nullable=False)
-    user_id = Column(Text, nullable=False)
+    job_type = Column(Text, nullable=False)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
     table_name = Column(Text, nullable=False)
     file_path = Column(Text, nullable=False)
     original_file_name = Column(Text, nullable=False)
@@ -14,29 +16,34 @@ class CsvQueue(Base):
     progress = Column(SmallInteger, nullable=False, server_default="0")
     medium = Column(Text, nullable=True)
     receiver_no = Column(Text, nullable=True)
+    content_hash = Column(Text, nullable=True)
+    byte_size = Column(BigInteger, nullable=True)
+    sheet_progress = Column(JSONB, nullable=True)
+    priority = Column(SmallInteger, nullable=False, server_default="0")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    locked_by = Column(Text, nullable=True)
+    locked_until = Column(TIMESTAMP(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
 
     __table_args__ = (
-        Index("idx_csv_queue_status_upload_id_progress", "status", "upload_id", "progress"),
-        # {"postgresql_unlogged": True},  # mark as UNLOGGED
+        CheckConstraint("job_type IN ('csv', 'excel')", name="ingest_jobs_job_type_check"),
+        CheckConstraint("status IN ('pending', 'processing', 'completed', 'failed')", name="ingest_jobs_status_check"),
+        # Claims only scan the pending rows, however many finished jobs pile up
+        Index("idx_ingest_jobs_pending", "job_type", "created_at", postgresql_where=text("status = 'pending'")),
+        Index("idx_ingest_jobs_lease", "locked_until", postgresql_where=text("status = 'processing'")),
+        # Per-user running counts for fair claiming
+        Index("idx_ingest_jobs_running_user", "user_id", postgresql_where=text("status = 'processing'")),
+        Index("idx_ingest_jobs_user_hash", "user_id", "content_hash", postgresql_where=text("status IN ('pending', 'processing')")),
     )
 
-class ExcelQueue(Base):
-    __tablename__ = "excel_queue"
+class WorkerNode(Base):
+    __tablename__ = "worker_nodes"
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    upload_id = Column(UUID(as_uuid=True), unique=True, nullable=False)
-    user_id = Column(Text, nullable=False)
-    table_name = Column(Text, nullable=False)
-    file_path = Column(Text, nullable=False)
-    original_file_name = Column(Text, nullable=False)
-    status = Column(Text, nullable=False, server_default="pending")
-    progress = Column(SmallInteger, nullable=False, server_default="0")
-    medium = Column(Text, nullable=True)
-    receiver_no = Column(Text, nullable=True)
-    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
-
-    __table_args__ = (
-        Index("idx_excel_queue_status_upload_id_progress", "status", "upload_id", "progress"),
-        # {"postgresql_unlogged": True},  # mark as UNLOGGED
-    )
+    node_id = Column(Text, primary_key=True)
+    hostname = Column(Text, nullable=False)
+    pid = Column(Integer, nullable=False)
+    stats = Column(JSONB, nullable=False)
+    started_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    last_seen_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,58 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+from app.config.logger import get_logger
+from app.config.settings import settings
+from app.config.constants import CPU_POOL_MAX_IN_FLIGHT_PER_PROCESS
+
+logger = get_logger("Job Listener")
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+_size = 0
+
+def _new_executor(size: int) -> ProcessPoolExecutor:
+    # spawn: forking a process that already runs threads (asyncio.to_thread, aiofiles) is unsafe
+    return ProcessPoolExecutor(max_workers=size, mp_context=multiprocessing.get_context("spawn"))
+
+def start_cpu_pool():
+    """Starts one process per core (or CPU_POOL_PROCESSES) for the CPU-bound ingestion stages."""
+    global _executor, _slots, _size
+    if _executor is not None:
+        return
+    _size = settings.CPU_POOL_PROCESSES or os.cpu_count() or 1
+    _executor = _new_executor(_size)
+    _slots = asyncio.Semaphore(_size * CPU_POOL_MAX_IN_FLIGHT_PER_PROCESS)
+    logger.info(f"CPU pool started with {_size} processes")
+
+def shutdown_cpu_pool():
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor, _slots = None, None
+        logger.info("CPU pool shut down.")
+
+async def run_cpu(func: Callable[..., Any], *args) -> Any:
+    """
+    Runs a module-level function in the CPU pool, so parsing and inference don't hold the
+    event loop's GIL. Callers wait for a slot once the pool is full. Without a started
+    pool (e.g. in the API process) the function runs in a thread instead.
+    """
+    global _executor
+    if _executor is None:
+        return await asyncio.to_thread(func, *args)
+
+    async with _slots:
+        executor = _executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # A child died (e.g. OOM-killed); later calls get a fresh pool, this one fails
+            logger.error(f"CPU pool broken while running {func.__name__}; restarting it")
+            if _executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                _executor = _new_executor(_size)
+            raise
@@ -1,35 +1,136 @@
 from datetime import datetime, timezone
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import json
 import asyncpg
 from fastapi import HTTPException, status
 from app.config.database_config.postgres import database as db
 from app.utils.uniqueId import generate_unique_id
+from app.config.constants import JOB_NOTIFY_CHANNELS, JOB_SMALL_FILE_BYTES, JOB_INTERACTIVE_MEDIUMS, PAID_PLANS, JOB_PRIORITY_WEIGHTS, WORKER_NODE_STALE_SECONDS, METADATA_NOTIFY_CHANNEL, TYPE_INFERENCE_SAMPLE_ROWS, COLUMN_STATS_TOP_K, COLUMN_STATS_HISTOGRAM_BOUNDS
+from app.utils.type_inference import ALLOWED_DATA_TYPES, AMBIGUOUS_DATE_ORDER, infer_column_types, cast_expression, date_order_probes, resolve_date_order
+from app.utils.cpu_pool import run_cpu
 
-async def update_job_queue(job_data, queue_name, channel_name, payload, logger):
+class LeaseLostError(Exception):
+    pass
+
+def job_priority(byte_size: Optional[int], medium: Optional[str], plan: Optional[str]) -> int:
+    """Sum of the weights of the priority lanes a job is in: small file, interactive medium, paid plan."""
+    lanes = {
+        "small": byte_size is not None and byte_size <= JOB_SMALL_FILE_BYTES,
+        "interactive": medium in JOB_INTERACTIVE_MEDIUMS,
+        "paid": plan in PAID_PLANS,
+    }
+    return sum(JOB_PRIORITY_WEIGHTS[lane] for lane, matched in lanes.items() if matched)
+
+async def update_job_queue(job_data, job_type, logger):
+    """Adds an upload to ingest_jobs and wakes the workers listening for its job type ('csv' or 'excel')."""
     try:
         async with db.transaction():
-            await db.execute(f"""
-                INSERT INTO {queue_name} (
-                    upload_id, user_id, table_name, file_path, original_file_name, medium, receiver_no
+            plan = await db.fetch_val("SELECT plan FROM users WHERE id = CAST(:userid AS UUID)", {"userid": str(job_data["userid"])})
+            await db.execute("""
+                INSERT INTO ingest_jobs (
+                    upload_id, job_type, user_id, table_name, file_path, original_file_name, medium, receiver_no, content_hash, byte_size, priority
                 ) VALUES (
-                    :upload_id, :user_id, :table_name, :file_path, :original_file_name, :medium, :receiver_no
+                    :upload_id, :job_type, :user_id, :table_name, :file_path, :original_file_name, :medium, :receiver_no, :content_hash, :byte_size, :priority
                 )
             """, values={
                  "upload_id": job_data["uploadId"],
+                 "job_type": job_type,
                  "user_id": job_data["userid"],
                 #  "email": job_data["email"],
                  "table_name": job_data["tableName"],
                  "file_path": job_data["filePath"],
                  "original_file_name": job_data["originalFileName"],
                  "medium": job_data.get("medium"),          # Use get() in case the field is optional
-                 "receiver_no": job_data.get("receiver_no")
+                 "receiver_no": job_data.get("receiver_no"),
+                 "content_hash": job_data.get("contentHash"),
+                 "byte_size": job_data.get("byteSize"),
+                 "priority": job_priority(job_data.get("byteSize"), job_data.get("medium"), plan)
             })
-            await db.execute(f"NOTIFY {channel_name}, '{payload}';")
+            # Delivered on commit
+            await db.execute("SELECT pg_notify(:channel, :payload)", {"channel": JOB_NOTIFY_CHANNELS[job_type], "payload": job_type})
         logger.info(f"Successfully added job {job_data['uploadId']} and sent notification.")
     except Exception as error:
-        logger.error(f"Error inserting into {queue_name}: {error}")
+        logger.error(f"Error inserting {job_type} job into ingest_jobs: {error}")
+        raise
+
+async def find_duplicate_upload(userid, content_hash, logger):
+    """Upload id of an identical file this user already ingested, or has queued/in progress"""
+    if not content_hash:
+        return None
+    try:
+        return await db.fetch_val("""
+            SELECT substring(table_name FROM 7) FROM analysis_data
+            WHERE id = CAST(:userid AS UUID) AND content_hash = :content_hash
+            UNION ALL
+            SELECT replace(upload_id::text, '-', '') FROM ingest_jobs
+            WHERE user_id = CAST(:userid AS UUID) AND content_hash = :content_hash
+                AND status IN ('pending', 'processing')
+            LIMIT 1
+        """, {"userid": str(userid), "content_hash": content_hash})
+    except Exception as e:
+        logger.error(f"Duplicate upload lookup failed for {userid}: {e}")
+        return None
+
+async def get_worker_health(logger) -> Dict[str, Any]:
+    """Queue depth per job type and the stats each worker node last reported."""
+    try:
+        queues = await db.fetch_all("""
+            SELECT job_type,
+                   count(*) FILTER (WHERE status = 'pending') AS pending,
+                   count(*) FILTER (WHERE status = 'processing') AS processing,
+                   EXTRACT(EPOCH FROM NOW() - min(created_at) FILTER (WHERE status = 'pending'))::float8 AS oldest_pending_seconds
+            FROM ingest_jobs
+            WHERE status IN ('pending', 'processing')
+            GROUP BY job_type
+        """)
+        nodes = await db.fetch_all("""
+            SELECT node_id, hostname, pid, stats, started_at, last_seen_at,
+                   last_seen_at > NOW() - make_interval(secs => :stale_seconds) AS alive
+            FROM worker_nodes
+            ORDER BY node_id
+        """, {"stale_seconds": WORKER_NODE_STALE_SECONDS})
+    except Exception as e:
+        logger.error(f"Worker health lookup failed: {e}")
         raise
 
+    return {
+        "queues": {row["job_type"]: {
+            "pending": row["pending"],
+            "processing": row["processing"],
+            "oldest_pending_seconds": row["oldest_pending_seconds"],
+        } for row in queues},
+        "nodes": [{
+            **dict(row),
+            "stats": json.loads(row["stats"]) if isinstance(row["stats"], str) else row["stats"],
+        } for row in nodes],
+    }
+
+async def set_analysis_content_hash(conn, userid, table_name, content_hash, logger):
+    """Marks a fully ingested table as reusable for identical uploads"""
+    if not content_hash:
+        return
+    try:
+        await conn.execute(
+            "UPDATE analysis_data SET content_hash = $1 WHERE id = $2 AND table_name = $3",
+            content_hash, userid, table_name
+        )
+    except Exception as e:
+        logger.error(f"Failed to store content hash for {table_name}: {e}")
+
+async def notify_metadata_changed(conn, userid, logger):
+    """Tells every API process to drop its cached metadata for this user (worker-side asyncpg conn)."""
+    try:
+        await conn.execute("SELECT pg_notify($1, $2)", METADATA_NOTIFY_CHANNEL, str(userid))
+    except Exception as e:
+        logger.error(f"Failed to send metadata notification for {userid}: {e}")
+
+async def notify_metadata_changed_db(userid, logger):
+    """Same as notify_metadata_changed, for the API's shared database connection."""
+    try:
+        await db.execute("SELECT pg_notify(:channel, :payload)", {"channel": METADATA_NOTIFY_CHANNEL, "payload": str(userid)})
+    except Exception as e:
+        logger.error(f"Failed to send metadata notification for {userid}: {e}")
+
 async def remove_analysis(conn, userid, table_name, logger):
     try:
         query = """
@@ -37,12 +138,13 @@ async def remove_analysis(conn, userid, table_name, logger):
         WHERE id = $1 AND table_name = $2
         """
         await conn.execute(query, userid, table_name)
+        await notify_metadata_changed(conn, userid, logger)
         logger.info(f"✅ Analysis for '{userid}' and {table_name}' removed successfully.")
     except Exception as e:
         logger.error(f"Error occurred while removing the analysis for {userid}' and {table_name}': {e}")
         raise
 
-async def delete_multiple_tables(files, tables, logger):
+async def delete_multiple_tables(files, tables, logger, userid=None):
     try:
         query = f'DROP TABLE IF EXISTS "{"".join(tables)}" CASCADE'
         await db.execute(query)
@@ -60,6 +162,9 @@ async def delete_multiple_tables(files, tables, logger):
 
         await db.execute(delete_query)
         logger.info(f"Deleted rows from analysis_data for table/file pairs: {values_clause}")
+        
+        if userid:
+            await notify_metadata_changed_db(userid, logger)
        
     except Exception as e:
         logger.error(f"Error occurred while deleting table '{tables}': {e}")
@@ -74,17 +179,76 @@ async def delete_temp_table(conn, table_name, logger):
         logger.error(f"Error occurred while deleting table '{table_name}': {e}")
         raise
     
-async def update_upload_progress_in_queue(conn, queue_name, logger, upload_id, progress, status='processing'):
+# Job writes are fenced on the claim: once the lease is reaped and the job re-claimed,
+# its locked_by/attempts no longer match and the old worker's writes touch no row
+def _lease_fence(first: int) -> str:
+    return f"id = ${first} AND attempts = ${first + 1} AND locked_by = ${first + 2} AND status = 'processing'"
+
+def _lease_lost(result: str) -> bool:
+    return result.split()[-1] == "0"
+
+async def ensure_job_lease(conn, job, logger):
+    """Raises LeaseLostError unless this claim of the job still holds its lease."""
+    held = await conn.fetchval(
+        f"SELECT EXISTS (SELECT 1 FROM ingest_jobs WHERE {_lease_fence(1)})",
+        job["id"], job["attempts"], job["locked_by"]
+    )
+    if not held:
+        logger.warning(f"Lease of job {job['upload_id']} was lost")
+        raise LeaseLostError(f"Lease of job {job['upload_id']} was lost")
+
+async def update_upload_progress_in_queue(conn, logger, job, progress, status='processing'):
     try:
+        # Finished jobs give up their lease
         query = f"""
-                UPDATE {queue_name}
-                SET status = $1, progress = $2
-                WHERE upload_id = $3
+                UPDATE ingest_jobs
+                SET status = $1, progress = $2, updated_at = NOW(),
+                    locked_by = CASE WHEN $1 = 'processing' THEN locked_by END,
+                    locked_until = CASE WHEN $1 = 'processing' THEN locked_until END
+                WHERE {_lease_fence(3)}
                 """
-        await conn.execute(query, status, progress, upload_id)
-        logger.info(f"{queue_name} updated")
+        result = await conn.execute(query, status, progress, job["id"], job["attempts"], job["locked_by"])
+        if _lease_lost(result):
+            raise LeaseLostError(f"Lease of job {job['upload_id']} was lost")
+        logger.info("ingest_jobs updated")
+    except Exception as e:
+        logger.error(f"Error occurred while updating ingest_jobs: {e}")
+        raise
+
+async def init_sheet_progress(conn, job, sheets: Dict[str, Dict[str, Any]], logger):
+    """Registers every sheet of a workbook upload so the overall progress averages over all of them."""
+    try:
+        result = await conn.execute(
+            f"UPDATE ingest_jobs SET sheet_progress = $1, updated_at = NOW() WHERE {_lease_fence(2)}",
+            json.dumps(sheets), job["id"], job["attempts"], job["locked_by"]
+        )
+        if _lease_lost(result):
+            raise LeaseLostError(f"Lease of job {job['upload_id']} was lost")
+    except Exception as e:
+        logger.error(f"Error occurred while registering sheets for {job['upload_id']}: {e}")
+        raise
+
+async def update_sheet_progress(conn, job, sheet_name: str, table_name: str, progress: int, logger, status='processing'):
+    """
+    Sets one sheet's progress and recomputes the upload's overall progress as the sheet average.
+    Both read the row's current sheet_progress, so concurrent sheet updates don't overwrite each other.
+    """
+    try:
+        result = await conn.execute(f"""
+            UPDATE ingest_jobs
+            SET updated_at = NOW(),
+                sheet_progress = jsonb_set(COALESCE(sheet_progress, '{{}}'::jsonb), ARRAY[$1], $2::jsonb),
+                progress = (
+                    SELECT COALESCE(avg((value->>'progress')::int), 0)::int
+                    FROM jsonb_each(jsonb_set(COALESCE(sheet_progress, '{{}}'::jsonb), ARRAY[$1], $2::jsonb))
+                )
+            WHERE {_lease_fence(3)}
+        """, sheet_name, json.dumps({"table_name": table_name, "progress": progress, "status": status}), job["id"], job["attempts"], job["locked_by"])
+        if _lease_lost(result):
+            raise LeaseLostError(f"Lease of job {job['upload_id']} was lost")
+        logger.info(f"ingest_jobs sheet '{sheet_name}' updated")
     except Exception as e:
-        logger.error(f"Error occurred while updating {queue_name}: {e}")
+        logger.error(f"Error occurred while updating progress of sheet '{sheet_name}': {e}")
         raise
 
 # --- Helper function to sanitize SQL identifiers ---
@@ -98,7 +262,7 @@ def sanitize_identifier(name: str) -> str:
     return "".join(char for char in name if char.isalnum() or char == '_')
 
 
-async def create_table_from_schema(conn, table_name: str, schema: Dict[str, Any], logger):
+async def create_table_from_schema(conn, table_name: str, schema: Dict[str, Any], logger, typed: bool = False, unlogged: bool = False):
     try:
         # --- 1. Validating and Sanitizing Inputs (More Robust Approach) ---
         safe_table_name = sanitize_identifier(table_name)
@@ -113,15 +277,17 @@ async def create_table_from_schema(conn, table_name: str, schema: Dict[str, Any]
                 raise ValueError(f"Invalid column definition found: {col}")
             
             safe_col_name = sanitize_identifier(col['column_name'])
-            data_type = col['data_type'] # Data types should be validated against an allow-list
+            # Raw loads are TEXT; typed tables only take allow-listed types
+            data_type = str(col['data_type']).upper() if typed else 'TEXT'
+            if data_type not in ALLOWED_DATA_TYPES:
+                data_type = 'TEXT'
 
-            # column_definitions.append(f'"{safe_col_name}" {data_type}')
-            column_definitions.append(f'"{safe_col_name}" TEXT')
+            column_definitions.append(f'"{safe_col_name}" {data_type}')
 
         # --- 3. Constructing the Full SQL Query ---
         columns_sql = ",\n  ".join(column_definitions)
         create_table_query = f"""
-            CREATE TABLE IF NOT EXISTS "{safe_table_name}" (
+            CREATE {"UNLOGGED " if unlogged else ""}TABLE IF NOT EXISTS "{safe_table_name}" (
                 {columns_sql}
             );
         """
@@ -150,6 +316,208 @@ async def create_table_from_schema(conn, table_name: str, schema: Dict[str, Any]
             detail=f"Database error while creating table: {e}"
         )
         
+async def load_typed_table(conn, staging_table: str, table_name: str, schema: Dict[str, Any], logger) -> Dict[str, Any]:
+    """
+    Builds table_name from the all-TEXT staging table using locally inferred column types.
+    Values that don't convert become NULL and are counted per column in 'cast_failures'.
+    Returns the schema with the stored types.
+    """
+    safe_staging = sanitize_identifier(staging_table)
+    columns = [sanitize_identifier(col['column_name']) for col in schema['columns']]
+
+    sample = await conn.fetch(f'SELECT * FROM "{safe_staging}" LIMIT $1', TYPE_INFERENCE_SAMPLE_ROWS)
+    inferred = await run_cpu(infer_column_types, [list(row.values()) for row in sample], len(columns))
+
+    # The sample is only the first rows; a date-sorted day-first file can look month-first there
+    ambiguous = [i for i, column in enumerate(inferred) if column.date_order == AMBIGUOUS_DATE_ORDER]
+    if ambiguous:
+        probes = [probe for i in ambiguous for probe in date_order_probes(f'"{columns[i]}"')]
+        result = await conn.fetchrow(f'SELECT {", ".join(probes)} FROM "{safe_staging}"')
+        for n, i in enumerate(ambiguous):
+            inferred[i] = resolve_date_order(inferred[i], result[2 * n], result[2 * n + 1])
+            logger.info(f"Date order of '{schema['columns'][i]['column_name']}' resolved to {inferred[i].date_order or inferred[i].data_type}")
+
+    typed_schema = {**schema, "storage": "typed", "columns": [
+        {**col, "data_type": column.data_type} for col, column in zip(schema['columns'], inferred)
+    ]}
+
+    column_list = ", ".join(f'"{name}"' for name in columns)
+    select_list = ", ".join(cast_expression(f'"{name}"', column) for name, column in zip(columns, inferred))
+    counts = ", ".join(f'count("{name}")' for name in columns)
+
+    try:
+        async with conn.transaction():
+            await create_table_from_schema(conn, table_name, typed_schema, logger, typed=True)
+            await conn.execute(f'INSERT INTO "{sanitize_identifier(table_name)}" ({column_list}) SELECT {select_list} FROM "{safe_staging}"')
+
+            raw_counts = await conn.fetchrow(f'SELECT {counts} FROM "{safe_staging}"')
+            typed_counts = await conn.fetchrow(f'SELECT {counts} FROM "{sanitize_identifier(table_name)}"')
+            await conn.execute(f'DROP TABLE IF EXISTS "{safe_staging}"')
+    except asyncpg.PostgresError as e:
+        logger.error(f"Failed to load typed table '{table_name}': {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error while loading typed table: {e}"
+        )
+
+    for i, col in enumerate(typed_schema['columns']):
+        col['cast_failures'] = raw_counts[i] - typed_counts[i]
+        if col['cast_failures']:
+            logger.warning(f"{col['cast_failures']} values in '{col['column_name']}' could not be converted to {col['data_type']}")
+
+    logger.info(f"Typed table '{table_name}' loaded: {[col['data_type'] for col in typed_schema['columns']]}")
+    return typed_schema
+
+async def update_analysis_schema(conn, userid, table_name: str, schema: Dict[str, Any], logger):
+    try:
+        await conn.execute(
+            "UPDATE analysis_data SET schema = $1 WHERE id = $2 AND table_name = $3",
+            json.dumps(schema), userid, table_name
+        )
+    except Exception as e:
+        logger.error(f"Failed to update schema for {table_name}: {e}")
+        raise
+
+async def collect_column_stats(conn, userid, table_name: str, schema: Dict[str, Any], logger):
+    """
+    Records per-column statistics for a freshly loaded table in column_stats. ANALYZE provides
+    null fraction, distinct estimate, most common values and histogram bounds from its sample;
+    row count and min/max come from one scan.
+    """
+    safe_table = sanitize_identifier(table_name)
+    columns = [(sanitize_identifier(col['column_name']), col.get('data_type', 'TEXT')) for col in schema['columns']]
+    # min/max are not defined for booleans
+    ranged = [name for name, data_type in columns if data_type != 'BOOLEAN']
+
+    try:
+        await conn.execute(f'ANALYZE "{safe_table}"')
+        aggregates = ", ".join(["count(*)"] + [f'min("{name}")::text, max("{name}")::text' for name in ranged])
+        totals = await conn.fetchrow(f'SELECT {aggregates} FROM "{safe_table}"')
+        pg_stats = await conn.fetch("""
+            SELECT attname, null_frac, n_distinct,
+                   most_common_vals::text::text[] AS top_values, most_common_freqs AS top_freqs,
+                   histogram_bounds::text::text[] AS histogram
+            FROM pg_stats
+            WHERE tablename = $1 AND schemaname = ANY(current_schemas(false))
+        """, safe_table)
+    except asyncpg.PostgresError as e:
+        # Statistics only improve prompts; the upload itself succeeded
+        logger.warning(f"Failed to collect column statistics for '{table_name}': {e}")
+        return
+
+    row_count = totals[0]
+    bounds = {name: (totals[1 + 2 * i], totals[2 + 2 * i]) for i, name in enumerate(ranged)}
+    by_column = {row["attname"]: row for row in pg_stats}
+
+    records = []
+    for name, data_type in columns:
+        stats = by_column.get(name)
+        null_frac = stats["null_frac"] if stats else None
+        distinct = None
+        if stats and stats["n_distinct"] is not None:
+            # Negative n_distinct is a fraction of the row count
+            distinct = round(-stats["n_distinct"] * row_count) if stats["n_distinct"] < 0 else round(stats["n_distinct"])
+        top_values = [
+            {"value": value, "freq": round(freq, 4)}
+            for value, freq in zip(stats["top_values"] or [], stats["top_freqs"] or [])
+        ][:COLUMN_STATS_TOP_K] if stats else []
+        histogram = _downsample(stats["histogram"] or [], COLUMN_STATS_HISTOGRAM_BOUNDS) if stats else []
+        min_value, max_value = bounds.get(name, (None, None))
+        records.append((
+            userid, table_name, name, data_type, row_count, null_frac, distinct,
+            min_value, max_value, json.dumps(top_values), json.dumps(histogram)
+        ))
+
+    try:
+        await conn.executemany("""
+            INSERT INTO column_stats (user_id, table_name, column_name, data_type, row_count, null_frac,
+                                      distinct_estimate, min_value, max_value, top_values, histogram)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+            ON CONFLICT (user_id, table_name, column_name) DO UPDATE SET
+                data_type = EXCLUDED.data_type,
+                row_count = EXCLUDED.row_count,
+                null_frac = EXCLUDED.null_frac,
+                distinct_estimate = EXCLUDED.distinct_estimate,
+                min_value = EXCLUDED.min_value,
+                max_value = EXCLUDED.max_value,
+                top_values = EXCLUDED.top_values,
+                histogram = EXCLUDED.histogram,
+                computed_at = NOW()
+        """, records)
+        logger.info(f"Column statistics stored for '{table_name}'")
+    except asyncpg.PostgresError as e:
+        logger.warning(f"Failed to store column statistics for '{table_name}': {e}")
+
+def _downsample(bounds: list, limit: int) -> list:
+    if len(bounds) <= limit:
+        return bounds
+    step = (len(bounds) - 1) / (limit - 1)
+    return [bounds[round(i * step)] for i in range(limit)]
+
+async def update_analysis_insights(conn, userid, table_name: str, column_insights: Dict[str, Any], logger):
+    try:
+        await conn.execute(
+            "UPDATE analysis_data SET column_insights = $1 WHERE id = $2 AND table_name = $3",
+            json.dumps(column_insights), userid, table_name
+        )
+    except Exception as e:
+        logger.error(f"Failed to update column insights for {table_name}: {e}")
+        raise
+
+async def get_cached_schema(conn, userid, fingerprint: str, logger) -> Optional[Dict[str, Any]]:
+    """Schema and column insights generated earlier for a file of the same shape, if any."""
+    try:
+        row = await conn.fetchrow("""
+            UPDATE schema_cache
+            SET hit_count = hit_count + 1, last_used_at = NOW()
+            WHERE user_id = $1 AND fingerprint = $2
+            RETURNING schema, contain_columns, column_insights, insights_updated_at
+        """, userid, fingerprint)
+    except Exception as e:
+        logger.warning(f"Schema cache lookup failed: {e}")
+        return None
+
+    if not row:
+        return None
+    return {
+        "schema": json.loads(row["schema"]),
+        "contain_columns": json.loads(row["contain_columns"]),
+        "column_insights": json.loads(row["column_insights"]),
+        "insights_updated_at": row["insights_updated_at"]
+    }
+
+async def store_cached_schema(conn, userid, fingerprint: str, merged_schema: Dict[str, Any], logger):
+    try:
+        await conn.execute("""
+            INSERT INTO schema_cache (user_id, fingerprint, schema, contain_columns, column_insights)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (user_id, fingerprint) DO UPDATE SET
+                schema = EXCLUDED.schema,
+                contain_columns = EXCLUDED.contain_columns,
+                column_insights = EXCLUDED.column_insights,
+                insights_updated_at = NOW(),
+                last_used_at = NOW()
+        """,
+            userid,
+            fingerprint,
+            json.dumps(merged_schema["schema"]),
+            json.dumps(merged_schema["contain_columns"]),
+            json.dumps(merged_schema["column_insights"])
+        )
+    except Exception as e:
+        # The upload itself doesn't depend on the cache
+        logger.warning(f"Failed to store schema cache entry: {e}")
+
+async def update_cached_insights(conn, userid, fingerprint: str, column_insights: Dict[str, Any], logger):
+    try:
+        await conn.execute("""
+            UPDATE schema_cache
+            SET column_insights = $1, insights_updated_at = NOW()
+            WHERE user_id = $2 AND fingerprint = $3
+        """, json.dumps(column_insights), userid, fingerprint)
+    except Exception as e:
+        logger.warning(f"Failed to refresh schema cache insights: {e}")
+
 async def insert_analysis_data(conn, id, table_name: str, original_file_name: str, schema, column_insight, logger):
     query = """
     INSERT INTO analysis_data (id, table_name, file_name, schema, column_insights, created_at)
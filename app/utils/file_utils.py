@@ -0,0 +1,129 @@
+import hashlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+import aiofiles
+from fastapi import Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+class UploadTooLargeError(Exception):
+    pass
+
+class TooManyFilesError(Exception):
+    pass
+
+async def stream_upload_files(
+    request: Request,
+    target_path: Callable[[str], Path],
+    max_bytes: int,
+    max_files: int,
+    field_name: str = "files",
+) -> List[Dict[str, Any]]:
+    """
+    Parses a multipart upload as it arrives and writes each file part of field_name straight
+    to target_path(filename), so nothing is spooled first. Raises UploadTooLargeError as soon
+    as a part passes max_bytes and TooManyFilesError on file max_files + 1; every file written
+    so far is removed. Returns filename, file_path, content_hash and byte_size per file.
+    """
+    _, params = parse_options_header(request.headers.get("content-type"))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise ValueError("Expected a multipart/form-data upload")
+
+    # The parser callbacks are sync, so they only queue events; the writes happen between chunks
+    events: List[Tuple[str, Any]] = []
+    header = {"field": b"", "value": b"", "headers": {}}
+
+    def on_header_field(data: bytes, start: int, end: int):
+        header["field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        header["headers"][header["field"].lower()] = header["value"]
+        header["field"], header["value"] = b"", b""
+
+    def on_headers_finished():
+        events.append(("begin", header["headers"]))
+        header["headers"] = {}
+
+    callbacks = {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", None)),
+    }
+    parser = MultipartParser(boundary, callbacks)
+
+    saved: List[Dict[str, Any]] = []
+    current = None
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for event, payload in events:
+                if event == "begin":
+                    _, disposition = parse_options_header(payload.get(b"content-disposition"))
+                    name = disposition.get(b"name", b"").decode("utf-8", "replace")
+                    filename = disposition.get(b"filename", b"").decode("utf-8", "replace")
+                    current = None
+                    if name == field_name and filename:
+                        if len(saved) == max_files:
+                            raise TooManyFilesError(f"More than {max_files} files in one upload")
+                        file_path = target_path(filename)
+                        current = {
+                            "filename": filename,
+                            "file_path": file_path,
+                            "digest": hashlib.sha256(),
+                            "byte_size": 0,
+                            "file": await aiofiles.open(file_path, "wb"),
+                        }
+                        saved.append(current)
+                elif event == "data" and current is not None:
+                    current["byte_size"] += len(payload)
+                    if current["byte_size"] > max_bytes:
+                        raise UploadTooLargeError(f"{current['filename']} is larger than {max_bytes} bytes")
+                    current["digest"].update(payload)
+                    await current["file"].write(payload)
+                elif event == "end" and current is not None:
+                    await current.pop("file").close()
+                    current = None
+            events.clear()
+        parser.finalize()
+    except BaseException:
+        for record in saved:
+            if "file" in record:
+                await record["file"].close()
+            Path(record["file_path"]).unlink(missing_ok=True)
+        raise
+
+    return [
+        {
+            "filename": record["filename"],
+            "file_path": record["file_path"],
+            "content_hash": record["digest"].hexdigest(),
+            "byte_size": record["byte_size"],
+        }
+        for record in saved
+    ]
+
+def save_chunks(chunks: Iterable[bytes], file_path: Path, max_bytes: int, name: str) -> Tuple[str, int]:
+    """
+    Writes a streamed payload (e.g. a WhatsApp media download) and returns its sha256 and size.
+    Raises UploadTooLargeError once it passes max_bytes; the partial file is removed.
+    """
+    digest = hashlib.sha256()
+    byte_size = 0
+    try:
+        with open(file_path, "wb") as f:
+            for chunk in chunks:
+                byte_size += len(chunk)
+                if byte_size > max_bytes:
+                    raise UploadTooLargeError(f"{name} is larger than {max_bytes} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        Path(file_path).unlink(missing_ok=True)
+        raise
+    return digest.hexdigest(), byte_size
@@ -0,0 +1,189 @@
+import re
+import asyncio
+import hashlib
+from collections import Counter
+from typing import Iterable, Optional, Set, Tuple
+import asyncpg
+from app.config.logger import get_logger
+from app.config.settings import settings
+from app.config.constants import (
+    INDEX_ADVISOR_INTERVAL_SECONDS, INDEX_ADVISOR_MIN_USES, INDEX_ADVISOR_MIN_ROWS,
+    INDEX_ADVISOR_BRIN_MIN_CORRELATION, INDEX_ADVISOR_BATCH_SIZE
+)
+from app.utils.table_retrieval import TABLE_NAME_PATTERN
+
+logger = get_logger("API Logger")
+
+# Clause keywords in the order they can appear; text after WHERE, GROUP BY and ON is scanned for columns
+CLAUSE_PATTERN = re.compile(
+    r'\b(WHERE|GROUP\s+BY|ON|HAVING|ORDER\s+BY|LIMIT|OFFSET|UNION|INTERSECT|EXCEPT|WINDOW|SELECT|FROM|JOIN)\b',
+    re.IGNORECASE
+)
+INDEXED_CLAUSES = {"WHERE", "GROUP BY", "ON"}
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+# FROM inside EXTRACT(...) is not a FROM clause
+EXTRACT_FROM = re.compile(r'\b(EXTRACT\s*\(\s*\w+\s+)FROM\b', re.IGNORECASE)
+IDENTIFIER = re.compile(r'"((?:[^"]|"")+)"|\b([A-Za-z_][A-Za-z0-9_]*)\b')
+TEMPORAL_TYPES = ("date", "timestamp", "time")
+
+def column_references(sql: str) -> Set[Tuple[str, str]]:
+    """
+    (table, identifier) pairs for identifiers in the WHERE, GROUP BY and JOIN ... ON clauses
+    of a query on user tables. Identifiers are not resolved here; ones that are not
+    columns of the table are discarded when the usage is stored.
+    """
+    tables = {name.lower() for name in TABLE_NAME_PATTERN.findall(sql)}
+    if not tables:
+        return set()
+
+    sql = EXTRACT_FROM.sub(r'\1,', STRING_LITERAL.sub("''", sql))
+    matches = list(CLAUSE_PATTERN.finditer(sql))
+    identifiers = set()
+    for match, following in zip(matches, matches[1:] + [None]):
+        clause = re.sub(r'\s+', ' ', match.group(1).upper())
+        if clause not in INDEXED_CLAUSES:
+            continue
+        segment = sql[match.end():following.start() if following else len(sql)]
+        for quoted, bare in IDENTIFIER.findall(segment):
+            # Unquoted identifiers fold to lower case in Postgres
+            identifiers.add(quoted.replace('""', '"') if quoted else bare.lower())
+
+    return {(table, identifier) for table in tables for identifier in identifiers if not TABLE_NAME_PATTERN.fullmatch(identifier)}
+
+def index_name(table_name: str, column_name: str) -> str:
+    return f"idx_adv_{hashlib.md5(f'{table_name}.{column_name}'.encode('utf-8')).hexdigest()[:20]}"
+
+class IndexAdvisor:
+    """
+    Counts the columns that generated queries filter, group and join on, and periodically
+    builds an index (CONCURRENTLY) on columns used at least INDEX_ADVISOR_MIN_USES times,
+    within each user's INDEX_ADVISOR_BUDGET_MB. Counts are kept in memory between flushes
+    to index_usage; one API process at a time creates indexes.
+    """
+
+    def __init__(self):
+        self.pending: Counter = Counter()
+        self.task: Optional[asyncio.Task] = None
+
+    def record(self, sql: str):
+        try:
+            self.pending.update(column_references(sql))
+        except Exception as e:
+            logger.warning(f"Index advisor could not parse query: {e}")
+
+    def start(self):
+        if settings.INDEX_ADVISOR_ENABLED and self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(INDEX_ADVISOR_INTERVAL_SECONDS)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Index advisor cycle failed: {e}")
+
+    async def run_once(self):
+        usage, self.pending = self.pending, Counter()
+        conn = await asyncpg.connect(dsn=settings.DATABASE_URL_DIRECT, statement_cache_size=0)
+        try:
+            await self._flush(conn, usage.items())
+            # Session lock, so API processes don't race to build the same index
+            if await conn.fetchval("SELECT pg_try_advisory_lock(hashtext('index_advisor'))"):
+                try:
+                    await self._advise(conn)
+                finally:
+                    await conn.execute("SELECT pg_advisory_unlock(hashtext('index_advisor'))")
+        finally:
+            await conn.close()
+
+    async def _flush(self, conn, usage: Iterable[Tuple[Tuple[str, str], int]]):
+        records = [(table, column, uses) for (table, column), uses in usage]
+        if not records:
+            return
+        # Only real columns of uploaded tables are counted
+        await conn.executemany("""
+            INSERT INTO index_usage (user_id, table_name, column_name, uses)
+            SELECT a.id, a.table_name, $2, $3
+            FROM analysis_data a
+            WHERE a.table_name = $1
+              AND EXISTS (
+                  SELECT 1 FROM pg_attribute
+                  WHERE attrelid = to_regclass(quote_ident(a.table_name)) AND attname = $2
+                    AND attnum > 0 AND NOT attisdropped
+              )
+            ON CONFLICT (table_name, column_name) DO UPDATE SET
+                uses = index_usage.uses + EXCLUDED.uses,
+                last_used_at = NOW()
+        """, records)
+
+    async def _advise(self, conn):
+        candidates = await conn.fetch("""
+            SELECT u.user_id, u.table_name, u.column_name, u.uses,
+                   format_type(att.atttypid, att.atttypmod) AS data_type,
+                   c.reltuples, s.correlation, s.avg_width
+            FROM index_usage u
+            JOIN pg_class c ON c.oid = to_regclass(quote_ident(u.table_name))
+            JOIN pg_attribute att ON att.attrelid = c.oid AND att.attname = u.column_name AND NOT att.attisdropped
+            LEFT JOIN pg_stats s ON s.tablename = u.table_name AND s.attname = u.column_name
+                AND s.schemaname = ANY(current_schemas(false))
+            WHERE u.uses >= $1 AND c.reltuples >= $2
+              AND NOT EXISTS (
+                  SELECT 1 FROM advised_indexes i
+                  WHERE i.table_name = u.table_name AND i.column_name = u.column_name
+              )
+            ORDER BY u.uses DESC
+            LIMIT $3
+        """, INDEX_ADVISOR_MIN_USES, INDEX_ADVISOR_MIN_ROWS, INDEX_ADVISOR_BATCH_SIZE)
+
+        for candidate in candidates:
+            await self._create_index(conn, candidate)
+
+    async def _create_index(self, conn, candidate):
+        table_name, column_name = candidate["table_name"], candidate["column_name"]
+        if not TABLE_NAME_PATTERN.fullmatch(table_name):
+            return
+
+        # Uploads are often ordered by date; BRIN then costs a few pages instead of a full B-tree
+        correlation = candidate["correlation"] or 0.0
+        temporal = candidate["data_type"].startswith(TEMPORAL_TYPES)
+        method = "brin" if temporal and abs(correlation) >= INDEX_ADVISOR_BRIN_MIN_CORRELATION else "btree"
+        estimate = 0 if method == "brin" else int(candidate["reltuples"] * ((candidate["avg_width"] or 8) + 16))
+
+        used = await conn.fetchval("""
+            SELECT COALESCE(sum(pg_relation_size(to_regclass(quote_ident(index_name)))), 0)
+            FROM advised_indexes WHERE user_id = $1
+        """, candidate["user_id"])
+        if used + estimate > settings.INDEX_ADVISOR_BUDGET_MB * 1024 * 1024:
+            logger.info(f"Index on {table_name}.{column_name} skipped: user {candidate['user_id']} index budget reached")
+            return
+
+        name = index_name(table_name, column_name)
+        quoted_column = column_name.replace('"', '""')
+        try:
+            await conn.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table_name}" USING {method} ("{quoted_column}")')
+        except asyncpg.PostgresError as e:
+            logger.error(f"Failed to create index on {table_name}.{column_name}: {e}")
+            # A failed concurrent build leaves an INVALID index behind
+            await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+            return
+
+        await conn.execute("""
+            INSERT INTO advised_indexes (user_id, table_name, column_name, index_name, method, uses)
+            VALUES ($1, $2, $3, $4, $5, $6)
+            ON CONFLICT (table_name, column_name) DO NOTHING
+        """, candidate["user_id"], table_name, column_name, name, method, candidate["uses"])
+        logger.info(f"Created {method} index {name} on {table_name}.{column_name} after {candidate['uses']} uses")
+
+index_advisor = IndexAdvisor()
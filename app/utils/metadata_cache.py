@@ -0,0 +1,100 @@
+import asyncio
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+import asyncpg
+from cachetools import TTLCache
+from app.config.logger import get_logger
+from app.config.settings import settings
+from app.config.constants import METADATA_CACHE_MAX_USERS, METADATA_CACHE_TTL_SECONDS, METADATA_NOTIFY_CHANNEL
+
+logger = get_logger("API Logger")
+
+def cache_key(user_id) -> str:
+    # Session ids, queue rows and UUID objects all normalise to the dashed form
+    try:
+        return str(uuid.UUID(str(user_id)))
+    except ValueError:
+        return str(user_id)
+
+@dataclass
+class CachedMetadata:
+    rows: List[Dict[str, Any]]
+    prompt: str
+
+class MetadataCache:
+    """
+    Per-user cache of analysis_data rows and their rendered prompt text.
+    Entries are dropped when any process sends NOTIFY on METADATA_NOTIFY_CHANNEL
+    with the user id as payload; the cache is bypassed while the listener is down.
+    """
+
+    def __init__(self, max_users: int, ttl_seconds: int):
+        self.entries = TTLCache(maxsize=max_users, ttl=ttl_seconds)
+        self.versions: Dict[str, int] = defaultdict(int)
+        self.listener_conn = None
+        self.reconnect_task = None
+        self.stopping = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.listener_conn is not None and not self.listener_conn.is_closed()
+
+    def get(self, user_id) -> Optional[CachedMetadata]:
+        if not self.enabled:
+            return None
+        return self.entries.get(cache_key(user_id))
+
+    def version(self, user_id) -> int:
+        return self.versions[cache_key(user_id)]
+
+    def put(self, user_id, version: int, rows: List[Dict[str, Any]], prompt: str):
+        key = cache_key(user_id)
+        # An invalidation that arrived while the rows were loading makes them stale
+        if self.enabled and self.versions[key] == version:
+            self.entries[key] = CachedMetadata(rows, prompt)
+
+    def invalidate(self, user_id):
+        key = cache_key(user_id)
+        self.versions[key] += 1
+        self.entries.pop(key, None)
+
+    def _on_notify(self, conn, pid, channel, payload):
+        logger.info(f"Metadata changed for user {payload}, invalidating cache")
+        self.invalidate(payload)
+
+    def _on_termination(self, conn):
+        logger.warning("Metadata listener connection lost. Cache disabled until it reconnects.")
+        self.entries.clear()
+        self.listener_conn = None
+        if not self.stopping:
+            self.reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def start_listener(self):
+        self.stopping = False
+        try:
+            conn = await asyncpg.connect(dsn=settings.DATABASE_URL_DIRECT, statement_cache_size=0)
+            await conn.add_listener(METADATA_NOTIFY_CHANNEL, self._on_notify)
+            conn.add_termination_listener(self._on_termination)
+            self.entries.clear()
+            self.listener_conn = conn
+            logger.info(f"Listening to channel '{METADATA_NOTIFY_CHANNEL}' for metadata invalidation")
+        except Exception as e:
+            logger.error(f"Unable to start metadata cache listener, cache disabled: {e}")
+
+    async def _reconnect(self, delay: int = 5):
+        while not self.stopping and not self.enabled:
+            await asyncio.sleep(delay)
+            await self.start_listener()
+
+    async def stop_listener(self):
+        self.stopping = True
+        if self.reconnect_task:
+            self.reconnect_task.cancel()
+        if self.listener_conn and not self.listener_conn.is_closed():
+            await self.listener_conn.close()
+        self.listener_conn = None
+        self.entries.clear()
+
+metadata_cache = MetadataCache(METADATA_CACHE_MAX_USERS, METADATA_CACHE_TTL_SECONDS)
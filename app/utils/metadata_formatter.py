@@ -0,0 +1,157 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Set
+from app.ai.semantic_cache import tokenize, STOPWORDS
+from app.config.constants import METADATA_PROMPT_MAX_CHARS
+
+def _write(data: Any, out: List[str], indent: int):
+    indent_str = '  ' * indent
+
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if isinstance(value, (dict, list)) and value:
+                out.append(f'{indent_str}{key}:')
+                _write(value, out, indent + 1)
+            else:
+                out.append(f'{indent_str}{key}: {value}')
+    elif isinstance(data, list):
+        for item in data:
+            if isinstance(item, (dict, list)) and item:
+                start = len(out)
+                _write(item, out, indent + 1)
+                out[start] = f'{indent_str}- {out[start].lstrip()}'
+            else:
+                out.append(f'{indent_str}- {item}')
+    else:
+        out.append(f'{indent_str}{data}')
+
+def flatten_and_format(data: Any, indent: int = 0) -> str:
+    """Indented plain-text rendering of nested dicts/lists. Lines are collected and joined once."""
+    out: List[str] = []
+    _write(data, out, indent)
+    return '\n'.join(out).strip()
+
+def _load(value: Any) -> Any:
+    # JSONB columns come back from asyncpg as text
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+# Per-column extras that are trimmed by relevance when the metadata does not fit
+COLUMN_EXTRAS = ("column_stats", "column_insights")
+
+def _percent(value: Any) -> str:
+    return f"{value * 100:.1f}%" if isinstance(value, (int, float)) else "?"
+
+def stats_summary(stats: Dict[str, Any]) -> str:
+    """One-line description of a column_stats entry."""
+    parts = [f"{stats.get('rows')} rows", f"{_percent(stats.get('null_frac'))} null"]
+    if stats.get("distinct") is not None:
+        parts.append(f"~{stats['distinct']} distinct")
+    if stats.get("min") is not None:
+        parts.append(f"range {stats['min']} .. {stats['max']}")
+    if stats.get("top_values"):
+        parts.append("top: " + ", ".join(f"{item['value']!r} {_percent(item['freq'])}" for item in stats["top_values"]))
+    if stats.get("histogram"):
+        parts.append("histogram: " + " | ".join(str(bound) for bound in stats["histogram"]))
+    return "; ".join(parts)
+
+def _parse_table(row: Dict[str, Any]) -> Dict[str, Any]:
+    table = {key: _load(value) for key, value in row.items()}
+    if "column_stats" in table:
+        stats = table.pop("column_stats")
+        # Tables loaded before the catalog existed have no statistics
+        if isinstance(stats, dict) and stats:
+            table["column_stats"] = {column: stats_summary(entry) for column, entry in stats.items()}
+    return table
+
+def parse_metadata(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [_parse_table(row) for row in rows]
+
+def schema_names(rows: List[Dict[str, Any]]) -> Set[str]:
+    """Lower-case file and column names of the user's tables, words separated by single spaces."""
+    names = set()
+    for table in rows:
+        file_name = str(table.get("file_name") or "")
+        schema = _load(table.get("schema"))
+        columns = schema.get("columns", []) if isinstance(schema, dict) else []
+        candidates = [file_name.rsplit(".", 1)[0]] + [str(column.get("column_name", "")) for column in columns if isinstance(column, dict)]
+        for candidate in candidates:
+            name = " ".join(re.findall(r"[a-z0-9]+", candidate.lower()))
+            # Short names like "id" would match ordinary words in unrelated questions
+            if len(name) >= 3 and name not in STOPWORDS:
+                names.add(name)
+    return names
+
+def render_metadata(rows: List[Dict[str, Any]]) -> str:
+    """Full rendering of every table, schema and column insight."""
+    return flatten_and_format(parse_metadata(rows))
+
+def _score(terms: set, text: str) -> int:
+    return len(terms.intersection(tokenize(text))) if terms else 0
+
+def table_relevance(terms: set, table: Dict[str, Any]) -> int:
+    schema = table.get("schema")
+    columns = schema.get("columns", []) if isinstance(schema, dict) else []
+    names = " ".join(str(column.get("column_name", "")) for column in columns if isinstance(column, dict))
+    return 2 * _score(terms, f'{table.get("file_name", "")} {names}') + _score(terms, json.dumps(table.get("column_insights", "")))
+
+def format_metadata(
+    rows: List[Dict[str, Any]],
+    user_query: Optional[str] = None,
+    max_chars: int = METADATA_PROMPT_MAX_CHARS,
+    rendered: Optional[str] = None
+) -> str:
+    """
+    Metadata prompt text limited to max_chars. When the full rendering does not fit,
+    tables are ranked by word overlap with the question and added with their schema
+    first; column statistics and insights are then added, most relevant first, while room remains.
+    """
+    rendered = rendered if rendered is not None else render_metadata(rows)
+    if len(rendered) <= max_chars:
+        return rendered
+
+    terms = set(tokenize(user_query or ""))
+    tables = parse_metadata(rows)
+    ranked = sorted(tables, key=lambda table: table_relevance(terms, table), reverse=True)
+
+    selected = []
+    omitted = []
+    used = 0
+    for table in ranked:
+        core = {key: value for key, value in table.items() if key not in COLUMN_EXTRAS}
+        size = len(flatten_and_format([core])) + 1
+        if used + size > max_chars:
+            omitted.append(table)
+            continue
+        selected.append((table, core))
+        used += size
+
+    candidates = []
+    for rank, (table, core) in enumerate(selected):
+        for extra in COLUMN_EXTRAS:
+            entries = table.get(extra)
+            if not isinstance(entries, dict):
+                continue
+            for column, entry in entries.items():
+                score = 2 * _score(terms, column) + _score(terms, json.dumps(entry))
+                candidates.append((-score, rank, extra, column, entry, core))
+
+    candidates.sort(key=lambda candidate: candidate[:2])
+    for _, _, extra, column, entry, core in candidates:
+        size = len(flatten_and_format({column: entry}, indent=2)) + 1
+        if extra not in core:
+            size += len(f"  {extra}:") + 1
+        if used + size > max_chars:
+            continue
+        core.setdefault(extra, {})[column] = entry
+        used += size
+
+    parts = [flatten_and_format([core for _, core in selected])]
+    if omitted:
+        names = ", ".join(f'{table.get("table_name")} ({table.get("file_name")})' for table in omitted)
+        parts.append(f"Other tables not shown: {names}")
+    return "\n".join(part for part in parts if part)
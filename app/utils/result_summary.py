@@ -0,0 +1,91 @@
+from decimal import Decimal
+from typing import Any, Dict, List
+import orjson
+from app.config.constants import RESULT_MAX_BYTES_PER_QUERY, RESULT_HEAD_ROWS, RESULT_TAIL_ROWS
+
+def dumps(value: Any) -> bytes:
+    """Compact JSON; Decimal and other non-native values fall back to str()."""
+    return orjson.dumps(value, default=str)
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+def column_stats(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """min/max/mean/distinct/null counts per column, computed in a single pass."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    distinct: Dict[str, set] = {}
+
+    for row in rows:
+        for column, value in row.items():
+            col = stats.setdefault(column, {"nulls": 0, "count": 0, "sum": 0.0, "numeric": True, "min": None, "max": None})
+            seen = distinct.setdefault(column, set())
+            if value is None:
+                col["nulls"] += 1
+                continue
+
+            col["count"] += 1
+            try:
+                seen.add(value)
+            except TypeError:
+                seen.add(dumps(value))
+
+            if col["numeric"] and _is_number(value):
+                col["sum"] += float(value)
+            else:
+                col["numeric"] = False
+
+            try:
+                if col["min"] is None or value < col["min"]:
+                    col["min"] = value
+                if col["max"] is None or value > col["max"]:
+                    col["max"] = value
+            except TypeError:
+                # Mixed types in one column; min/max are meaningless
+                col["min"] = col["max"] = None
+
+    summary = {}
+    for column, col in stats.items():
+        entry = {"non_null": col["count"], "nulls": col["nulls"], "distinct": len(distinct[column])}
+        if col["min"] is not None:
+            entry["min"] = col["min"]
+            entry["max"] = col["max"]
+        if col["numeric"] and col["count"]:
+            entry["mean"] = round(col["sum"] / col["count"], 4)
+        summary[column] = entry
+    return summary
+
+def summarize_rows(
+    rows: Any,
+    max_bytes: int = RESULT_MAX_BYTES_PER_QUERY,
+    head: int = RESULT_HEAD_ROWS,
+    tail: int = RESULT_TAIL_ROWS
+) -> str:
+    """
+    Serialised query result for the analysis prompt. Small results are sent as-is;
+    larger ones become column aggregates plus the first and last rows, shrunk until
+    they fit within max_bytes.
+    """
+    full = dumps(rows)
+    if len(full) <= max_bytes:
+        return full.decode("utf-8")
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        # Nested API payloads (e.g. Shopify) have no rows to sample
+        return full[:max_bytes].decode("utf-8", errors="ignore") + "...(truncated)"
+
+    stats = column_stats(rows)
+    while True:
+        head_rows = rows[:head]
+        tail_rows = rows[max(head, len(rows) - tail):] if tail else []
+        summary = dumps({
+            "row_count": len(rows),
+            "column_stats": stats,
+            "head_rows": head_rows,
+            "tail_rows": tail_rows,
+            "omitted_rows": len(rows) - len(head_rows) - len(tail_rows)
+        })
+        if len(summary) <= max_bytes:
+            return summary.decode("utf-8")
+        if head == 0 and tail == 0:
+            # Very wide results: the aggregates alone are too big
+            return summary[:max_bytes].decode("utf-8", errors="ignore") + "...(truncated)"
+        head, tail = head // 2, tail // 2
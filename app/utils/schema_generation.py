@@ -3,11 +3,18 @@ from typing import Dict, List
 from app.config.prompts.prompts import SCHEMA_GENERATION
 from app.ai.gemini import query_ai
 import re, json
-from app.config.constants import SCHEMA_BATCH_SIZE
-from app.utils.db_utils import insert_analysis_data
+from app.config.constants import SCHEMA_BATCH_SIZE, SCHEMA_CACHE_VERSION, SCHEMA_CACHE_INSIGHTS_MAX_AGE_DAYS
+from app.config.settings import settings
+from app.utils.db_utils import insert_analysis_data, get_cached_schema, store_cached_schema, update_cached_insights, update_analysis_insights, notify_metadata_changed
+from app.utils.type_inference import infer_column_types
+from datetime import datetime, timedelta, timezone
 import csv
 from io import StringIO
 import asyncio
+import asyncpg
+import hashlib
+
+_refresh_tasks = set()
     
 def get_row_length(row):
     return len(next(csv.reader(StringIO(row), skipinitialspace=True)))
@@ -85,43 +92,103 @@ async def get_schema(table_name: str, sample_rows: List[str], column_no: int, lo
         logger.error("Error parsing AI response", exc_info=True)
         raise
 
+def _normalize_header(value: str) -> str:
+    return re.sub(r'[^0-9a-z]+', '_', value.strip().strip('"').lower()).strip('_')
+
+def schema_fingerprint(sample_rows: Dict[str, str]) -> str:
+    """
+    Identifies a file's shape: the normalised first-row (header) names plus the locally
+    inferred type of every column. Files with the same fingerprint share a schema.
+    """
+    rows = [parse_csv_row(sample_rows[key]) for key in sorted(sample_rows)]
+    column_count = max(len(row) for row in rows)
+    header = [_normalize_header(value) for value in rows[0]]
+    values = [[None if value == 'NULL' else value for value in row] for row in rows[1:]]
+    types = [[column.data_type, column.date_order] for column in infer_column_types(values, column_count)]
+
+    payload = json.dumps({"version": SCHEMA_CACHE_VERSION, "header": header, "types": types})
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _insights_stale(cached: Dict) -> bool:
+    age = datetime.now(timezone.utc) - cached["insights_updated_at"]
+    return age > timedelta(days=SCHEMA_CACHE_INSIGHTS_MAX_AGE_DAYS)
+
+async def refresh_column_insights(userid, table_name, fingerprint, sample_rows, cached: Dict, logger):
+    """Regenerates column insights for a cached schema from the newest upload's sample rows."""
+    conn = None
+    try:
+        fresh = await generate_schema_with_llm(table_name, sample_rows, logger)
+        # Only insights for the cached column names apply to the stored tables
+        names = {col["column_name"] for col in cached["schema"]["columns"]}
+        insights = {**cached["column_insights"], **{name: insight for name, insight in fresh["column_insights"].items() if name in names}}
+
+        conn = await asyncpg.connect(dsn=settings.DATABASE_URL)
+        await update_cached_insights(conn, userid, fingerprint, insights, logger)
+        await update_analysis_insights(conn, userid, table_name, insights, logger)
+        await notify_metadata_changed(conn, userid, logger)
+        logger.info(f"Column insights refreshed for {table_name}")
+    except Exception as e:
+        logger.error(f"Background column insight refresh failed for {table_name}: {e}")
+    finally:
+        if conn:
+            await conn.close()
+
+def schedule_insights_refresh(userid, table_name, fingerprint, sample_rows, cached: Dict, logger):
+    task = asyncio.create_task(refresh_column_insights(userid, table_name, fingerprint, sample_rows, cached, logger))
+    # The event loop only keeps weak references to tasks
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+async def generate_schema_with_llm(table_name, sample_rows, logger) -> Dict:
+    column_batches, max_length = split_sample_rows_by_column_batch(sample_rows, SCHEMA_BATCH_SIZE)
+    # schemas = []
+    tasks = []
+
+    for i, batch in enumerate(column_batches):
+        logger.info(f"Processing batch {i + 1}/{len(column_batches)}")
+        # row1 = batch.get("row01") or list(batch.values())[0]
+        col_count = min(max_length, SCHEMA_BATCH_SIZE)
+        if max_length > SCHEMA_BATCH_SIZE:
+            max_length = max_length - SCHEMA_BATCH_SIZE
+            
+        logger.info(f"Row1: {batch.get('row01')}")
+        logger.info(f"Column Count: {col_count}")
+        
+        # schema = await get_schema(table_name, list(batch.values()), col_count, logger)
+        # schemas.append(schema)
+        task = get_schema(table_name, list(batch.values()), col_count, logger)
+        tasks.append(task)
+
+    # logger.info(f"Schema: {schemas}")
+    logger.info(f"Executing all {len(tasks)} batches concurrently.")
+    schemas = await asyncio.gather(*tasks)
+    logger.info("All batches have been processed.")
+    merged_schema = {
+        "schema": {"columns": []},
+        "contain_columns": {"contain_column": "NO"},
+        "column_insights": {}
+    }
+
+    for part in schemas:
+        merged_schema["schema"]["columns"].extend(part["schema"]["columns"])
+        merged_schema["column_insights"].update(part["column_insights"])
+        if part["contain_columns"]["contain_column"] == "YES":
+            merged_schema["contain_columns"]["contain_column"] = "YES"
+    return merged_schema
+
 async def generate_table_schema(conn, userid, table_name, original_file_name, sample_rows, logger):
     try:
         logger.info(f"Starting schema generation for table {table_name}")
-        column_batches, max_length = split_sample_rows_by_column_batch(sample_rows, SCHEMA_BATCH_SIZE)
-        # schemas = []
-        tasks = []
-
-        for i, batch in enumerate(column_batches):
-            logger.info(f"Processing batch {i + 1}/{len(column_batches)}")
-            # row1 = batch.get("row01") or list(batch.values())[0]
-            col_count = min(max_length, SCHEMA_BATCH_SIZE)
-            if max_length > SCHEMA_BATCH_SIZE:
-                max_length = max_length - SCHEMA_BATCH_SIZE
-                
-            logger.info(f"Row1: {batch.get('row01')}")
-            logger.info(f"Column Count: {col_count}")
-            
-            # schema = await get_schema(table_name, list(batch.values()), col_count, logger)
-            # schemas.append(schema)
-            task = get_schema(table_name, list(batch.values()), col_count, logger)
-            tasks.append(task)
-
-        # logger.info(f"Schema: {schemas}")
-        logger.info(f"Executing all {len(tasks)} batches concurrently.")
-        schemas = await asyncio.gather(*tasks)
-        logger.info("All batches have been processed.")
-        merged_schema = {
-            "schema": {"columns": []},
-            "contain_columns": {"contain_column": "NO"},
-            "column_insights": {}
-        }
+        fingerprint = schema_fingerprint(sample_rows) if settings.SCHEMA_CACHE_ENABLED else None
+        cached = await get_cached_schema(conn, userid, fingerprint, logger) if fingerprint else None
 
-        for part in schemas:
-            merged_schema["schema"]["columns"].extend(part["schema"]["columns"])
-            merged_schema["column_insights"].update(part["column_insights"])
-            if part["contain_columns"]["contain_column"] == "YES":
-                merged_schema["contain_columns"]["contain_column"] = "YES"
+        if cached:
+            logger.info(f"Schema cache hit for {table_name}, skipping LLM schema generation")
+            merged_schema = cached
+        else:
+            merged_schema = await generate_schema_with_llm(table_name, sample_rows, logger)
+            if fingerprint:
+                await store_cached_schema(conn, userid, fingerprint, merged_schema, logger)
 
         await insert_analysis_data(
             conn, 
@@ -132,6 +199,9 @@ async def generate_table_schema(conn, userid, table_name, original_file_name, sa
             json.dumps(merged_schema["column_insights"]),
             logger 
         )
+
+        if cached and settings.SCHEMA_CACHE_REFRESH_INSIGHTS and _insights_stale(cached):
+            schedule_insights_refresh(userid, table_name, fingerprint, sample_rows, cached, logger)
         
         return {
             "schema": merged_schema["schema"],
@@ -0,0 +1,56 @@
+import re
+import json
+from typing import Any, Dict, List, Set
+import numpy as np
+from app.ai.semantic_cache import tokenize, embed_text
+from app.config.settings import settings
+from app.config.constants import TABLE_RETRIEVAL_TOP_K
+from app.utils.metadata_formatter import parse_metadata, table_relevance
+
+TABLE_NAME_PATTERN = re.compile(r'\btable_[0-9a-f]{32}(?:_\d+)?\b', re.IGNORECASE)
+
+def _table_text(table: Dict[str, Any]) -> str:
+    schema = table.get("schema")
+    columns = schema.get("columns", []) if isinstance(schema, dict) else []
+    names = " ".join(str(column.get("column_name", "")) for column in columns if isinstance(column, dict))
+    return f'{table.get("file_name", "")} {names} {json.dumps(table.get("column_insights", ""))}'
+
+def select_relevant_tables(rows: List[Dict[str, Any]], user_query: str, top_k: int = TABLE_RETRIEVAL_TOP_K) -> List[Dict[str, Any]]:
+    """
+    Top-k analysis_data rows for the question, scored by word overlap with file and
+    column names plus, when enabled, hashed-embedding similarity. Original order is kept.
+    """
+    if len(rows) <= top_k:
+        return rows
+
+    tables = parse_metadata(rows)
+    terms = set(tokenize(user_query))
+    scores = [float(table_relevance(terms, table)) for table in tables]
+
+    if settings.TABLE_RETRIEVAL_EMBEDDINGS:
+        query_vector = embed_text(user_query)
+        table_vectors = np.stack([embed_text(_table_text(table)) for table in tables])
+        scores = [score + float(similarity) for score, similarity in zip(scores, table_vectors @ query_vector)]
+
+    ranked = sorted(range(len(rows)), key=lambda i: scores[i], reverse=True)[:top_k]
+    return [rows[i] for i in sorted(ranked)]
+
+def referenced_tables(queries: List[Dict[str, Any]]) -> Set[str]:
+    names = set()
+    for q in queries:
+        if isinstance(q, dict) and q.get("query"):
+            names.update(name.lower() for name in TABLE_NAME_PATTERN.findall(q["query"]))
+    return names
+
+def needs_full_metadata(parsed_queries: Any, relevant_metadata: List[Dict[str, Any]], user_metadata: List[Dict[str, Any]]) -> bool:
+    """True when SQL generated from a pruned table set refers to, or may need, tables that were left out."""
+    if len(relevant_metadata) >= len(user_metadata):
+        return False
+    # "Data is not sufficient" may only mean the right table was pruned
+    if isinstance(parsed_queries, dict) and parsed_queries.get("error"):
+        return True
+    if not isinstance(parsed_queries, list):
+        return False
+
+    known = {row["table_name"].lower() for row in relevant_metadata}
+    return not referenced_tables(parsed_queries) <= known
@@ -0,0 +1,188 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+from app.config.constants import DATA_TIME_FORMAT, TYPE_INFERENCE_MAX_INVALID_RATIO
+
+# Column types create_table_from_schema accepts
+ALLOWED_DATA_TYPES = {"TEXT", "BIGINT", "NUMERIC", "BOOLEAN", "DATE", "TIME", "TIMESTAMP", "TIMESTAMPTZ"}
+
+# Every sampled value reads both month-first and day-first; resolved over the full column
+AMBIGUOUS_DATE_ORDER = "MDY|DMY"
+
+@dataclass
+class InferredColumn:
+    data_type: str
+    # 'MDY' or 'DMY' for month-first/day-first dates, AMBIGUOUS_DATE_ORDER until resolved;
+    # year-first values need none
+    date_order: Optional[str] = None
+
+@dataclass
+class DateTimeFormat:
+    data_type: str
+    pattern: re.Pattern
+    strptime_format: str
+    date_order: Optional[str]
+
+INTEGER_PATTERN = re.compile(r'^[-+]?\d+$')
+NUMERIC_PATTERN = re.compile(r'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$')
+BOOLEAN_VALUES = {"true", "false", "t", "f", "yes", "no", "y", "n"}
+
+SECTION_TYPES = {
+    "Date Only": "DATE",
+    "Time Only": "TIME",
+    "Date + Time (no timezone)": "TIMESTAMP",
+    "Date + Time + Timezone": "TIMESTAMPTZ",
+}
+# token: (regex, strptime)
+FORMAT_TOKENS = [
+    ("YYYY", r"\d{4}", "%Y"),
+    ("SSSSSS", r"\d{6}", "%f"),
+    ("SSS", r"\d{3}", "%f"),
+    ("[UTC]", "UTC", "UTC"),
+    ("MM", r"\d{1,2}", "%m"),
+    ("DD", r"\d{1,2}", "%d"),
+    ("HH", r"\d{1,2}", "%H"),
+    ("mm", r"\d{2}", "%M"),
+    ("ss", r"\d{2}", "%S"),
+    ("Z", r"(?:Z|[+-]\d{2}:?\d{2})", "%z"),
+]
+
+def _compile_format(data_type: str, spec: str) -> DateTimeFormat:
+    pattern, strptime_format = "", ""
+    i = 0
+    while i < len(spec):
+        for token, regex, strp in FORMAT_TOKENS:
+            if spec.startswith(token, i):
+                pattern += regex
+                strptime_format += strp
+                i += len(token)
+                break
+        else:
+            pattern += re.escape(spec[i])
+            strptime_format += spec[i]
+            i += 1
+
+    if spec.startswith("MM"):
+        date_order = "MDY"
+    elif spec.startswith("DD"):
+        date_order = "DMY"
+    else:
+        date_order = None
+    return DateTimeFormat(data_type, re.compile(f"^{pattern}$"), strptime_format, date_order)
+
+def parse_datetime_formats(text: str = DATA_TIME_FORMAT) -> List[DateTimeFormat]:
+    """Turns the DATA_TIME_FORMAT listing into matchers, in listed order."""
+    formats = []
+    data_type = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.endswith(":") and line[:-1] in SECTION_TYPES:
+            data_type = SECTION_TYPES[line[:-1]]
+        elif line.startswith("- ") and data_type:
+            formats.append(_compile_format(data_type, line[2:].strip()))
+    return formats
+
+DATETIME_FORMATS = parse_datetime_formats()
+
+def _group_formats(formats: List[DateTimeFormat]) -> Dict[tuple, List[DateTimeFormat]]:
+    # A column may mix e.g. whole and fractional seconds, so candidates are (type, date order) groups
+    groups: Dict[tuple, List[DateTimeFormat]] = {}
+    for fmt in formats:
+        groups.setdefault((fmt.data_type, fmt.date_order), []).append(fmt)
+    return groups
+
+DATETIME_GROUPS = _group_formats(DATETIME_FORMATS)
+
+def _is_integer(value: str) -> bool:
+    if not INTEGER_PATTERN.match(value):
+        return False
+    digits = value.lstrip("+-")
+    # Leading zeros (zip codes, account numbers) must keep their formatting
+    if len(digits) > 1 and digits[0] == "0":
+        return False
+    # try_cast_bigint takes up to 18 digits, which always fit
+    return len(digits) <= 18
+
+def _is_numeric(value: str) -> bool:
+    if not NUMERIC_PATTERN.match(value):
+        return False
+    digits = value.lstrip("+-")
+    return not (len(digits) > 1 and digits[0] == "0" and digits[1] != ".")
+
+def _matches_datetime(value: str, formats: List[DateTimeFormat]) -> bool:
+    for fmt in formats:
+        if not fmt.pattern.match(value):
+            continue
+        try:
+            datetime.strptime(value, fmt.strptime_format)
+            return True
+        except ValueError:
+            continue
+    return False
+
+def _fits(values: List[str], check) -> bool:
+    invalid = 0
+    allowed = int(len(values) * TYPE_INFERENCE_MAX_INVALID_RATIO)
+    for value in values:
+        if not check(value):
+            invalid += 1
+            if invalid > allowed:
+                return False
+    return True
+
+def infer_column(values: Iterable[Optional[str]]) -> InferredColumn:
+    """Narrowest type that (almost) every non-empty sample value converts to."""
+    values = [str(v).strip() for v in values if v is not None and str(v).strip() != ""]
+    if not values:
+        return InferredColumn("TEXT")
+
+    if _fits(values, lambda v: v.lower() in BOOLEAN_VALUES):
+        return InferredColumn("BOOLEAN")
+    if _fits(values, _is_integer):
+        return InferredColumn("BIGINT")
+    if _fits(values, _is_numeric):
+        return InferredColumn("NUMERIC")
+
+    for (data_type, date_order), formats in DATETIME_GROUPS.items():
+        if _fits(values, lambda v: _matches_datetime(v, formats)):
+            if date_order in ("MDY", "DMY"):
+                other = DATETIME_GROUPS.get((data_type, "DMY" if date_order == "MDY" else "MDY"))
+                if other and _fits(values, lambda v: _matches_datetime(v, other)):
+                    return InferredColumn(data_type, AMBIGUOUS_DATE_ORDER)
+            return InferredColumn(data_type, date_order)
+
+    return InferredColumn("TEXT")
+
+def infer_column_types(rows: Sequence[Sequence[Optional[str]]], column_count: int) -> List[InferredColumn]:
+    """Column-wise inference over sample rows (lists of raw string values)."""
+    return [infer_column(row[i] if i < len(row) else None for row in rows) for i in range(column_count)]
+
+def date_order_probes(column_sql: str) -> List[str]:
+    """SQL aggregates: whether any value's first, and any value's second, date component exceeds 12."""
+    return [
+        rf"bool_or(substring(btrim({column_sql}) FROM '^(\d{{1,2}})\D')::int > 12)",
+        rf"bool_or(substring(btrim({column_sql}) FROM '^\d{{1,2}}\D(\d{{1,2}})(\D|$)')::int > 12)",
+    ]
+
+def resolve_date_order(column: InferredColumn, first_over_12: Optional[bool], second_over_12: Optional[bool]) -> InferredColumn:
+    """A day above 12 settles the order; a column where neither or both positions exceed 12 stays TEXT."""
+    if first_over_12 and not second_over_12:
+        return InferredColumn(column.data_type, "DMY")
+    if second_over_12 and not first_over_12:
+        return InferredColumn(column.data_type, "MDY")
+    return InferredColumn("TEXT")
+
+def cast_expression(column_sql: str, column: InferredColumn) -> str:
+    """SQL that converts a TEXT column to the inferred type, yielding NULL for values that don't convert."""
+    date_order = f"'{column.date_order}'" if column.date_order in ("MDY", "DMY") else "NULL"
+    expressions: Dict[str, str] = {
+        "BIGINT": f"try_cast_bigint({column_sql})",
+        "NUMERIC": f"try_cast_numeric({column_sql})",
+        "BOOLEAN": f"try_cast_boolean({column_sql})",
+        "DATE": f"try_cast_date({column_sql}, {date_order})",
+        "TIME": f"try_cast_time({column_sql})",
+        "TIMESTAMP": f"try_cast_timestamp({column_sql}, {date_order})",
+        "TIMESTAMPTZ": f"try_cast_timestamptz({column_sql})",
+    }
+    return expressions.get(column.data_type, column_sql)
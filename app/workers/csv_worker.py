@@ -1,44 +1,36 @@
 from app.config.logger import get_logger
 from app.config.constants import MAX_UPLOAD_RETRIES, SAMPLE_ROW_LIMIT
-from app.utils.db_utils import remove_analysis, delete_temp_table, create_table_from_schema, update_upload_progress_in_queue
+from app.utils.db_utils import LeaseLostError, ensure_job_lease, remove_analysis, delete_temp_table, create_table_from_schema, update_upload_progress_in_queue, notify_metadata_changed, set_analysis_content_hash, load_typed_table, update_analysis_schema, collect_column_stats
 from app.utils.schema_generation import generate_table_schema
-from app.helper.csv_worker_helper import get_sample_rows, add_data_into_table_from_csv
+from app.workers.job_queue import claim_job, job_lease
+from app.helper.csv_worker_helper import get_sample_rows, add_data_into_table_from_csv, detect_encoding
 from app.utils.whatsapp_message import send_upload_status_to_whatsapp
 import os, math, asyncio
 
 logger = get_logger("CSV Worker")
 
-async def fetch_next_csv_job(conn):
+async def csv_processing(conn, pool=None, small_only: bool = False) -> bool:
+    """Claims and runs one pending csv job (only a small one if small_only). Returns False when there was none."""
     try:
-        async with conn.transaction():
-            row = await conn.fetchrow("""
-                UPDATE csv_queue
-                SET status = 'processing'
-                WHERE id = (
-                    SELECT id FROM csv_queue
-                    WHERE status = 'pending'
-                    ORDER BY created_at
-                    FOR UPDATE SKIP LOCKED
-                    LIMIT 1
-                )
-                RETURNING *
-            """)
-            return row
-        logger.info("Checking job successful.")
+        job = await claim_job(conn, 'csv', small_only)
     except Exception as e:
-        logger.error(f"Error while updating the csv queue, {e}")
+        logger.error(f"Error while claiming csv job, {e}")
         raise
+    if not job:
+        return False
+    async with job_lease(job):
+        try:
+            await handle_job(job, conn, pool)
+        except Exception as e:
+            # The job was claimed either way, so the caller keeps draining
+            logger.error(f"CSV job {job['upload_id']} failed: {e}")
+    return True
 
-async def csv_processing(conn):
-    job = await fetch_next_csv_job(conn)
-    if job:
-        await handle_job(dict(job), conn)
-
-async def handle_job(job, conn):
+async def handle_job(job, conn, pool=None):
     try:
         file_path = job["file_path"]
         table_name = job["table_name"]
-        userid = job["user_id"]
+        userid = str(job["user_id"])
         upload_id = job["upload_id"]
         original_file_name = job["original_file_name"]
         medium = job["medium"]
@@ -51,16 +43,17 @@ async def handle_job(job, conn):
                 logger.info(f"Starting CSV processing attempt {attempt}/{MAX_UPLOAD_RETRIES} || File Path: {file_path}, Upload Id: {upload_id}")
 
                 # Step 1: Getting sample data from uploaded file
-                sample_rows = await get_sample_rows(file_path, SAMPLE_ROW_LIMIT)
+                encoding = await detect_encoding(file_path)
+                sample_rows = await get_sample_rows(file_path, SAMPLE_ROW_LIMIT, encoding)
                 logger.info(f"Sample rows extracted {sample_rows['row01']}")
-                await update_upload_progress_in_queue(conn, 'csv_queue', logger, upload_id, 10)
+                await update_upload_progress_in_queue(conn, logger, job, 10)
                 
                 # Step 2: Generating schema using LLM
                 table_schema = await generate_table_schema(conn, userid, table_name, original_file_name, sample_rows, logger)
                 if not table_schema:
                     raise Exception("Schema generation returned None")
                 
-                await update_upload_progress_in_queue(conn, 'csv_queue', logger, upload_id, 30)
+                await update_upload_progress_in_queue(conn, logger, job, 30)
                 analysis_done = True
                 
                 schema = table_schema["schema"]
@@ -68,15 +61,24 @@ async def handle_job(job, conn):
                 # logger.info(f"Schema: {schema}")
                 # logger.info(f"Contain Column: {contain_columns}")
                 
-                # Step 3: Creating DB table using schema generated by LLM                
-                await create_table_from_schema(conn, table_name, schema, logger)
+                # Step 3: Creating an all-TEXT staging table using schema generated by LLM
+                staging_table = f"{table_name}_staging"
+                await create_table_from_schema(conn, staging_table, schema, logger, unlogged=True)
                 table_created = True
-                await update_upload_progress_in_queue(conn, 'csv_queue', logger, upload_id, 70)
+                await update_upload_progress_in_queue(conn, logger, job, 50)
+
+                # Step 4: Inserting full CSV into the staging table
+                await add_data_into_table_from_csv(conn, file_path, staging_table, schema, contain_columns["contain_column"], encoding, pool)
+                await update_upload_progress_in_queue(conn, logger, job, 80)
 
-                # Step 4: Inserting full CSV into DB table
-                await add_data_into_table_from_csv(conn, file_path, table_name, schema, contain_columns["contain_column"])
+                # Step 5: Converting to the locally inferred column types
+                schema = await load_typed_table(conn, staging_table, table_name, schema, logger)
+                await update_analysis_schema(conn, userid, table_name, schema, logger)
+                await collect_column_stats(conn, userid, table_name, schema, logger)
                 logger.info(f"CSV processing completed successfully for upload {upload_id}")
-                await update_upload_progress_in_queue(conn, 'csv_queue', logger, upload_id, 100, "completed")
+                await set_analysis_content_hash(conn, userid, table_name, job.get("content_hash"), logger)
+                await update_upload_progress_in_queue(conn, logger, job, 100, "completed")
+                await notify_metadata_changed(conn, userid, logger)
                 
                 if medium == "WHATSAPP":
                     await send_upload_status_to_whatsapp(userid, logger, receiver_no, f"Upload completed for {original_file_name} and UploadID = {upload_id}")
@@ -85,17 +87,21 @@ async def handle_job(job, conn):
 
             except Exception as e:
                 logger.error(f"CSV processing attempt {attempt} failed for upload_id {upload_id}, {e}")
-                
+                if isinstance(e, LeaseLostError):
+                    raise
+
+                # The tables and analysis row are shared with whichever node re-claimed the job
+                await ensure_job_lease(conn, job, logger)
                 if analysis_done:
                     await remove_analysis(conn, userid, table_name, logger)
                 
                 if table_created:
+                    await delete_temp_table(conn, f"{table_name}_staging", logger)
                     await delete_temp_table(conn, table_name, logger)
                     table_created = False
                 
             if attempt == MAX_UPLOAD_RETRIES:
                 logger.error(f"All {MAX_UPLOAD_RETRIES} attempts failed for upload {upload_id}")
-                await update_upload_progress_in_queue(conn, 'csv_queue', logger, upload_id, 100, "failed")
                 if medium == "WHATSAPP":
                     await send_upload_status_to_whatsapp(userid, logger, receiver_no, f"Upload failed for {original_file_name} and UploadID = {upload_id}")
                 raise
@@ -107,13 +113,15 @@ async def handle_job(job, conn):
 
             # Cleanup if partially created
             if table_created:
+                await delete_temp_table(conn, f"{table_name}_staging", logger)
                 await delete_temp_table(conn, table_name, logger)
 
         # Deleting file received
         os.remove(file_path)
         logger.info(f"Temporary CSV file deleted: {file_path}")
     except Exception as e:
-        await update_upload_progress_in_queue(conn, 'csv_queue', logger, upload_id, 0, "failed")
+        if not isinstance(e, LeaseLostError):
+            await update_upload_progress_in_queue(conn, logger, job, 0, "failed")
         if medium == "WHATSAPP":
             pass
         raise
\ No newline at end of file
@@ -1,117 +1,162 @@
 from app.config.logger import get_logger
-from app.config.constants import MAX_UPLOAD_RETRIES, SAMPLE_ROW_LIMIT
-from app.utils.db_utils import remove_analysis, delete_temp_table, create_table_from_schema, update_upload_progress_in_queue
+from app.config.constants import MAX_UPLOAD_RETRIES, SAMPLE_ROW_LIMIT, EXCEL_SHEET_CONCURRENCY
+from app.utils.db_utils import LeaseLostError, ensure_job_lease, remove_analysis, delete_temp_table, create_table_from_schema, update_upload_progress_in_queue, notify_metadata_changed, set_analysis_content_hash, load_typed_table, update_analysis_schema, collect_column_stats, init_sheet_progress, update_sheet_progress
 from app.utils.schema_generation import generate_table_schema
-from app.helper.excel_worker_helper import get_sample_rows, add_data_into_table_from_excel
+from app.workers.job_queue import claim_job, job_lease
+from app.helper.excel_worker_helper import get_sample_rows, get_sheet_names, add_data_into_table_from_excel
 from app.utils.whatsapp_message import send_upload_status_to_whatsapp
 import os, math, asyncio
 
 logger = get_logger("EXCEL Worker")
 
-async def fetch_next_excel_job(conn):
+async def excel_processing(conn, pool=None, small_only: bool = False) -> bool:
+    """Claims and runs one pending excel job (only a small one if small_only). Returns False when there was none."""
     try:
-        async with conn.transaction():
-            row = await conn.fetchrow("""
-                UPDATE excel_queue
-                SET status = 'processing'
-                WHERE id = (
-                    SELECT id FROM excel_queue
-                    WHERE status = 'pending'
-                    ORDER BY created_at
-                    FOR UPDATE SKIP LOCKED
-                    LIMIT 1
-                )
-                RETURNING *
-            """)
-            return row
-        logger.info("Checking job successful.")
+        job = await claim_job(conn, 'excel', small_only)
     except Exception as e:
-        logger.error(f"Error while updating the excel queue, {e}")
+        logger.error(f"Error while claiming excel job, {e}")
         raise
+    if not job:
+        return False
+    async with job_lease(job):
+        try:
+            await handle_job(job, conn, pool)
+        except Exception as e:
+            # The job was claimed either way, so the caller keeps draining
+            logger.error(f"EXCEL job {job['upload_id']} failed: {e}")
+    return True
 
-async def excel_processing(conn):
-    job = await fetch_next_excel_job(conn)
-    if job:
-        await handle_job(dict(job), conn)
-        
-async def handle_job(job, conn):
+async def process_sheet(conn, job, sheet_name, table_name, file_name, sample_rows) -> bool:
+    """Loads one sheet into its own table with its own analysis_data entry. Returns False once all retries fail."""
+    userid = str(job["user_id"])
+    upload_id = job["upload_id"]
+
+    for attempt in range(1, MAX_UPLOAD_RETRIES + 1):
+        table_created = False
+        analysis_done = False
+        try:
+            logger.info(f"Starting EXCEL sheet '{sheet_name}' attempt {attempt}/{MAX_UPLOAD_RETRIES} || Table: {table_name}, Upload Id: {upload_id}")
+            await update_sheet_progress(conn, job, sheet_name, table_name, 10, logger)
+
+            # Step 2: Generating schema using LLM
+            table_schema = await generate_table_schema(conn, userid, table_name, file_name, sample_rows, logger)
+            if not table_schema:
+                raise Exception("Schema generation returned None")
+
+            await update_sheet_progress(conn, job, sheet_name, table_name, 30, logger)
+            analysis_done = True
+
+            schema = table_schema["schema"]
+            contain_columns = table_schema["contain_columns"]
+
+            # Step 3: Creating an all-TEXT staging table using schema generated by LLM
+            staging_table = f"{table_name}_staging"
+            await create_table_from_schema(conn, staging_table, schema, logger, unlogged=True)
+            table_created = True
+            await update_sheet_progress(conn, job, sheet_name, table_name, 50, logger)
+
+            # Step 4: Inserting the full sheet into the staging table
+            await add_data_into_table_from_excel(conn, job["file_path"], staging_table, schema, contain_columns["contain_column"], sheet_name)
+            await update_sheet_progress(conn, job, sheet_name, table_name, 80, logger)
+
+            # Step 5: Converting to the locally inferred column types
+            schema = await load_typed_table(conn, staging_table, table_name, schema, logger)
+            await update_analysis_schema(conn, userid, table_name, schema, logger)
+            await collect_column_stats(conn, userid, table_name, schema, logger)
+            await update_sheet_progress(conn, job, sheet_name, table_name, 100, logger, 'completed')
+            await notify_metadata_changed(conn, userid, logger)
+            logger.info(f"EXCEL sheet '{sheet_name}' completed successfully for upload {upload_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"EXCEL sheet '{sheet_name}' attempt {attempt} failed for upload_id {upload_id}, {e}")
+            if isinstance(e, LeaseLostError):
+                raise
+
+            # The tables and analysis row are shared with whichever node re-claimed the job
+            await ensure_job_lease(conn, job, logger)
+            if analysis_done:
+                await remove_analysis(conn, userid, table_name, logger)
+
+            if table_created:
+                await delete_temp_table(conn, f"{table_name}_staging", logger)
+                await delete_temp_table(conn, table_name, logger)
+
+        if attempt == MAX_UPLOAD_RETRIES:
+            logger.error(f"All {MAX_UPLOAD_RETRIES} attempts failed for sheet '{sheet_name}' of upload {upload_id}")
+            await update_sheet_progress(conn, job, sheet_name, table_name, 100, logger, 'failed')
+            return False
+
+        # Retry delay (exponential backoff)
+        wait_time = math.pow(2, attempt)
+        logger.info(f"Retrying after {wait_time:.1f} seconds")
+        await asyncio.sleep(wait_time)
+
+async def handle_job(job, conn, pool=None):
     try:
         file_path = job["file_path"]
         table_name = job["table_name"]
-        userid = job["user_id"]
+        userid = str(job["user_id"])
         upload_id = job["upload_id"]
         original_file_name = job["original_file_name"]
         medium = job["medium"]
         receiver_no = job["receiver_no"]
-        
-        for attempt in range(1, MAX_UPLOAD_RETRIES + 1):
-            table_created = False
-            analysis_done = False
-            try:
-                logger.info(f"Starting EXCEL processing attempt {attempt}/{MAX_UPLOAD_RETRIES} || File Path: {file_path}, Upload Id: {upload_id}")
-
-                # Step 1: Getting sample data from uploaded file
-                sample_rows = await get_sample_rows(file_path, SAMPLE_ROW_LIMIT)
-                logger.info(f"Sample rows extracted {sample_rows['row01']}")
-                await update_upload_progress_in_queue(conn, 'excel_queue', logger, upload_id, 10)
-
-                # Step 2: Generating schema using LLM
-                table_schema = await generate_table_schema(conn, userid, table_name, original_file_name, sample_rows, logger)
-                if not table_schema:
-                    raise Exception("Schema generation returned None")
-                
-                await update_upload_progress_in_queue(conn, 'excel_queue', logger, upload_id, 30)
-                analysis_done = True
-                
-                schema = table_schema["schema"]
-                contain_columns = table_schema["contain_columns"]
-                # logger.info(f"Schema: {schema}")
-                # logger.info(f"Contain Column: {contain_columns}")
-                
-                # Step 3: Creating DB table using schema generated by LLM                
-                await create_table_from_schema(conn, table_name, schema, logger)
-                table_created = True
-                await update_upload_progress_in_queue(conn, 'excel_queue', logger, upload_id, 70)
-
-                # Step 4: Inserting full EXCEL into DB table
-                await add_data_into_table_from_excel(conn, file_path, table_name, schema, contain_columns["contain_column"])
-                logger.info(f"EXCEL processing completed successfully for upload {upload_id}")
-                await update_upload_progress_in_queue(conn, 'excel_queue', logger, upload_id, 100, 'completed')
-                
-                if medium == "WHATSAPP":
-                    await send_upload_status_to_whatsapp(userid, logger, receiver_no, f"Upload completed for {original_file_name} and UploadID = {upload_id}")
-                
-                return  
-
-            except Exception as e:
-                logger.error(f"EXCEL processing attempt {attempt} failed for upload_id {upload_id}, {e}")
-                
-                if analysis_done:
-                    await remove_analysis(conn, userid, table_name, logger)
-                
-                if table_created:
-                    await delete_temp_table(conn, table_name, logger)
-                    table_created = False
-                
-            if attempt == MAX_UPLOAD_RETRIES:
-                logger.error(f"All {MAX_UPLOAD_RETRIES} attempts failed for upload {upload_id}")
-                await update_upload_progress_in_queue(conn, 'excel_queue', logger, upload_id, 100, 'failed')
-                if medium == "WHATSAPP":
-                    await send_upload_status_to_whatsapp(userid, logger, receiver_no, f"Upload failed for {original_file_name} and UploadID = {upload_id}")
-                raise
 
-            # Retry delay (exponential backoff)
-            wait_time = math.pow(2, attempt)
-            logger.info(f"Retrying after {wait_time:.1f} seconds")
-            await asyncio.sleep(wait_time)
+        # Step 1: Getting sample data from every sheet; sheets without data are skipped
+        sheet_names = await get_sheet_names(file_path)
+        samples = await asyncio.gather(*(get_sample_rows(file_path, SAMPLE_ROW_LIMIT, name) for name in sheet_names))
+        sheets = [(name, sample_rows) for name, sample_rows in zip(sheet_names, samples) if sample_rows]
+        if not sheets:
+            raise Exception(f"No sheet in {original_file_name} contains data")
+        logger.info(f"Ingesting {len(sheets)} of {len(sheet_names)} sheets for upload {upload_id}")
 
-            # Cleanup if partially created
-            if table_created:
-                await delete_temp_table(conn, table_name, logger)
+        # The first sheet keeps table_<upload id>; the others get a numeric suffix
+        targets = []
+        for i, (sheet_name, sample_rows) in enumerate(sheets):
+            sheet_table = table_name if i == 0 else f"{table_name}_{i}"
+            file_name = original_file_name if len(sheets) == 1 else f"{original_file_name} [{sheet_name}]"[:255]
+            targets.append((sheet_name, sheet_table, file_name, sample_rows))
+
+        await init_sheet_progress(conn, job, {
+            sheet_name: {"table_name": sheet_table, "progress": 0, "status": "pending"}
+            for sheet_name, sheet_table, _, _ in targets
+        }, logger)
+
+        # Each sheet runs on its own pool connection; without a pool they share conn one at a time
+        semaphore = asyncio.Semaphore(EXCEL_SHEET_CONCURRENCY if pool else 1)
+
+        async def run_sheet(sheet_name, sheet_table, file_name, sample_rows):
+            async with semaphore:
+                if pool is None:
+                    return await process_sheet(conn, job, sheet_name, sheet_table, file_name, sample_rows)
+                async with pool.acquire() as sheet_conn:
+                    return await process_sheet(sheet_conn, job, sheet_name, sheet_table, file_name, sample_rows)
+
+        results = await asyncio.gather(*(run_sheet(*target) for target in targets))
+        failed = [target[0] for target, ok in zip(targets, results) if not ok]
+
+        if len(failed) == len(targets):
+            logger.error(f"All sheets failed for upload {upload_id}")
+            if medium == "WHATSAPP":
+                await send_upload_status_to_whatsapp(userid, logger, receiver_no, f"Upload failed for {original_file_name} and UploadID = {upload_id}")
+            raise Exception(f"No sheet of {original_file_name} could be ingested")
+
+        if not failed:
+            # Only a fully loaded workbook counts as a duplicate, so a partial one can be re-uploaded;
+            # duplicate detection maps the hash back to table_<upload id>
+            await set_analysis_content_hash(conn, userid, table_name, job.get("content_hash"), logger)
+        await update_upload_progress_in_queue(conn, logger, job, 100, 'completed')
+        logger.info(f"EXCEL processing completed for upload {upload_id}, failed sheets: {failed}")
+        if medium == "WHATSAPP":
+            message = f"Upload completed for {original_file_name} and UploadID = {upload_id}"
+            if failed:
+                message += f" (sheets not loaded: {', '.join(failed)})"
+            await send_upload_status_to_whatsapp(userid, logger, receiver_no, message)
 
         # Deleting file received
         os.remove(file_path)
         logger.info(f"Temporary EXCEL file deleted: {file_path}")
     except Exception as e:
-        await update_upload_progress_in_queue(conn, 'csv_queue', logger, upload_id, 0, "failed")
+        if not isinstance(e, LeaseLostError):
+            await update_upload_progress_in_queue(conn, logger, job, 0, "failed")
         raise
\ No newline at end of file
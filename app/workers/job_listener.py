@@ -2,37 +2,64 @@ import asyncpg
 import asyncio
 from app.config.settings import settings
 from app.config.logger import get_logger
-from app.config.constants import NO_OF_CSV_WORKER_TASKS, CONCURRENCY_LIMIT_FOR_CSV_WORKER_TAKS, CSV_NOTIFY_CHANNEL, EXCEL_NOTIFY_CHANNEL
+from app.config.database_config.postgres import database as db
+from app.config.constants import CSV_NOTIFY_CHANNEL, EXCEL_NOTIFY_CHANNEL, JOB_NOTIFY_CHANNELS, JOB_POLL_INTERVAL_SECONDS, EXCEL_SHEET_CONCURRENCY
 from .csv_worker import csv_processing
 from .excel_worker import excel_processing
+from .job_queue import reap_expired_jobs, run_reaper, run_lease_heartbeat
+from .worker_node import NODE_ID, node_concurrency, pending_job_counts, run_node_heartbeat, deregister_node
+from app.utils.cpu_pool import start_cpu_pool, shutdown_cpu_pool
 from asyncpg.exceptions import ConnectionDoesNotExistError
 
 logger = get_logger("Job Listener")
-semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT_FOR_CSV_WORKER_TAKS)
 
-async def process_next_job(conn, file_type):
+async def process_next_job(conn, file_type, pool=None, small_only: bool = False) -> bool:
+    """
+    Runs one pending job of file_type, if any. Returns whether a job was claimed, whatever its
+    outcome; False means the queue was empty or the claim itself failed.
+    """
     try: 
-        async with semaphore:
-            if file_type == 'csv':  
-                logger.info("Starting CSV processing")
-                await csv_processing(conn)
-            else:
-                logger.info("Starting EXCEL processing")
-                await excel_processing(conn)
+        if file_type == 'csv':  
+            # The pool lets large CSVs be COPYed over several connections
+            return await csv_processing(conn, pool, small_only)
+        else:
+            return await excel_processing(conn, pool, small_only)
     except Exception as e:
-        logger.error(f"Task processing failed while executing pending job: {e}")
+        logger.error(f"Failed to claim a {file_type} job: {e}")
+        return False
 
-async def process_next_job_worker(pool, queue):
+async def drain_jobs(pool, file_type, small_only: bool = False):
+    """Claims jobs of file_type with SKIP LOCKED until none is pending."""
     while True:
-        job_payload = await queue.get() # worker will wait here if queue is empty, 
-        file_type = job_payload["file_type"] # All workers will wait here, once job get add execution will resume in FIFO order.
         try:
+            # A connection per job, so idle workers hold none
             async with pool.acquire() as conn:
-                await process_next_job(conn, file_type)
+                if not await process_next_job(conn, file_type, pool, small_only):
+                    return
         except Exception as e:
             logger.exception(f"Failed to process job: {e}")
-        finally:
-            queue.task_done()
+            return
+
+async def process_next_job_worker(pool, file_type, wakeup: asyncio.Event, small_only: bool = False):
+    while True:
+        try:
+            # Notifications only wake the workers; the poll catches jobs whose NOTIFY was missed
+            await asyncio.wait_for(wakeup.wait(), timeout=JOB_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        # Cleared before draining, so a NOTIFY that arrives mid-drain triggers another pass
+        wakeup.clear()
+        await drain_jobs(pool, file_type, small_only)
+
+def reserved_small_workers(count: int) -> int:
+    # At least one worker per type still takes large jobs
+    return max(0, min(settings.SMALL_JOB_RESERVED_WORKERS, count - 1))
+
+def worker_pool_size(concurrency) -> int:
+    # Each job holds a connection, plus one per parallel COPY stream or Excel sheet it fans out to;
+    # the reaper and node heartbeat take one each (lease heartbeats have their own connection)
+    fan_out = {'csv': settings.CSV_PARALLEL_COPY_CHUNKS, 'excel': EXCEL_SHEET_CONCURRENCY}
+    return settings.WORKER_DB_POOL_SIZE or sum(count * (1 + fan_out[file_type]) for file_type, count in concurrency.items()) + 2
 
 async def periodic_pinger(conn, activity_event: asyncio.Event, idle_timeout: int = 180):
     while True:
@@ -62,11 +89,13 @@ async def periodic_pinger(conn, activity_event: asyncio.Event, idle_timeout: int
             logger.error(f"Pinger encountered an error: {e}. Stopping.")
             break
 
-async def notification_listener(conn, queue, activity_event: asyncio.Event):
+async def notification_listener(conn, wakeups, activity_event: asyncio.Event):
     async def callback(conn, pid, channel, payload):
         logger.info(f"Received notification on '{channel}', pid: {pid}, payload: {payload}")
         activity_event.set()  # Signal that activity has occurred!
-        await queue.put({"file_type": payload}) 
+        # The payload is the job type; anything else wakes every worker
+        for wakeup in ([wakeups[payload]] if payload in wakeups else wakeups.values()):
+            wakeup.set()
         
     await conn.add_listener(CSV_NOTIFY_CHANNEL, callback)
     await conn.add_listener(EXCEL_NOTIFY_CHANNEL, callback)
@@ -77,6 +106,9 @@ async def notification_listener(conn, queue, activity_event: asyncio.Event):
             
 async def listen_and_process():
     pinger_task = None
+    reaper_task = None
+    node_task = None
+    lease_task = None
     listener_conn = None
     pool = None
     try:
@@ -95,20 +127,46 @@ async def listen_and_process():
         pinger_task = asyncio.create_task(periodic_pinger(listener_conn, activity_event, 180))
         logger.info("Connection pinger started.")
         
-        pool = await asyncpg.create_pool(dsn=settings.DATABASE_URL, min_size=5, max_size=10)
+        concurrency = node_concurrency()
+        pool = await asyncpg.create_pool(dsn=settings.DATABASE_URL, min_size=5, max_size=worker_pool_size(concurrency))
         logger.info("Workers database connection pool established.")
 
-        # Creating a bounded queue for all the incoming jobs
-        queue = asyncio.Queue(maxsize=100)  # Avoid unbounded memory use
+        # Parsing, transcoding and type inference run here; the event loop keeps I/O and LLM calls
+        start_cpu_pool()
+
+        if settings.LLM_CACHE_SHARED:
+            # Lets schema generation read and fill the shared LLM response cache
+            await db.connect()
+            logger.info("Shared LLM cache connection established.")
+
+        # Set by job notifications of each type; workers drain their type's queue on each wake-up
+        wakeups = {file_type: asyncio.Event() for file_type in JOB_NOTIFY_CHANNELS}
 
         # Starting listener
-        await notification_listener(listener_conn, queue, activity_event)
+        await notification_listener(listener_conn, wakeups, activity_event)
+
+        lease_task = asyncio.create_task(run_lease_heartbeat())
 
-        # Start worker pool
+        # Start worker pool, sized per job type for this node; the first few workers of each
+        # type only take small files, so large jobs can never occupy every worker
         workers = [
-            asyncio.create_task(process_next_job_worker(pool, queue))
-            for _ in range(NO_OF_CSV_WORKER_TASKS)
+            asyncio.create_task(process_next_job_worker(pool, file_type, wakeups[file_type], i < reserved_small_workers(count)))
+            for file_type, count in concurrency.items()
+            for i in range(count)
         ]
+        logger.info(f"Worker node {NODE_ID} started with concurrency {concurrency}")
+
+        # Jobs left behind by a crashed worker are re-queued once their lease expires
+        async with pool.acquire() as conn:
+            await reap_expired_jobs(conn)
+            pending = await pending_job_counts(conn)
+        for file_type, count in pending.items():
+            logger.info(f"{count} pending {file_type} jobs found at startup")
+        # Jobs enqueued while no listener was up are drained right away, by every worker
+        for wakeup in wakeups.values():
+            wakeup.set()
+        reaper_task = asyncio.create_task(run_reaper(pool))
+        node_task = asyncio.create_task(run_node_heartbeat(pool))
         
         stop_event = asyncio.Event()
         await stop_event.wait()
@@ -122,6 +180,18 @@ async def listen_and_process():
         if pinger_task:
             pinger_task.cancel()
             logger.info("Pinger task cancelled.")
+        if reaper_task:
+            reaper_task.cancel()
+            logger.info("Job reaper cancelled.")
+        if lease_task:
+            lease_task.cancel()
+            await asyncio.gather(lease_task, return_exceptions=True)
+            logger.info("Lease heartbeat cancelled.")
+        if node_task:
+            node_task.cancel()
+            await deregister_node(pool)
+            logger.info(f"Worker node {NODE_ID} deregistered.")
+        shutdown_cpu_pool()
         if listener_conn:
             try:
                 if 'listener_conn' in locals() and not listener_conn.is_closed():
@@ -136,6 +206,12 @@ async def listen_and_process():
                     logger.info("Worker pool closed.")
             except Exception as e:
                 logger.warning(f"Error closing pool: {e}")
+        if db.is_connected:
+            try:
+                await db.disconnect()
+                logger.info("Shared LLM cache connection closed.")
+            except Exception as e:
+                logger.warning(f"Error closing shared LLM cache connection: {e}")
     
     logger.info("Shutting down.")
 
@@ -0,0 +1,120 @@
+import asyncio
+import asyncpg
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Set
+from app.config.settings import settings
+from app.config.logger import get_logger
+from app.config.constants import JOB_LEASE_SECONDS, JOB_HEARTBEAT_SECONDS, JOB_REAPER_INTERVAL_SECONDS, JOB_MAX_ATTEMPTS, JOB_NOTIFY_CHANNELS, JOB_SMALL_FILE_BYTES, JOB_PRIORITY_AGING_SECONDS, JOB_PRIORITY_WEIGHTS
+from app.workers.worker_node import NODE_ID, record_claim, job_started, job_finished
+
+logger = get_logger("Job Listener")
+
+# Ids of the jobs this node is running; run_lease_heartbeat extends their leases
+_leased_jobs: Set[int] = set()
+
+async def claim_job(conn, job_type: str, small_only: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Leases a pending job of a type for JOB_LEASE_SECONDS; the lease is kept alive by job_lease.
+    Jobs go by priority lane, then users with the fewest jobs in progress across the fleet,
+    then age, so one user's batch of uploads can't hold every worker. Waiting only lifts a
+    job to a higher lane (one per JOB_PRIORITY_AGING_SECONDS, up to the top one), never above
+    jobs already in its lane.
+    small_only restricts the claim to files up to JOB_SMALL_FILE_BYTES.
+    """
+    row = await conn.fetchrow("""
+        UPDATE ingest_jobs
+        SET status = 'processing',
+            attempts = attempts + 1,
+            locked_by = $2,
+            locked_until = NOW() + make_interval(secs => $3),
+            updated_at = NOW()
+        WHERE id = (
+            SELECT j.id FROM ingest_jobs j
+            WHERE j.status = 'pending' AND j.job_type = $1
+              AND (NOT $4 OR j.byte_size <= $5)
+            ORDER BY
+                GREATEST(j.priority, LEAST(floor(EXTRACT(EPOCH FROM NOW() - j.created_at)::float8 / $6::float8), $7::float8)) DESC,
+                (
+                    SELECT count(*) FROM ingest_jobs r
+                    WHERE r.user_id = j.user_id AND r.status = 'processing'
+                ),
+                j.created_at
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING *, EXTRACT(EPOCH FROM NOW() - created_at)::float8 AS queued_seconds
+    """, job_type, NODE_ID, JOB_LEASE_SECONDS, small_only, JOB_SMALL_FILE_BYTES, JOB_PRIORITY_AGING_SECONDS, sum(JOB_PRIORITY_WEIGHTS.values()))
+    if not row:
+        return None
+    record_claim(job_type, row["queued_seconds"])
+    return dict(row)
+
+async def run_lease_heartbeat():
+    """
+    Extends the leases of all jobs running on this node every JOB_HEARTBEAT_SECONDS, in one
+    UPDATE on a connection of its own, so it never waits behind bulk loads for a pool connection.
+    """
+    conn = None
+    try:
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            if not _leased_jobs:
+                continue
+            try:
+                if conn is None or conn.is_closed():
+                    conn = await asyncpg.connect(dsn=settings.DATABASE_URL)
+                await conn.execute("""
+                    UPDATE ingest_jobs
+                    SET locked_until = NOW() + make_interval(secs => $3)
+                    WHERE id = ANY($1::bigint[]) AND status = 'processing' AND locked_by = $2
+                """, list(_leased_jobs), NODE_ID, JOB_LEASE_SECONDS)
+            except Exception as e:
+                logger.warning(f"Failed to extend job leases: {e}")
+    finally:
+        if conn is not None and not conn.is_closed():
+            await conn.close()
+
+@asynccontextmanager
+async def job_lease(job: Dict[str, Any]):
+    """Keeps the job's lease extended by run_lease_heartbeat while the block runs."""
+    _leased_jobs.add(job["id"])
+    job_started(job["job_type"])
+    try:
+        yield
+    finally:
+        job_finished(job["job_type"])
+        _leased_jobs.discard(job["id"])
+
+async def reap_expired_jobs(conn) -> int:
+    """
+    Returns jobs whose lease expired (their worker died) to 'pending', or marks them 'failed'
+    after JOB_MAX_ATTEMPTS claims, and wakes the listeners for the re-queued types.
+    """
+    rows = await conn.fetch("""
+        UPDATE ingest_jobs
+        SET status = CASE WHEN attempts >= $1 THEN 'failed' ELSE 'pending' END,
+            progress = 0,
+            locked_by = NULL,
+            locked_until = NULL,
+            last_error = 'Lease expired for ' || COALESCE(locked_by, 'unknown worker'),
+            updated_at = NOW()
+        WHERE status = 'processing' AND locked_until < NOW()
+        RETURNING upload_id, job_type, status
+    """, JOB_MAX_ATTEMPTS)
+
+    for row in rows:
+        logger.warning(f"Lease expired for {row['job_type']} job {row['upload_id']}, now {row['status']}")
+        if row["status"] == "pending":
+            await conn.execute("SELECT pg_notify($1, $2)", JOB_NOTIFY_CHANNELS[row["job_type"]], row["job_type"])
+    return len(rows)
+
+async def run_reaper(pool):
+    while True:
+        try:
+            async with pool.acquire() as conn:
+                await reap_expired_jobs(conn)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job reaper failed: {e}")
+        await asyncio.sleep(JOB_REAPER_INTERVAL_SECONDS)
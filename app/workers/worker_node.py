@@ -0,0 +1,87 @@
+import os
+import json
+import socket
+import asyncio
+from typing import Any, Dict
+from app.config.logger import get_logger
+from app.config.settings import settings
+from app.config.constants import JOB_NOTIFY_CHANNELS, WORKER_NODE_HEARTBEAT_SECONDS, WORKER_NODE_RETENTION_HOURS
+
+logger = get_logger("Job Listener")
+
+# Identifies this node in worker_nodes and as the lease holder in ingest_jobs.locked_by
+NODE_ID = settings.WORKER_NODE_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+def node_concurrency() -> Dict[str, int]:
+    """Worker tasks per job type on this node."""
+    return {"csv": settings.CSV_WORKER_CONCURRENCY, "excel": settings.EXCEL_WORKER_CONCURRENCY}
+
+_stats: Dict[str, Dict[str, Any]] = {
+    job_type: {"running": 0, "claimed": 0, "claim_latency_total_ms": 0.0, "last_claim_latency_ms": None}
+    for job_type in JOB_NOTIFY_CHANNELS
+}
+
+def record_claim(job_type: str, wait_seconds: float):
+    """Counts a claim and how long the job waited in the queue before it."""
+    stats = _stats[job_type]
+    stats["claimed"] += 1
+    stats["claim_latency_total_ms"] += wait_seconds * 1000
+    stats["last_claim_latency_ms"] = round(wait_seconds * 1000, 1)
+
+def job_started(job_type: str):
+    _stats[job_type]["running"] += 1
+
+def job_finished(job_type: str):
+    _stats[job_type]["running"] -= 1
+
+def node_stats(pending: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+    concurrency = node_concurrency()
+    return {
+        job_type: {
+            "concurrency": concurrency[job_type],
+            "running": stats["running"],
+            "claimed": stats["claimed"],
+            # Queue depth as this node last saw it; the queue itself is shared by the fleet
+            "pending": pending.get(job_type, 0),
+            "avg_claim_latency_ms": round(stats["claim_latency_total_ms"] / stats["claimed"], 1) if stats["claimed"] else None,
+            "last_claim_latency_ms": stats["last_claim_latency_ms"],
+        }
+        for job_type, stats in _stats.items()
+    }
+
+async def pending_job_counts(conn) -> Dict[str, int]:
+    rows = await conn.fetch("SELECT job_type, count(*) AS pending FROM ingest_jobs WHERE status = 'pending' GROUP BY job_type")
+    return {row["job_type"]: row["pending"] for row in rows}
+
+async def report_node(conn, pending: Dict[str, int]):
+    await conn.execute("""
+        INSERT INTO worker_nodes (node_id, hostname, pid, stats)
+        VALUES ($1, $2, $3, $4::jsonb)
+        ON CONFLICT (node_id) DO UPDATE SET
+            stats = EXCLUDED.stats,
+            last_seen_at = NOW()
+    """, NODE_ID, socket.gethostname(), os.getpid(), json.dumps(node_stats(pending)))
+
+async def run_node_heartbeat(pool):
+    """Publishes this node's stats to worker_nodes every WORKER_NODE_HEARTBEAT_SECONDS."""
+    while True:
+        try:
+            async with pool.acquire() as conn:
+                await report_node(conn, await pending_job_counts(conn))
+                # Nodes that stopped without deregistering (crash, OOM kill)
+                await conn.execute(
+                    "DELETE FROM worker_nodes WHERE last_seen_at < NOW() - make_interval(hours => $1)",
+                    WORKER_NODE_RETENTION_HOURS
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Worker node heartbeat failed: {e}")
+        await asyncio.sleep(WORKER_NODE_HEARTBEAT_SECONDS)
+
+async def deregister_node(pool):
+    try:
+        async with pool.acquire() as conn:
+            await conn.execute("DELETE FROM worker_nodes WHERE node_id = $1", NODE_ID)
+    except Exception as e:
+        logger.warning(f"Failed to deregister worker node {NODE_ID}: {e}")
@@ -7,6 +7,7 @@ from app.config.database_config.db_base import Base
 from app.schemas.user_schema import *
 from app.schemas.metadata_schema import *
 from app.schemas.queue_schema import *
+from app.schemas.cache_schema import *
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -0,0 +1,108 @@
+"""Replace csv_queue and excel_queue with a leased ingest_jobs table
+
+Revision ID: 3f9a6d2c8b14
+Revises: a7e2c4b9f611
+Create Date: 2026-10-17 20:12:51.338604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a6d2c8b14'
+down_revision: Union[str, Sequence[str], None] = 'a7e2c4b9f611'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+QUEUE_COLUMNS = "upload_id, table_name, file_path, original_file_name, progress, medium, receiver_no, content_hash, byte_size, created_at"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ingest_jobs',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('upload_id', sa.UUID(), nullable=False),
+    sa.Column('job_type', sa.Text(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('table_name', sa.Text(), nullable=False),
+    sa.Column('file_path', sa.Text(), nullable=False),
+    sa.Column('original_file_name', sa.Text(), nullable=False),
+    sa.Column('status', sa.Text(), server_default='pending', nullable=False),
+    sa.Column('progress', sa.SmallInteger(), server_default='0', nullable=False),
+    sa.Column('medium', sa.Text(), nullable=True),
+    sa.Column('receiver_no', sa.Text(), nullable=True),
+    sa.Column('content_hash', sa.Text(), nullable=True),
+    sa.Column('byte_size', sa.BigInteger(), nullable=True),
+    sa.Column('sheet_progress', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('locked_by', sa.Text(), nullable=True),
+    sa.Column('locked_until', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.CheckConstraint("job_type IN ('csv', 'excel')", name='ingest_jobs_job_type_check'),
+    sa.CheckConstraint("status IN ('pending', 'processing', 'completed', 'failed')", name='ingest_jobs_status_check'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('upload_id')
+    )
+    op.create_index('idx_ingest_jobs_pending', 'ingest_jobs', ['job_type', 'created_at'], unique=False, postgresql_where=sa.text("status = 'pending'"))
+    op.create_index('idx_ingest_jobs_lease', 'ingest_jobs', ['locked_until'], unique=False, postgresql_where=sa.text("status = 'processing'"))
+    op.create_index('idx_ingest_jobs_user_hash', 'ingest_jobs', ['user_id', 'content_hash'], unique=False, postgresql_where=sa.text("status IN ('pending', 'processing')"))
+
+    # Jobs that were mid-flight in the old queues have no lease to expire, so they start over
+    for job_type, table, extra in (('csv', 'csv_queue', 'NULL'), ('excel', 'excel_queue', 'sheet_progress')):
+        op.execute(f"""
+            INSERT INTO ingest_jobs (job_type, user_id, status, sheet_progress, {QUEUE_COLUMNS})
+            SELECT '{job_type}', user_id::uuid,
+                   CASE WHEN status = 'processing' THEN 'pending' ELSE status END,
+                   {extra}, {QUEUE_COLUMNS}
+            FROM {table}
+            WHERE status IN ('pending', 'processing', 'completed', 'failed')
+        """)
+
+    op.drop_index('idx_csv_queue_status_upload_id_progress', table_name='csv_queue')
+    op.drop_table('csv_queue')
+    op.drop_index('idx_excel_queue_status_upload_id_progress', table_name='excel_queue')
+    op.drop_table('excel_queue')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, extra in (('csv_queue', ''), ('excel_queue', 'sheet_progress JSONB NULL,')):
+        op.execute(f"""
+            CREATE UNLOGGED TABLE {table} (
+                id SERIAL PRIMARY KEY,
+                upload_id UUID UNIQUE NOT NULL,
+                user_id TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                original_file_name TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                progress SMALLINT NOT NULL DEFAULT 0,
+                medium TEXT NULL,
+                receiver_no TEXT NULL,
+                content_hash TEXT NULL,
+                byte_size BIGINT NULL,
+                {extra}
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+        op.create_index(f'idx_{table}_status_upload_id_progress', table, ['status', 'upload_id', 'progress'], unique=False)
+
+    op.execute(f"""
+        INSERT INTO csv_queue (user_id, status, {QUEUE_COLUMNS})
+        SELECT user_id::text, status, {QUEUE_COLUMNS} FROM ingest_jobs WHERE job_type = 'csv'
+    """)
+    op.execute(f"""
+        INSERT INTO excel_queue (user_id, status, sheet_progress, {QUEUE_COLUMNS})
+        SELECT user_id::text, status, sheet_progress, {QUEUE_COLUMNS} FROM ingest_jobs WHERE job_type = 'excel'
+    """)
+
+    op.drop_index('idx_ingest_jobs_user_hash', table_name='ingest_jobs')
+    op.drop_index('idx_ingest_jobs_lease', table_name='ingest_jobs')
+    op.drop_index('idx_ingest_jobs_pending', table_name='ingest_jobs')
+    op.drop_table('ingest_jobs')
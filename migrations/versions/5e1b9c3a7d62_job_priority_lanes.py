@@ -0,0 +1,30 @@
+"""Priority lanes for ingest jobs and user plans
+
+Revision ID: 5e1b9c3a7d62
+Revises: 8c4d2e7b1f39
+Create Date: 2026-10-17 21:48:36.917240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1b9c3a7d62'
+down_revision: Union[str, Sequence[str], None] = '8c4d2e7b1f39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('plan', sa.Text(), server_default='free', nullable=False))
+    op.add_column('ingest_jobs', sa.Column('priority', sa.SmallInteger(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ingest_jobs', 'priority')
+    op.drop_column('users', 'plan')
@@ -0,0 +1,38 @@
+"""LLM response cache
+
+Revision ID: 6b1d2e7f4a90
+Revises: 28e0bf15d583
+Create Date: 2026-10-17 10:12:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b1d2e7f4a90'
+down_revision: Union[str, Sequence[str], None] = '28e0bf15d583'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('llm_response_cache',
+    sa.Column('cache_key', sa.Text(), nullable=False),
+    sa.Column('model_name', sa.Text(), nullable=False),
+    sa.Column('response', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('cache_key'),
+    prefixes=['UNLOGGED']
+    )
+    op.create_index('idx_llm_response_cache_expires_at', 'llm_response_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_llm_response_cache_expires_at', table_name='llm_response_cache')
+    op.drop_table('llm_response_cache')
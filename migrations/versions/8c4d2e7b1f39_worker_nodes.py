@@ -0,0 +1,39 @@
+"""Worker node registry and per-user running job index
+
+Revision ID: 8c4d2e7b1f39
+Revises: 3f9a6d2c8b14
+Create Date: 2026-10-17 21:05:13.482917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4d2e7b1f39'
+down_revision: Union[str, Sequence[str], None] = '3f9a6d2c8b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('worker_nodes',
+    sa.Column('node_id', sa.Text(), nullable=False),
+    sa.Column('hostname', sa.Text(), nullable=False),
+    sa.Column('pid', sa.Integer(), nullable=False),
+    sa.Column('stats', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('started_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('last_seen_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('node_id')
+    )
+    op.create_index('idx_ingest_jobs_running_user', 'ingest_jobs', ['user_id'], unique=False, postgresql_where=sa.text("status = 'processing'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_ingest_jobs_running_user', table_name='ingest_jobs')
+    op.drop_table('worker_nodes')
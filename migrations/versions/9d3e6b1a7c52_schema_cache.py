@@ -0,0 +1,41 @@
+"""Schema cache keyed by file shape
+
+Revision ID: 9d3e6b1a7c52
+Revises: f2b7c9d41e85
+Create Date: 2026-10-17 16:05:12.208934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3e6b1a7c52'
+down_revision: Union[str, Sequence[str], None] = 'f2b7c9d41e85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('schema_cache',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('fingerprint', sa.Text(), nullable=False),
+    sa.Column('schema', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('contain_columns', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('column_insights', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('hit_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('insights_updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('last_used_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'fingerprint')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('schema_cache')
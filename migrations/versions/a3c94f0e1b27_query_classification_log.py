@@ -0,0 +1,39 @@
+"""Query classification log
+
+Revision ID: a3c94f0e1b27
+Revises: 6b1d2e7f4a90
+Create Date: 2026-10-17 12:48:03.552710
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c94f0e1b27'
+down_revision: Union[str, Sequence[str], None] = '6b1d2e7f4a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('query_classification_log',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('namespace', sa.Text(), nullable=False),
+    sa.Column('user_query', sa.Text(), nullable=False),
+    sa.Column('type', sa.Text(), nullable=False),
+    sa.Column('tier', sa.Text(), nullable=False),
+    sa.Column('latency_ms', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_query_classification_log_tier_created_at', 'query_classification_log', ['tier', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_query_classification_log_tier_created_at', table_name='query_classification_log')
+    op.drop_table('query_classification_log')
@@ -0,0 +1,52 @@
+"""Index advisor usage counts and created indexes
+
+Revision ID: a7e2c4b9f611
+Revises: d6c1f8e93a04
+Create Date: 2026-10-17 18:40:27.905311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e2c4b9f611'
+down_revision: Union[str, Sequence[str], None] = 'd6c1f8e93a04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('index_usage',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('table_name', sa.String(length=255), nullable=False),
+    sa.Column('column_name', sa.Text(), nullable=False),
+    sa.Column('uses', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_used_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id', 'table_name'], ['analysis_data.id', 'analysis_data.table_name'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('table_name', 'column_name')
+    )
+    op.create_index('idx_index_usage_uses', 'index_usage', ['uses'], unique=False)
+    op.create_table('advised_indexes',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('table_name', sa.String(length=255), nullable=False),
+    sa.Column('column_name', sa.Text(), nullable=False),
+    sa.Column('index_name', sa.Text(), nullable=False),
+    sa.Column('method', sa.Text(), nullable=False),
+    sa.Column('uses', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id', 'table_name'], ['analysis_data.id', 'analysis_data.table_name'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('table_name', 'column_name')
+    )
+    op.create_index('idx_advised_indexes_user_id', 'advised_indexes', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_advised_indexes_user_id', table_name='advised_indexes')
+    op.drop_table('advised_indexes')
+    op.drop_index('idx_index_usage_uses', table_name='index_usage')
+    op.drop_table('index_usage')
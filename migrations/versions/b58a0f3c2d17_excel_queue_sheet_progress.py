@@ -0,0 +1,29 @@
+"""Per-sheet progress for workbook uploads
+
+Revision ID: b58a0f3c2d17
+Revises: 9d3e6b1a7c52
+Create Date: 2026-10-17 17:12:40.671203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b58a0f3c2d17'
+down_revision: Union[str, Sequence[str], None] = '9d3e6b1a7c52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('excel_queue', sa.Column('sheet_progress', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('excel_queue', 'sheet_progress')
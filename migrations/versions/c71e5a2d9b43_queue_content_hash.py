@@ -0,0 +1,32 @@
+"""Queue content hash and byte size
+
+Revision ID: c71e5a2d9b43
+Revises: a3c94f0e1b27
+Create Date: 2026-10-17 14:05:27.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71e5a2d9b43'
+down_revision: Union[str, Sequence[str], None] = 'a3c94f0e1b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ('csv_queue', 'excel_queue'):
+        op.add_column(table, sa.Column('content_hash', sa.Text(), nullable=True))
+        op.add_column(table, sa.Column('byte_size', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('csv_queue', 'excel_queue'):
+        op.drop_column(table, 'byte_size')
+        op.drop_column(table, 'content_hash')
@@ -0,0 +1,44 @@
+"""Column statistics catalog
+
+Revision ID: d6c1f8e93a04
+Revises: b58a0f3c2d17
+Create Date: 2026-10-17 17:58:03.114862
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6c1f8e93a04'
+down_revision: Union[str, Sequence[str], None] = 'b58a0f3c2d17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('column_stats',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('table_name', sa.String(length=255), nullable=False),
+    sa.Column('column_name', sa.Text(), nullable=False),
+    sa.Column('data_type', sa.Text(), nullable=False),
+    sa.Column('row_count', sa.BigInteger(), nullable=False),
+    sa.Column('null_frac', sa.REAL(), nullable=True),
+    sa.Column('distinct_estimate', sa.BigInteger(), nullable=True),
+    sa.Column('min_value', sa.Text(), nullable=True),
+    sa.Column('max_value', sa.Text(), nullable=True),
+    sa.Column('top_values', postgresql.JSONB(astext_type=sa.Text()), server_default='[]', nullable=False),
+    sa.Column('histogram', postgresql.JSONB(astext_type=sa.Text()), server_default='[]', nullable=False),
+    sa.Column('computed_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id', 'table_name'], ['analysis_data.id', 'analysis_data.table_name'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'table_name', 'column_name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('column_stats')
@@ -0,0 +1,30 @@
+"""Analysis data content hash
+
+Revision ID: e4f8a1c6d320
+Revises: c71e5a2d9b43
+Create Date: 2026-10-17 14:41:09.530817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4f8a1c6d320'
+down_revision: Union[str, Sequence[str], None] = 'c71e5a2d9b43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('analysis_data', sa.Column('content_hash', sa.Text(), nullable=True))
+    op.create_index('idx_analysis_data_id_content_hash', 'analysis_data', ['id', 'content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_analysis_data_id_content_hash', table_name='analysis_data')
+    op.drop_column('analysis_data', 'content_hash')
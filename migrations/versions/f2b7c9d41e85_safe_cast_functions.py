@@ -0,0 +1,93 @@
+"""Safe cast functions for typed uploads
+
+Revision ID: f2b7c9d41e85
+Revises: e4f8a1c6d320
+Create Date: 2026-10-17 15:22:46.384120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7c9d41e85'
+down_revision: Union[str, Sequence[str], None] = 'e4f8a1c6d320'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(r"""
+    CREATE OR REPLACE FUNCTION try_cast_bigint(value TEXT) RETURNS BIGINT AS $$
+        SELECT CASE WHEN value ~ '^\s*[-+]?\d{1,18}\s*$' THEN btrim(value)::BIGINT END
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+    CREATE OR REPLACE FUNCTION try_cast_numeric(value TEXT) RETURNS NUMERIC AS $$
+        SELECT CASE WHEN value ~ '^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$' THEN btrim(value)::NUMERIC END
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+    CREATE OR REPLACE FUNCTION try_cast_boolean(value TEXT) RETURNS BOOLEAN AS $$
+        SELECT CASE
+            WHEN lower(btrim(value)) IN ('true', 't', 'yes', 'y') THEN TRUE
+            WHEN lower(btrim(value)) IN ('false', 'f', 'no', 'n') THEN FALSE
+        END
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+    -- Month-first/day-first values are rewritten to year-first, which parses the same under any DateStyle
+    CREATE OR REPLACE FUNCTION to_iso_date_text(value TEXT, date_order TEXT) RETURNS TEXT AS $$
+        SELECT CASE date_order
+            WHEN 'MDY' THEN regexp_replace(btrim(value), '^(\d{1,2})[-/](\d{1,2})[-/](\d{4})', '\3-\1-\2')
+            WHEN 'DMY' THEN regexp_replace(btrim(value), '^(\d{1,2})[-/](\d{1,2})[-/](\d{4})', '\3-\2-\1')
+            ELSE btrim(value)
+        END
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+    CREATE OR REPLACE FUNCTION try_cast_date(value TEXT, date_order TEXT) RETURNS DATE AS $$
+    BEGIN
+        RETURN to_iso_date_text(value, date_order)::DATE;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql STABLE PARALLEL RESTRICTED;
+
+    CREATE OR REPLACE FUNCTION try_cast_timestamp(value TEXT, date_order TEXT) RETURNS TIMESTAMP AS $$
+    BEGIN
+        RETURN to_iso_date_text(value, date_order)::TIMESTAMP;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql STABLE PARALLEL RESTRICTED;
+
+    CREATE OR REPLACE FUNCTION try_cast_timestamptz(value TEXT) RETURNS TIMESTAMPTZ AS $$
+    BEGIN
+        RETURN btrim(value)::TIMESTAMPTZ;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql STABLE PARALLEL RESTRICTED;
+
+    CREATE OR REPLACE FUNCTION try_cast_time(value TEXT) RETURNS TIME AS $$
+    BEGIN
+        RETURN btrim(value)::TIME;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql STABLE PARALLEL RESTRICTED;
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        DROP FUNCTION IF EXISTS try_cast_time(TEXT);
+        DROP FUNCTION IF EXISTS try_cast_timestamptz(TEXT);
+        DROP FUNCTION IF EXISTS try_cast_timestamp(TEXT, TEXT);
+        DROP FUNCTION IF EXISTS try_cast_date(TEXT, TEXT);
+        DROP FUNCTION IF EXISTS to_iso_date_text(TEXT, TEXT);
+        DROP FUNCTION IF EXISTS try_cast_boolean(TEXT);
+        DROP FUNCTION IF EXISTS try_cast_numeric(TEXT);
+        DROP FUNCTION IF EXISTS try_cast_bigint(TEXT);
+    """)
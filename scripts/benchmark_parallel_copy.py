@@ -0,0 +1,61 @@
+import os
+import csv
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import asyncpg
+from app.helper.csv_worker_helper import copy_csv_in_parallel
+
+# Measures COPY throughput (rows/s) for a synthetic CSV loaded with 1..N concurrent streams.
+# Usage: DATABASE_URL=postgres://... python -m scripts.benchmark_parallel_copy --rows 2000000 --chunks 1,2,4,8
+
+TABLE_NAME = "benchmark_parallel_copy"
+
+def write_sample_csv(path: str, rows: int):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "customer", "notes", "amount", "created_at"])
+        for i in range(rows):
+            # Some quoted commas and newlines so chunk boundaries have to respect quoting
+            notes = f'line one, "quoted"\nline two {i}' if i % 50 == 0 else f"note {i}"
+            writer.writerow([i, f"customer_{random.randint(1, 50000)}", notes, round(random.uniform(1, 5000), 2), f"2024-01-{i % 28 + 1:02d} 10:{i % 60:02d}:00"])
+
+async def run(dsn: str, rows: int, chunk_counts):
+    path = os.path.join(tempfile.gettempdir(), f"{TABLE_NAME}.csv")
+    print(f"Writing {rows} rows to {path}...")
+    write_sample_csv(path, rows)
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+
+    pool = await asyncpg.create_pool(dsn=dsn, min_size=1, max_size=max(chunk_counts))
+    try:
+        print(f"{'chunks':>6} {'seconds':>8} {'rows/s':>12} {'MB/s':>8}")
+        for chunks in chunk_counts:
+            async with pool.acquire() as conn:
+                await conn.execute(f'DROP TABLE IF EXISTS "{TABLE_NAME}"')
+                await conn.execute(f'CREATE UNLOGGED TABLE "{TABLE_NAME}" (id TEXT, customer TEXT, notes TEXT, amount TEXT, created_at TEXT)')
+
+            started = time.perf_counter()
+            await copy_csv_in_parallel(pool, path, TABLE_NAME, True, chunks)
+            elapsed = time.perf_counter() - started
+
+            async with pool.acquire() as conn:
+                loaded = await conn.fetchval(f'SELECT count(*) FROM "{TABLE_NAME}"')
+            if loaded != rows:
+                raise RuntimeError(f"Expected {rows} rows with {chunks} chunks, loaded {loaded}")
+            print(f"{chunks:>6} {elapsed:>8.2f} {rows / elapsed:>12,.0f} {size_mb / elapsed:>8.1f}")
+    finally:
+        async with pool.acquire() as conn:
+            await conn.execute(f'DROP TABLE IF EXISTS "{TABLE_NAME}"')
+        await pool.close()
+        os.remove(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel CSV COPY benchmark")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL_DIRECT") or os.environ.get("DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunks", default="1,2,4,8", help="comma-separated stream counts")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.dsn, args.rows, [int(n) for n in args.chunks.split(",")]))
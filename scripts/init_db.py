@@ -25,6 +25,7 @@ try:
                 name VARCHAR(100) NOT NULL,
                 email VARCHAR(255) NOT NULL UNIQUE,
                 password VARCHAR(255) NOT NULL,
+                plan TEXT NOT NULL DEFAULT 'free',
                 created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
             );
@@ -53,6 +54,7 @@ try:
                 file_name VARCHAR(255) NOT NULL,
                 schema JSONB NOT NULL,
                 column_insights JSONB NOT NULL,
+                content_hash TEXT NULL,
                 created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
 
                 CONSTRAINT analysis_data_pkey PRIMARY KEY (id, table_name),
@@ -60,48 +62,219 @@ try:
             );
 
             CREATE INDEX IF NOT EXISTS idx_analysis_data_id ON analysis_data(id); 
+            CREATE INDEX IF NOT EXISTS idx_analysis_data_id_content_hash ON analysis_data(id, content_hash);
         """)
         print("- Table 'analysis_data' checked/created.")
 
         cursor.execute("""
-            CREATE UNLOGGED TABLE IF NOT EXISTS csv_queue (
-                id SERIAL PRIMARY KEY,
+            CREATE TABLE IF NOT EXISTS schema_cache (
+                user_id UUID NOT NULL,
+                fingerprint TEXT NOT NULL,
+                schema JSONB NOT NULL,
+                contain_columns JSONB NOT NULL,
+                column_insights JSONB NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                insights_updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+                CONSTRAINT schema_cache_pkey PRIMARY KEY (user_id, fingerprint),
+                CONSTRAINT fk_user_id FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            );
+        """)
+        print("- Table 'schema_cache' checked/created.")
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS column_stats (
+                user_id UUID NOT NULL,
+                table_name VARCHAR(255) NOT NULL,
+                column_name TEXT NOT NULL,
+                data_type TEXT NOT NULL,
+                row_count BIGINT NOT NULL,
+                null_frac REAL NULL,
+                distinct_estimate BIGINT NULL,
+                min_value TEXT NULL,
+                max_value TEXT NULL,
+                top_values JSONB NOT NULL DEFAULT '[]'::jsonb,
+                histogram JSONB NOT NULL DEFAULT '[]'::jsonb,
+                computed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+                CONSTRAINT column_stats_pkey PRIMARY KEY (user_id, table_name, column_name),
+                CONSTRAINT fk_analysis_data FOREIGN KEY (user_id, table_name) REFERENCES analysis_data(id, table_name) ON DELETE CASCADE
+            );
+        """)
+        print("- Table 'column_stats' checked/created.")
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS index_usage (
+                user_id UUID NOT NULL,
+                table_name VARCHAR(255) NOT NULL,
+                column_name TEXT NOT NULL,
+                uses INTEGER NOT NULL DEFAULT 0,
+                last_used_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+                CONSTRAINT index_usage_pkey PRIMARY KEY (table_name, column_name),
+                CONSTRAINT fk_analysis_data FOREIGN KEY (user_id, table_name) REFERENCES analysis_data(id, table_name) ON DELETE CASCADE
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_index_usage_uses ON index_usage(uses);
+
+            CREATE TABLE IF NOT EXISTS advised_indexes (
+                user_id UUID NOT NULL,
+                table_name VARCHAR(255) NOT NULL,
+                column_name TEXT NOT NULL,
+                index_name TEXT NOT NULL,
+                method TEXT NOT NULL,
+                uses INTEGER NOT NULL,
+                created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+                CONSTRAINT advised_indexes_pkey PRIMARY KEY (table_name, column_name),
+                CONSTRAINT fk_analysis_data FOREIGN KEY (user_id, table_name) REFERENCES analysis_data(id, table_name) ON DELETE CASCADE
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_advised_indexes_user_id ON advised_indexes(user_id);
+        """)
+        print("- Tables 'index_usage' and 'advised_indexes' checked/created.")
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_jobs (
+                id BIGSERIAL PRIMARY KEY,
                 upload_id UUID UNIQUE NOT NULL,
-                user_id TEXT NOT NULL,
+                job_type TEXT NOT NULL CONSTRAINT ingest_jobs_job_type_check CHECK (job_type IN ('csv', 'excel')),
+                user_id UUID NOT NULL,
                 table_name TEXT NOT NULL,
                 file_path TEXT NOT NULL,
                 original_file_name TEXT NOT NULL,
-                status TEXT NOT NULL DEFAULT 'pending',
+                status TEXT NOT NULL DEFAULT 'pending'
+                    CONSTRAINT ingest_jobs_status_check CHECK (status IN ('pending', 'processing', 'completed', 'failed')),
                 progress SMALLINT NOT NULL DEFAULT 0,
                 medium TEXT NULL,
                 receiver_no TEXT NULL,
+                content_hash TEXT NULL,
+                byte_size BIGINT NULL,
+                sheet_progress JSONB NULL,
+                priority SMALLINT NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                locked_by TEXT NULL,
+                locked_until TIMESTAMPTZ NULL,
+                last_error TEXT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_ingest_jobs_pending
+                ON ingest_jobs (job_type, created_at) WHERE status = 'pending';
+            CREATE INDEX IF NOT EXISTS idx_ingest_jobs_lease
+                ON ingest_jobs (locked_until) WHERE status = 'processing';
+            CREATE INDEX IF NOT EXISTS idx_ingest_jobs_running_user
+                ON ingest_jobs (user_id) WHERE status = 'processing';
+            CREATE INDEX IF NOT EXISTS idx_ingest_jobs_user_hash
+                ON ingest_jobs (user_id, content_hash) WHERE status IN ('pending', 'processing');
+        """)
+        print(" - Table 'ingest_jobs' checked/created.")
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS worker_nodes (
+                node_id TEXT PRIMARY KEY,
+                hostname TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                stats JSONB NOT NULL,
+                started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                last_seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+        """)
+        print(" - Table 'worker_nodes' checked/created.")
+
+        cursor.execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS llm_response_cache (
+                cache_key TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                response TEXT NOT NULL,
+                expires_at TIMESTAMPTZ NOT NULL,
                 created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
             );
 
-            CREATE INDEX IF NOT EXISTS idx_csv_queue_status_upload_id_progress
-                ON csv_queue (status, upload_id, progress);
+            CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires_at
+                ON llm_response_cache (expires_at);
         """)
-        print(" - Table 'csv_queue' checked/created.")
-        
+        print(" - Table 'llm_response_cache' checked/created.")
+
         cursor.execute("""
-            CREATE UNLOGGED TABLE IF NOT EXISTS excel_queue (
-                id SERIAL PRIMARY KEY,
-                upload_id UUID UNIQUE NOT NULL,
-                user_id TEXT NOT NULL,
-                table_name TEXT NOT NULL,
-                file_path TEXT NOT NULL,
-                original_file_name TEXT NOT NULL,
-                status TEXT NOT NULL DEFAULT 'pending',
-                progress SMALLINT NOT NULL DEFAULT 0,
-                medium TEXT NULL,
-                receiver_no TEXT NULL,
+            CREATE TABLE IF NOT EXISTS query_classification_log (
+                id BIGSERIAL PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                user_query TEXT NOT NULL,
+                type TEXT NOT NULL,
+                tier TEXT NOT NULL,
+                latency_ms INTEGER NOT NULL DEFAULT 0,
                 created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
             );
 
-            CREATE INDEX IF NOT EXISTS idx_excel_queue_status_upload_id_progress
-                ON excel_queue (status, upload_id, progress)
-                    """)
-        print(" - Table 'excel_queue' checked/created.")
+            CREATE INDEX IF NOT EXISTS idx_query_classification_log_tier_created_at
+                ON query_classification_log (tier, created_at);
+        """)
+        print(" - Table 'query_classification_log' checked/created.")
+
+        # Safe casts used when loading uploads into typed tables: unconvertible values become NULL.
+        # The plpgsql ones catch errors (a subtransaction), which parallel workers can't run.
+        cursor.execute(r"""
+            CREATE OR REPLACE FUNCTION try_cast_bigint(value TEXT) RETURNS BIGINT AS $$
+                SELECT CASE WHEN value ~ '^\s*[-+]?\d{1,18}\s*$' THEN btrim(value)::BIGINT END
+            $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+            CREATE OR REPLACE FUNCTION try_cast_numeric(value TEXT) RETURNS NUMERIC AS $$
+                SELECT CASE WHEN value ~ '^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$' THEN btrim(value)::NUMERIC END
+            $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+            CREATE OR REPLACE FUNCTION try_cast_boolean(value TEXT) RETURNS BOOLEAN AS $$
+                SELECT CASE
+                    WHEN lower(btrim(value)) IN ('true', 't', 'yes', 'y') THEN TRUE
+                    WHEN lower(btrim(value)) IN ('false', 'f', 'no', 'n') THEN FALSE
+                END
+            $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+            -- Month-first/day-first values are rewritten to year-first, which parses the same under any DateStyle
+            CREATE OR REPLACE FUNCTION to_iso_date_text(value TEXT, date_order TEXT) RETURNS TEXT AS $$
+                SELECT CASE date_order
+                    WHEN 'MDY' THEN regexp_replace(btrim(value), '^(\d{1,2})[-/](\d{1,2})[-/](\d{4})', '\3-\1-\2')
+                    WHEN 'DMY' THEN regexp_replace(btrim(value), '^(\d{1,2})[-/](\d{1,2})[-/](\d{4})', '\3-\2-\1')
+                    ELSE btrim(value)
+                END
+            $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+            CREATE OR REPLACE FUNCTION try_cast_date(value TEXT, date_order TEXT) RETURNS DATE AS $$
+            BEGIN
+                RETURN to_iso_date_text(value, date_order)::DATE;
+            EXCEPTION WHEN others THEN
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql STABLE PARALLEL RESTRICTED;
+
+            CREATE OR REPLACE FUNCTION try_cast_timestamp(value TEXT, date_order TEXT) RETURNS TIMESTAMP AS $$
+            BEGIN
+                RETURN to_iso_date_text(value, date_order)::TIMESTAMP;
+            EXCEPTION WHEN others THEN
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql STABLE PARALLEL RESTRICTED;
+
+            CREATE OR REPLACE FUNCTION try_cast_timestamptz(value TEXT) RETURNS TIMESTAMPTZ AS $$
+            BEGIN
+                RETURN btrim(value)::TIMESTAMPTZ;
+            EXCEPTION WHEN others THEN
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql STABLE PARALLEL RESTRICTED;
+
+            CREATE OR REPLACE FUNCTION try_cast_time(value TEXT) RETURNS TIME AS $$
+            BEGIN
+                RETURN btrim(value)::TIME;
+            EXCEPTION WHEN others THEN
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql STABLE PARALLEL RESTRICTED;
+        """)
+        print(" - Safe-cast functions checked/created.")
 
         conn.commit()
         print("✅ Database initialization complete. Tables are ready.")